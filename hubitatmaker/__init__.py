@@ -1,171 +1,195 @@
 __version__ = "0.6.1"
 
-from .const import (
-    ATTR_ACCELERATION,
-    ATTR_ALARM,
-    ATTR_BATTERY,
-    ATTR_CARBON_MONOXIDE,
-    ATTR_CODE_CHANGED,
-    ATTR_CODE_LENGTH,
-    ATTR_COLOR_MODE,
-    ATTR_COLOR_NAME,
-    ATTR_COLOR_TEMP,
-    ATTR_CONTACT,
-    ATTR_CURRENT,
-    ATTR_DEVICE_ID,
-    ATTR_DOOR,
-    ATTR_DOUBLE_TAPPED,
-    ATTR_ENERGY,
-    ATTR_ENERGY_SOURCE,
-    ATTR_ENTRY_DELAY,
-    ATTR_EXIT_DELAY,
-    ATTR_HELD,
-    ATTR_HUE,
-    ATTR_HUMIDITY,
-    ATTR_ILLUMINANCE,
-    ATTR_LAST_CODE_NAME,
-    ATTR_LEVEL,
-    ATTR_LOCK,
-    ATTR_LOCK_CODES,
-    ATTR_MAX_CODES,
-    ATTR_MOTION,
-    ATTR_NAME,
-    ATTR_NUM_BUTTONS,
-    ATTR_POSITION,
-    ATTR_POWER,
-    ATTR_POWER_SOURCE,
-    ATTR_PRESENCE,
-    ATTR_PRESSURE,
-    ATTR_PUSHED,
-    ATTR_SATURATION,
-    ATTR_SECURITY_KEYPAD,
-    ATTR_SMOKE,
-    ATTR_SPEED,
-    ATTR_SWITCH,
-    ATTR_TEMPERATURE,
-    ATTR_UV,
-    ATTR_VALUE,
-    ATTR_VOLTAGE,
-    ATTR_WATER,
-    ATTR_WINDOW_SHADE,
-    CAP_ALARM,
-    CAP_COLOR_CONTROL,
-    CAP_COLOR_MODE,
-    CAP_COLOR_TEMP,
-    CAP_CONTACT_SENSOR,
-    CAP_DOOR_CONTROL,
-    CAP_DOUBLE_TAPABLE_BUTTON,
-    CAP_ENERGY_METER,
-    CAP_ENERGY_SOURCE,
-    CAP_FAN_CONTROL,
-    CAP_GARAGE_DOOR_CONTROL,
-    CAP_HOLDABLE_BUTTON,
-    CAP_ILLUMINANCE_MEASUREMENT,
-    CAP_LIGHT,
-    CAP_LOCK,
-    CAP_LOCK_CODES,
-    CAP_MOTION_SENSOR,
-    CAP_MUSIC_PLAYER,
-    CAP_POWER_METER,
-    CAP_POWER_SOURCE,
-    CAP_PRESENCE_SENSOR,
-    CAP_PRESSURE_MEASUREMENT,
-    CAP_PUSHABLE_BUTTON,
-    CAP_RELATIVE_HUMIDITY_MEASUREMENT,
-    CAP_SECURITY_KEYPAD,
-    CAP_SWITCH,
-    CAP_SWITCH_LEVEL,
-    CAP_TEMPERATURE_MEASUREMENT,
-    CAP_THERMOSTAT,
-    CAP_WINDOW_SHADE,
-    CMD_ARM_AWAY,
-    CMD_ARM_HOME,
-    CMD_ARM_NIGHT,
-    CMD_AUTO,
-    CMD_AWAY,
-    CMD_BOTH,
-    CMD_CLOSE,
-    CMD_COOL,
-    CMD_CYCLE_SPEED,
-    CMD_DELETE_CODE,
-    CMD_DISARM,
-    CMD_ECO,
-    CMD_EMERGENCY_HEAT,
-    CMD_FAN_AUTO,
-    CMD_FAN_CIRCULATE,
-    CMD_FAN_ON,
-    CMD_FLASH,
-    CMD_GET_CODES,
-    CMD_HEAT,
-    CMD_LOCK,
-    CMD_OFF,
-    CMD_ON,
-    CMD_OPEN,
-    CMD_PRESENT,
-    CMD_SET_CODE,
-    CMD_SET_CODE_LENGTH,
-    CMD_SET_COLOR,
-    CMD_SET_COLOR_TEMP,
-    CMD_SET_COOLING_SETPOINT,
-    CMD_SET_ENTRY_DELAY,
-    CMD_SET_EXIT_DELAY,
-    CMD_SET_FAN_MODE,
-    CMD_SET_HEATING_SETPOINT,
-    CMD_SET_HUE,
-    CMD_SET_LEVEL,
-    CMD_SET_POSITION,
-    CMD_SET_PRESENCE,
-    CMD_SET_SAT,
-    CMD_SET_SPEED,
-    CMD_SET_THERMOSTAT_MODE,
-    CMD_SIREN,
-    CMD_STROBE,
-    CMD_UNLOCK,
-    COLOR_MODE_CT,
-    COLOR_MODE_RGB,
-    DEFAULT_FAN_SPEEDS,
-    HSM_ARM_ALL,
-    HSM_ARM_AWAY,
-    HSM_ARM_HOME,
-    HSM_ARM_NIGHT,
-    HSM_ARM_RULES,
-    HSM_CANCEL_ALERTS,
-    HSM_DISARM,
-    HSM_DISARM_ALL,
-    HSM_DISARM_RULES,
-    HSM_STATUS_ALL_DISARMED,
-    HSM_STATUS_ARMED_AWAY,
-    HSM_STATUS_ARMED_HOME,
-    HSM_STATUS_ARMED_NIGHT,
-    HSM_STATUS_ARMING_AWAY,
-    HSM_STATUS_ARMING_HOME,
-    HSM_STATUS_ARMING_NIGHT,
-    HSM_STATUS_DISARMED,
-    ID_HSM_STATUS,
-    ID_MODE,
-    STATE_ARMED_AWAY,
-    STATE_ARMED_HOME,
-    STATE_ARMED_NIGHT,
-    STATE_CLOSED,
-    STATE_CLOSING,
-    STATE_DISARMED,
-    STATE_LOCKED,
-    STATE_LOW,
-    STATE_OFF,
-    STATE_ON,
-    STATE_OPEN,
-    STATE_OPENING,
-    STATE_PARTIALLY_OPEN,
-    STATE_UNKNOWN,
-    STATE_UNLOCKED,
-    STATE_UNLOCKED_WITH_TIMEOUT,
-)
-from .error import ConnectionError, InvalidConfig, InvalidToken, RequestError
-from .hub import Hub
-from .types import Attribute, Device, Event
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, List
+
+# Names are loaded from their submodules when first accessed, so importing the
+# package doesn't import aiohttp (and the rest of the hub's dependencies)
+# until something that needs them, such as Hub, is used.
+if TYPE_CHECKING:
+    from .aggregate import Aggregate
+    from .const import (
+        AGG_COUNT,
+        AGG_MAX,
+        AGG_MEAN,
+        AGG_MIN,
+        AGG_SUM,
+        ATTR_ACCELERATION,
+        ATTR_ALARM,
+        ATTR_BATTERY,
+        ATTR_CARBON_MONOXIDE,
+        ATTR_CODE_CHANGED,
+        ATTR_CODE_LENGTH,
+        ATTR_COLOR_MODE,
+        ATTR_COLOR_NAME,
+        ATTR_COLOR_TEMP,
+        ATTR_CONTACT,
+        ATTR_CURRENT,
+        ATTR_DEVICE_ID,
+        ATTR_DOOR,
+        ATTR_DOUBLE_TAPPED,
+        ATTR_ENERGY,
+        ATTR_ENERGY_SOURCE,
+        ATTR_ENTRY_DELAY,
+        ATTR_EXIT_DELAY,
+        ATTR_HELD,
+        ATTR_HUE,
+        ATTR_HUMIDITY,
+        ATTR_ILLUMINANCE,
+        ATTR_LAST_CODE_NAME,
+        ATTR_LEVEL,
+        ATTR_LOCK,
+        ATTR_LOCK_CODES,
+        ATTR_MAX_CODES,
+        ATTR_MOTION,
+        ATTR_NAME,
+        ATTR_NUM_BUTTONS,
+        ATTR_POSITION,
+        ATTR_POWER,
+        ATTR_POWER_SOURCE,
+        ATTR_PRESENCE,
+        ATTR_PRESSURE,
+        ATTR_PUSHED,
+        ATTR_SATURATION,
+        ATTR_SECURITY_KEYPAD,
+        ATTR_SMOKE,
+        ATTR_SPEED,
+        ATTR_SWITCH,
+        ATTR_TEMPERATURE,
+        ATTR_UV,
+        ATTR_VALUE,
+        ATTR_VOLTAGE,
+        ATTR_WATER,
+        ATTR_WINDOW_SHADE,
+        CAP_ALARM,
+        CAP_COLOR_CONTROL,
+        CAP_COLOR_MODE,
+        CAP_COLOR_TEMP,
+        CAP_CONTACT_SENSOR,
+        CAP_DOOR_CONTROL,
+        CAP_DOUBLE_TAPABLE_BUTTON,
+        CAP_ENERGY_METER,
+        CAP_ENERGY_SOURCE,
+        CAP_FAN_CONTROL,
+        CAP_GARAGE_DOOR_CONTROL,
+        CAP_HOLDABLE_BUTTON,
+        CAP_ILLUMINANCE_MEASUREMENT,
+        CAP_LIGHT,
+        CAP_LOCK,
+        CAP_LOCK_CODES,
+        CAP_MOTION_SENSOR,
+        CAP_MUSIC_PLAYER,
+        CAP_POWER_METER,
+        CAP_POWER_SOURCE,
+        CAP_PRESENCE_SENSOR,
+        CAP_PRESSURE_MEASUREMENT,
+        CAP_PUSHABLE_BUTTON,
+        CAP_RELATIVE_HUMIDITY_MEASUREMENT,
+        CAP_SECURITY_KEYPAD,
+        CAP_SWITCH,
+        CAP_SWITCH_LEVEL,
+        CAP_TEMPERATURE_MEASUREMENT,
+        CAP_THERMOSTAT,
+        CAP_WINDOW_SHADE,
+        CMD_ARM_AWAY,
+        CMD_ARM_HOME,
+        CMD_ARM_NIGHT,
+        CMD_AUTO,
+        CMD_AWAY,
+        CMD_BOTH,
+        CMD_CLOSE,
+        CMD_COOL,
+        CMD_CYCLE_SPEED,
+        CMD_DELETE_CODE,
+        CMD_DISARM,
+        CMD_ECO,
+        CMD_EMERGENCY_HEAT,
+        CMD_FAN_AUTO,
+        CMD_FAN_CIRCULATE,
+        CMD_FAN_ON,
+        CMD_FLASH,
+        CMD_GET_CODES,
+        CMD_HEAT,
+        CMD_LOCK,
+        CMD_OFF,
+        CMD_ON,
+        CMD_OPEN,
+        CMD_PRESENT,
+        CMD_SET_CODE,
+        CMD_SET_CODE_LENGTH,
+        CMD_SET_COLOR,
+        CMD_SET_COLOR_TEMP,
+        CMD_SET_COOLING_SETPOINT,
+        CMD_SET_ENTRY_DELAY,
+        CMD_SET_EXIT_DELAY,
+        CMD_SET_FAN_MODE,
+        CMD_SET_HEATING_SETPOINT,
+        CMD_SET_HUE,
+        CMD_SET_LEVEL,
+        CMD_SET_POSITION,
+        CMD_SET_PRESENCE,
+        CMD_SET_SAT,
+        CMD_SET_SPEED,
+        CMD_SET_THERMOSTAT_MODE,
+        CMD_SIREN,
+        CMD_STROBE,
+        CMD_UNLOCK,
+        COLOR_MODE_CT,
+        COLOR_MODE_RGB,
+        DEFAULT_FAN_SPEEDS,
+        EVENT_DEVICE_ADDED,
+        EVENT_DEVICE_REMOVED,
+        HSM_ARM_ALL,
+        HSM_ARM_AWAY,
+        HSM_ARM_HOME,
+        HSM_ARM_NIGHT,
+        HSM_ARM_RULES,
+        HSM_CANCEL_ALERTS,
+        HSM_DISARM,
+        HSM_DISARM_ALL,
+        HSM_DISARM_RULES,
+        HSM_STATUS_ALL_DISARMED,
+        HSM_STATUS_ARMED_AWAY,
+        HSM_STATUS_ARMED_HOME,
+        HSM_STATUS_ARMED_NIGHT,
+        HSM_STATUS_ARMING_AWAY,
+        HSM_STATUS_ARMING_HOME,
+        HSM_STATUS_ARMING_NIGHT,
+        HSM_STATUS_DISARMED,
+        ID_HSM_STATUS,
+        ID_INVENTORY,
+        ID_MODE,
+        STATE_ARMED_AWAY,
+        STATE_ARMED_HOME,
+        STATE_ARMED_NIGHT,
+        STATE_CLOSED,
+        STATE_CLOSING,
+        STATE_DISARMED,
+        STATE_LOCKED,
+        STATE_LOW,
+        STATE_OFF,
+        STATE_ON,
+        STATE_OPEN,
+        STATE_OPENING,
+        STATE_PARTIALLY_OPEN,
+        STATE_UNKNOWN,
+        STATE_UNLOCKED,
+        STATE_UNLOCKED_WITH_TIMEOUT,
+    )
+    from .error import ConnectionError, InvalidConfig, InvalidToken, RequestError
+    from .fleet import HubFleet
+    from .hub import Hub
+    from .index import Range
+    from .types import Attribute, Device, Event
 
 __all__ = [
+    "AGG_COUNT",
+    "AGG_MAX",
+    "AGG_MEAN",
+    "AGG_MIN",
+    "AGG_SUM",
     "ATTR_ACCELERATION",
+    "Aggregate",
     "ATTR_ALARM",
     "ATTR_BATTERY",
     "ATTR_CARBON_MONOXIDE",
@@ -291,6 +315,8 @@ __all__ = [
     "ConnectionError",
     "DEFAULT_FAN_SPEEDS",
     "Device",
+    "EVENT_DEVICE_ADDED",
+    "EVENT_DEVICE_REMOVED",
     "Event",
     "HSM_ARM_ALL",
     "HSM_ARM_AWAY",
@@ -310,10 +336,13 @@ __all__ = [
     "HSM_STATUS_ARMING_NIGHT",
     "HSM_STATUS_DISARMED",
     "Hub",
+    "HubFleet",
     "ID_HSM_STATUS",
+    "ID_INVENTORY",
     "ID_MODE",
     "InvalidConfig",
     "InvalidToken",
+    "Range",
     "RequestError",
     "STATE_ARMED_AWAY",
     "STATE_ARMED_HOME",
@@ -332,3 +361,31 @@ __all__ = [
     "STATE_UNLOCKED",
     "STATE_UNLOCKED_WITH_TIMEOUT",
 ]
+
+# Submodules of the names that don't come from const
+_SUBMODULES = {
+    "Aggregate": ".aggregate",
+    "Attribute": ".types",
+    "ConnectionError": ".error",
+    "Device": ".types",
+    "Event": ".types",
+    "Hub": ".hub",
+    "HubFleet": ".fleet",
+    "InvalidConfig": ".error",
+    "InvalidToken": ".error",
+    "Range": ".index",
+    "RequestError": ".error",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = import_module(_SUBMODULES.get(name, ".const"), __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,267 @@
+"""Incrementally maintained aggregates over device attributes."""
+
+from math import fsum
+from typing import AbstractSet, Any, Callable, Dict, Iterable, List, Optional, Union
+
+from .const import AGG_COUNT, AGG_MAX, AGG_MEAN, AGG_MIN, AGG_SUM
+from .types import Device, is_number
+
+AggregateListener = Callable[["Aggregate"], None]
+
+AGGREGATE_FUNCTIONS = (AGG_COUNT, AGG_MAX, AGG_MEAN, AGG_MIN, AGG_SUM)
+
+# The number of removals from a running sum after which it is recomputed,
+# so that floating point error can't accumulate on long-running hubs
+SUM_RECOMPUTE_INTERVAL = 1000
+
+
+class Aggregate:
+    """An aggregate of one attribute over a selection of devices.
+
+    Devices are selected by capability, by ID, or both. The aggregate is
+    updated incrementally as attribute values change: sum, count and mean
+    updates are O(1), and min and max are O(1) unless the current extreme
+    value is removed, in which case the extreme is recomputed from the
+    distinct values. Running sums are recomputed exactly (with math.fsum)
+    every SUM_RECOMPUTE_INTERVAL removals.
+
+    For AGG_COUNT, the aggregate counts devices whose value equals match, or
+    devices with any (non-None) value if match is None. The other functions
+    only consider numeric values.
+    """
+
+    def __init__(
+        self,
+        attribute: str,
+        function: str,
+        capability: Optional[str] = None,
+        device_ids: Optional[Iterable[str]] = None,
+        match: Any = None,
+    ):
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f"Invalid aggregate function '{function}'")
+
+        self.attribute = attribute
+        self.function = function
+        self.capability = capability
+        self.device_ids: Optional[AbstractSet[str]] = (
+            frozenset(device_ids) if device_ids is not None else None
+        )
+        self.match = match
+
+        self._listeners: List[AggregateListener] = []
+        self._values: Dict[str, Any] = {}
+        self._count = 0
+        self._sum = 0.0
+        self._sum_removals = 0
+        # Number of devices with each distinct numeric value, for min and max
+        self._value_counts: Dict[float, int] = {}
+        self._extreme: Optional[float] = None
+        self._value: Union[int, float, None] = self._compute()
+
+    def __repr__(self) -> str:
+        return (
+            f"<Aggregate {self.function}({self.attribute}) "
+            f"capability={self.capability} value={self._value}>"
+        )
+
+    @property
+    def value(self) -> Union[int, float, None]:
+        """Return the current aggregate value."""
+        return self._value
+
+    @property
+    def device_count(self) -> int:
+        """Return the number of devices included in the aggregate."""
+        return len(self._values)
+
+    def add_listener(self, listener: AggregateListener) -> None:
+        """Listen for changes to the aggregate value."""
+        self._listeners.append(listener)
+
+    def remove_listeners(self) -> None:
+        """Remove all listeners for aggregate changes."""
+        self._listeners = []
+
+    def selects(self, device: Device) -> bool:
+        """Return True if a device is included by this aggregate's selector."""
+        if self.device_ids is not None and device.id not in self.device_ids:
+            return False
+        if self.capability is not None and self.capability not in device.capabilities:
+            return False
+        return self.attribute in device.attributes
+
+    def reset(self, devices: Iterable[Device]) -> None:
+        """Recompute the aggregate from scratch."""
+        self._values = {}
+        self._count = 0
+        self._sum = 0.0
+        self._sum_removals = 0
+        self._value_counts = {}
+        self._extreme = None
+        for device in devices:
+            if self.selects(device):
+                value = device.attributes[self.attribute].typed_value
+                self._values[device.id] = value
+                self._add(value)
+        self._publish()
+
+    def update_device(self, device: Device) -> None:
+        """Add, update or remove a device based on its current state."""
+        if self.selects(device):
+            value = device.attributes[self.attribute].typed_value
+            if device.id not in self._values:
+                self._values[device.id] = value
+                self._add(value)
+                self._publish()
+            else:
+                self.update(device.id, value)
+        else:
+            self.remove_device(device.id)
+
+    def update(self, device_id: str, value: Any) -> None:
+        """Update the value contributed by a device, if it is included."""
+        values = self._values
+        if device_id not in values:
+            return
+        old_value = values[device_id]
+        if old_value == value:
+            return
+        values[device_id] = value
+        self._remove(old_value)
+        self._add(value)
+        self._check_sum()
+        self._publish()
+
+    def remove_device(self, device_id: str) -> None:
+        """Remove a device from the aggregate."""
+        if device_id in self._values:
+            self._remove(self._values.pop(device_id))
+            self._check_sum()
+            self._publish()
+
+    def _add(self, value: Any) -> None:
+        function = self.function
+        if function == AGG_COUNT:
+            if self._counts(value):
+                self._count += 1
+        elif is_number(value):
+            self._count += 1
+            if function == AGG_SUM or function == AGG_MEAN:
+                self._sum += value
+            else:
+                counts = self._value_counts
+                counts[value] = counts.get(value, 0) + 1
+                extreme = self._extreme
+                if (
+                    extreme is None
+                    or (function == AGG_MIN and value < extreme)
+                    or (function == AGG_MAX and value > extreme)
+                ):
+                    self._extreme = value
+
+    def _remove(self, value: Any) -> None:
+        function = self.function
+        if function == AGG_COUNT:
+            if self._counts(value):
+                self._count -= 1
+        elif is_number(value):
+            self._count -= 1
+            if function == AGG_SUM or function == AGG_MEAN:
+                self._sum -= value
+                self._sum_removals += 1
+            else:
+                counts = self._value_counts
+                remaining = counts[value] - 1
+                if remaining:
+                    counts[value] = remaining
+                else:
+                    del counts[value]
+                    if value == self._extreme:
+                        if not counts:
+                            self._extreme = None
+                        elif function == AGG_MIN:
+                            self._extreme = min(counts)
+                        else:
+                            self._extreme = max(counts)
+
+    def _check_sum(self) -> None:
+        """Recompute the running sum if enough values have been removed."""
+        removals = self._sum_removals
+        if removals >= SUM_RECOMPUTE_INTERVAL or (removals and not self._count):
+            self._sum = fsum(v for v in self._values.values() if is_number(v))
+            self._sum_removals = 0
+
+    def _counts(self, value: Any) -> bool:
+        if self.match is None:
+            return value is not None
+        return value == self.match
+
+    def _compute(self) -> Union[int, float, None]:
+        function = self.function
+        if function == AGG_COUNT:
+            return self._count
+        if function == AGG_SUM:
+            return self._sum
+        if function == AGG_MEAN:
+            return self._sum / self._count if self._count else None
+        return self._extreme
+
+    def _publish(self) -> None:
+        value = self._compute()
+        if value == self._value:
+            return
+        self._value = value
+        for listener in self._listeners:
+            listener(self)
+
+
+class AggregateSet:
+    """A collection of aggregates, indexed by attribute name."""
+
+    def __init__(self) -> None:
+        self._by_attribute: Dict[str, List[Aggregate]] = {}
+        # The names of attributes with aggregates
+        self.attributes: AbstractSet[str] = self._by_attribute.keys()
+
+    def __bool__(self) -> bool:
+        return bool(self._by_attribute)
+
+    def __iter__(self):
+        for aggregates in self._by_attribute.values():
+            yield from aggregates
+
+    def add(self, aggregate: Aggregate) -> None:
+        self._by_attribute.setdefault(aggregate.attribute, []).append(aggregate)
+
+    def remove(self, aggregate: Aggregate) -> None:
+        aggregates = self._by_attribute.get(aggregate.attribute, [])
+        if aggregate in aggregates:
+            aggregates.remove(aggregate)
+            if not aggregates:
+                del self._by_attribute[aggregate.attribute]
+
+    def update(self, device_id: str, attr_name: str, value: Any) -> None:
+        """Update the aggregates over an attribute with a new device value."""
+        aggregates = self._by_attribute.get(attr_name)
+        if aggregates:
+            for aggregate in aggregates:
+                aggregate.update(device_id, value)
+
+    def update_device(self, device: Device) -> None:
+        """Update every aggregate from a device's current state.
+
+        A device's capabilities or attributes may have changed, so whether
+        each aggregate includes the device is re-evaluated.
+        """
+        for aggregate in self:
+            aggregate.update_device(device)
+
+    def remove_device(self, device_id: str) -> None:
+        for aggregate in self:
+            aggregate.remove_device(device_id)
+
+    def reset(self, devices: Iterable[Device]) -> None:
+        devices = list(devices)
+        for aggregate in self:
+            aggregate.reset(devices)
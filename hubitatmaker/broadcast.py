@@ -0,0 +1,447 @@
+"""Republishing a hub's events to other processes over a Unix socket.
+
+An EventBroadcaster listens on a Unix domain socket and sends each event a
+hub processes to every connected BroadcastClient, so other processes can
+receive a hub's events without their own Hub and event server.
+
+Every message is a frame: a little-endian u32 length followed by that many
+bytes of compact JSON. A client starts by sending a subscription frame
+({"device_ids": [...], "attributes": [...], "hub_events": bool}, where
+missing or null lists match everything), after which the broadcaster sends
+it a frame with the content of each matching event.
+"""
+
+import asyncio
+import json
+from logging import getLogger
+import os
+import stat
+import struct
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Collection,
+    Dict,
+    List,
+    Optional,
+    Set,
+)
+
+from .const import ID_HSM_STATUS, ID_MODE
+from .types import Event
+
+if TYPE_CHECKING:
+    from .hub import Hub
+
+Listener = Callable[[Event], None]
+
+DEFAULT_BROADCAST_BUFFER_SIZE = 1024
+MAX_FRAME_SIZE = 1024 * 1024
+
+_FRAME = struct.Struct("<I")
+
+_LOGGER = getLogger(__name__)
+
+
+class EventBroadcaster:
+    """Sends a hub's events to clients connected to a Unix domain socket.
+
+    Each client has its own filter and a queue of up to buffer_size frames.
+    Events are encoded once, and only if a client wants them. If a client
+    falls behind and its queue is full, new events for it are dropped so
+    that one slow client can't hold up the hub or other clients.
+    """
+
+    def __init__(
+        self,
+        hub: "Hub",
+        path: str,
+        buffer_size: int = DEFAULT_BROADCAST_BUFFER_SIZE,
+    ):
+        """Initialize an EventBroadcaster.
+
+        hub:
+          The hub whose events should be broadcast
+        path:
+          The path of the Unix domain socket to listen on
+        buffer_size:
+          The maximum number of events queued for each client
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+        self.drop_count = 0
+        self._hub = hub
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._subscribers: List[_Subscriber] = []
+
+    def __repr__(self) -> str:
+        return f"<EventBroadcaster path={self.path} clients={len(self._subscribers)}>"
+
+    @property
+    def client_count(self) -> int:
+        """Return the number of connected clients."""
+        return len(self._subscribers)
+
+    async def start(self) -> None:
+        """Start listening for clients and broadcasting events.
+
+        A socket left behind by a broadcaster that has exited is replaced. A
+        FileExistsError is raised if the path is in use by a running
+        broadcaster or is not a socket.
+        """
+        if self._server is not None:
+            return
+        await _remove_stale_socket(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_client, self.path)
+        self._hub.add_event_listener(self._publish)
+        _LOGGER.debug("Broadcasting events on %s", self.path)
+
+    async def stop(self) -> None:
+        """Disconnect all clients and stop listening."""
+        if self._server is None:
+            return
+        self._server.close()
+        for subscriber in self._subscribers:
+            subscriber.close()
+        await self._server.wait_closed()
+        self._server = None
+        self._subscribers = []
+        self._hub.remove_event_listener(self._publish)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _publish(self, event: Event) -> None:
+        """Queue an event for every client that wants it."""
+        frame: Optional[bytes] = None
+        for subscriber in self._subscribers:
+            if not subscriber.wants(event):
+                continue
+            if frame is None:
+                frame = encode_frame(_event_content(event))
+            try:
+                subscriber.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self.drop_count += 1
+                _LOGGER.warning("Broadcast client queue is full; dropping event")
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            subscription = await read_frame(reader)
+        except (asyncio.IncompleteReadError, ValueError) as e:
+            _LOGGER.warning("Invalid broadcast subscription: %s", e)
+            writer.close()
+            return
+        if subscription is None:
+            writer.close()
+            return
+
+        subscriber = _Subscriber(writer, subscription, self.buffer_size)
+        self._subscribers.append(subscriber)
+        _LOGGER.debug("Broadcast client connected: %s", subscription)
+        try:
+            await subscriber.run(reader)
+        finally:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+            _LOGGER.debug("Broadcast client disconnected")
+
+
+class _Subscriber:
+    """A connected broadcast client."""
+
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        subscription: Dict[str, Any],
+        buffer_size: int,
+    ):
+        device_ids = subscription.get("device_ids")
+        attributes = subscription.get("attributes")
+        self.device_ids: Optional[Set[str]] = (
+            None if device_ids is None else set(device_ids)
+        )
+        self.attributes: Optional[Set[str]] = (
+            None if attributes is None else set(attributes)
+        )
+        self.hub_events: bool = subscription.get("hub_events", True)
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(buffer_size)
+        self._writer = writer
+
+    def wants(self, event: Event) -> bool:
+        """Return True if the client's filter matches an event."""
+        device_id = event.device_id
+        if device_id is None:
+            return self.hub_events
+        if self.device_ids is not None and device_id not in self.device_ids:
+            return False
+        return self.attributes is None or event.attribute in self.attributes
+
+    async def run(self, reader: asyncio.StreamReader) -> None:
+        """Send queued frames until the client disconnects."""
+        sender = asyncio.ensure_future(self._send())
+        try:
+            # Clients don't send anything after subscribing; this returns
+            # when they disconnect.
+            await reader.read()
+        finally:
+            sender.cancel()
+            self.close()
+
+    def close(self) -> None:
+        self._writer.close()
+
+    async def _send(self) -> None:
+        queue = self.queue
+        writer = self._writer
+        try:
+            while True:
+                frames = [await queue.get()]
+                # Write everything that's queued at once
+                while not queue.empty():
+                    frames.append(queue.get_nowait())
+                writer.write(b"".join(frames))
+                await writer.drain()
+        except ConnectionError:
+            pass
+
+
+class BroadcastClient:
+    """Receives a hub's events from an EventBroadcaster.
+
+    Events can be received with the same listener methods as a Hub, or by
+    iterating over events().
+    """
+
+    def __init__(
+        self,
+        path: str,
+        device_ids: Optional[Collection[str]] = None,
+        attributes: Optional[Collection[str]] = None,
+        hub_events: bool = True,
+    ):
+        """Initialize a BroadcastClient.
+
+        path:
+          The path of the broadcaster's Unix domain socket
+        device_ids:
+          The devices to receive events for (optional). Defaults to all.
+        attributes:
+          The attributes to receive events for (optional). Defaults to all.
+        hub_events:
+          Whether to receive mode and HSM status events
+        """
+        self.path = path
+        self.device_ids = device_ids
+        self.attributes = attributes
+        self.hub_events = hub_events
+        self._listeners: Dict[str, List[Listener]] = {}
+        self._event_listeners: List[Listener] = []
+        self._queues: List["asyncio.Queue[Optional[Event]]"] = []
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def __repr__(self) -> str:
+        return f"<BroadcastClient path={self.path}>"
+
+    @property
+    def connected(self) -> bool:
+        """Return True if the client is connected to the broadcaster."""
+        return self._task is not None
+
+    async def start(self) -> None:
+        """Connect to the broadcaster and start receiving events."""
+        if self._task is not None:
+            return
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        subscription = {
+            "device_ids": None if self.device_ids is None else list(self.device_ids),
+            "attributes": None if self.attributes is None else list(self.attributes),
+            "hub_events": self.hub_events,
+        }
+        writer.write(encode_frame(subscription))
+        await writer.drain()
+        self._writer = writer
+        self._task = asyncio.ensure_future(self._receive(reader))
+
+    async def stop(self) -> None:
+        """Disconnect from the broadcaster and remove all listeners."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._end_iterators()
+        self._listeners = {}
+        self._event_listeners = []
+
+    def add_device_listener(self, device_id: str, listener: Listener) -> None:
+        """Listen for updates for a particular device."""
+        self._listeners.setdefault(device_id, []).append(listener)
+
+    def add_event_listener(self, listener: Listener) -> None:
+        """Listen for every event received from the broadcaster."""
+        self._event_listeners.append(listener)
+
+    def add_mode_listener(self, listener: Listener) -> None:
+        """Listen for updates for the hub mode."""
+        self._listeners.setdefault(ID_MODE, []).append(listener)
+
+    def add_hsm_listener(self, listener: Listener) -> None:
+        """Listen for updates for the hub HSM status."""
+        self._listeners.setdefault(ID_HSM_STATUS, []).append(listener)
+
+    def remove_device_listener(self, device_id: str, listener: Listener) -> None:
+        """Remove a listener for a particular device."""
+        listeners = self._listeners.get(device_id)
+        if listeners and listener in listeners:
+            listeners.remove(listener)
+
+    def remove_device_listeners(self, device_id: str) -> None:
+        """Remove all listeners for a particular device."""
+        self._listeners[device_id] = []
+
+    def remove_event_listener(self, listener: Listener) -> None:
+        """Remove a listener for every event."""
+        if listener in self._event_listeners:
+            self._event_listeners.remove(listener)
+
+    def remove_event_listeners(self) -> None:
+        """Remove all listeners for every event."""
+        self._event_listeners = []
+
+    def remove_mode_listeners(self) -> None:
+        """Remove all listeners for mode changes."""
+        self._listeners[ID_MODE] = []
+
+    def remove_hsm_status_listeners(self) -> None:
+        """Remove all listeners for HSM status changes."""
+        self._listeners[ID_HSM_STATUS] = []
+
+    async def events(
+        self, maxsize: int = DEFAULT_BROADCAST_BUFFER_SIZE
+    ) -> AsyncIterator[Event]:
+        """Iterate over received events.
+
+        Events are buffered in a queue of up to maxsize events. If the
+        consumer falls behind, new events are dropped. Iteration ends when
+        the client is disconnected.
+        """
+        queue: "asyncio.Queue[Optional[Event]]" = asyncio.Queue(maxsize)
+        self._queues.append(queue)
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            if queue in self._queues:
+                self._queues.remove(queue)
+
+    def _dispatch(self, event: Event) -> None:
+        device_id = event.device_id
+        if device_id is not None:
+            listeners = self._listeners.get(device_id)
+        elif event.attribute == "mode":
+            listeners = self._listeners.get(ID_MODE)
+        elif event.attribute == "hsmStatus":
+            listeners = self._listeners.get(ID_HSM_STATUS)
+        else:
+            listeners = None
+
+        if listeners:
+            for listener in listeners:
+                listener(event)
+        for listener in self._event_listeners:
+            listener(event)
+        for queue in self._queues:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                _LOGGER.warning("Broadcast event queue is full; dropping event")
+
+    async def _receive(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                content = await read_frame(reader)
+                if content is None:
+                    break
+                self._dispatch(Event(content))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            _LOGGER.warning("Lost connection to broadcaster: %s", e)
+        finally:
+            self._task = None
+            self._end_iterators()
+
+    def _end_iterators(self) -> None:
+        for queue in self._queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+
+async def _remove_stale_socket(path: str) -> None:
+    """Remove a socket left behind by a broadcaster that has exited.
+
+    A socket is only removed if nothing accepts connections on it. A
+    FileExistsError is raised if path is in use or is not a socket.
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{path} exists and is not a socket")
+
+    try:
+        _, writer = await asyncio.open_unix_connection(path)
+    except ConnectionRefusedError:
+        # Left behind by a process that didn't shut down cleanly
+        os.unlink(path)
+        return
+    writer.close()
+    raise FileExistsError(f"{path} is in use by another broadcaster")
+
+
+def _event_content(event: Event) -> Dict[str, Any]:
+    """Return the content of an event, in the form the hub sends it."""
+    return {
+        "deviceId": event.device_id,
+        "name": event.attribute,
+        "value": event.value,
+        "displayName": event.device_name,
+        "descriptionText": event.description,
+        "type": event.type,
+    }
+
+
+def encode_frame(message: Dict[str, Any]) -> bytes:
+    """Encode a message as a length-prefixed JSON frame."""
+    data = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    return _FRAME.pack(len(data)) + data
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """Read a frame from a stream, returning None at the end of the stream.
+
+    An IncompleteReadError is raised if the stream ends part way through a
+    frame, and a ValueError is raised if a frame is too large or invalid.
+    """
+    try:
+        header = await reader.readexactly(_FRAME.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+    (length,) = _FRAME.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame of {length} bytes is too large")
+    message = json.loads(await reader.readexactly(length))
+    if not isinstance(message, dict):
+        raise ValueError("Frame is not a JSON object")
+    return message
@@ -0,0 +1,104 @@
+"""Bookkeeping for hubs that load device details on demand."""
+
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+DEFAULT_CACHE_MAX_DEVICES = 200
+
+
+class DeviceCache:
+    """Tracks which devices a lazy hub knows about and which it has loaded.
+
+    A lazy hub only loads the hub's device list at startup. The list is kept
+    here as a catalog of lightweight device summaries, while full device
+    details are loaded on first access. Loaded devices are kept in least
+    recently used order, and once more than max_devices are loaded, the
+    least recently used devices that aren't pinned are evicted.
+    """
+
+    def __init__(
+        self,
+        is_pinned: Callable[[str], bool],
+        max_devices: int = DEFAULT_CACHE_MAX_DEVICES,
+    ):
+        """Initialize a DeviceCache.
+
+        is_pinned:
+          A function that returns True if a device, given its ID, must not be
+          evicted
+        max_devices:
+          The maximum number of devices to keep loaded. Pinned devices are
+          never evicted, so more may be loaded if many are pinned.
+        """
+        if max_devices < 1:
+            raise ValueError("Device cache must hold at least 1 device")
+
+        self.max_devices = max_devices
+        self.load_count = 0
+        self.eviction_count = 0
+        self._is_pinned = is_pinned
+        self._catalog: Dict[str, Dict[str, Any]] = {}
+        self._order: "OrderedDict[str, None]" = OrderedDict()
+
+    def __contains__(self, device_id: object) -> bool:
+        """Return True if a device is in the hub's device list."""
+        return device_id in self._catalog
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the IDs of the devices in the hub's device list."""
+        return iter(self._catalog)
+
+    def __len__(self) -> int:
+        """Return the number of devices in the hub's device list."""
+        return len(self._catalog)
+
+    @property
+    def device_ids(self) -> List[str]:
+        """Return the IDs of every device in the hub's device list."""
+        return list(self._catalog)
+
+    @property
+    def loaded_count(self) -> int:
+        """Return the number of loaded devices."""
+        return len(self._order)
+
+    def summary(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """Return the device list entry for a device."""
+        return self._catalog.get(device_id)
+
+    def set_catalog(self, devices: Iterable[Dict[str, Any]]) -> None:
+        """Replace the catalog with a device list from the hub."""
+        self._catalog = {str(dev["id"]): dev for dev in devices}
+
+    def touch(self, device_id: str) -> None:
+        """Mark a loaded device as the most recently used."""
+        order = self._order
+        if device_id in order:
+            order.move_to_end(device_id)
+        else:
+            order[device_id] = None
+            self.load_count += 1
+
+    def discard(self, device_id: str) -> None:
+        """Forget that a device is loaded."""
+        self._order.pop(device_id, None)
+
+    def evictable(self) -> List[str]:
+        """Return the loaded devices that should be evicted, oldest first.
+
+        The most recently used device is never evicted.
+        """
+        order = self._order
+        excess = len(order) - self.max_devices
+        if excess <= 0:
+            return []
+
+        is_pinned = self._is_pinned
+        device_ids: List[str] = []
+        for device_id in islice(order, len(order) - 1):
+            if not is_pinned(device_id):
+                device_ids.append(device_id)
+                if len(device_ids) == excess:
+                    break
+        return device_ids
@@ -0,0 +1,280 @@
+"""Exporting device attribute values as columns.
+
+A ColumnarExporter lays out every attribute of a hub's devices as one row of
+a set of parallel columns held in stdlib arrays, which expose their memory
+through the buffer protocol. The columns can be wrapped without copying by
+numpy.frombuffer or pyarrow.py_buffer, or read directly from Python.
+
+Strings are dictionary encoded: the device, attribute and string value
+columns hold indexes into lists of distinct strings, as in an Arrow
+dictionary array.
+"""
+
+from array import array
+import json
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from .types import Attribute, Event
+
+if TYPE_CHECKING:
+    from .hub import Hub
+
+_NAN = float("nan")
+
+
+class ColumnarState(NamedTuple):
+    """Attribute values, one row per device attribute.
+
+    device_index, attribute_index and string_index are arrays of signed
+    ints ("i"); numbers and timestamps are arrays of doubles ("d").
+    """
+
+    # The distinct device IDs, indexed by device_index
+    device_ids: List[str]
+    # The distinct attribute names, indexed by attribute_index
+    attributes: List[str]
+    # The distinct string values, indexed by string_index
+    strings: List[str]
+    device_index: "array[int]"
+    attribute_index: "array[int]"
+    # NUMBER and BOOL values, or NaN for strings and unknown values
+    numbers: "array[float]"
+    # String, ENUM and JSON values, or -1 for numbers and unknown values
+    string_index: "array[int]"
+    # The device's last_update when the row was last written
+    timestamps: "array[float]"
+
+    def rows(self) -> Iterable[Tuple[str, str, Any, float]]:
+        """Yield (device ID, attribute, value, timestamp) for each row."""
+        device_ids = self.device_ids
+        attributes = self.attributes
+        strings = self.strings
+        for d, a, n, s, t in zip(
+            self.device_index,
+            self.attribute_index,
+            self.numbers,
+            self.string_index,
+            self.timestamps,
+        ):
+            value = strings[s] if s >= 0 else (None if n != n else n)
+            yield device_ids[d], attributes[a], value, t
+
+
+class ColumnarExporter:
+    """Exports a hub's attribute values as columns.
+
+    The first export builds the columns in one pass over the hub's devices.
+    After that, the exporter follows the hub's events and device refreshes,
+    and each export only rewrites the rows of attributes that have changed,
+    in the same arrays. The columns are rebuilt in new arrays when devices
+    are added, removed, loaded or evicted, or gain or lose attributes.
+    Devices are compared by identity, so checking for those changes costs
+    one dict comparison rather than a pass over every attribute.
+    """
+
+    def __init__(
+        self,
+        hub: "Hub",
+        device_ids: Optional[Iterable[str]] = None,
+        attributes: Optional[Iterable[str]] = None,
+    ):
+        """Initialize a ColumnarExporter.
+
+        hub:
+          The hub to export values from
+        device_ids:
+          The devices to export (optional). Defaults to every loaded device.
+        attributes:
+          The attributes to export (optional). Defaults to every attribute.
+        """
+        self._hub = hub
+        self._device_ids = None if device_ids is None else list(device_ids)
+        self._wanted = None if attributes is None else set(attributes)
+        self._state: Optional[ColumnarState] = None
+        self._rows: Dict[Tuple[str, str], int] = {}
+        self._keys: List[Tuple[str, str]] = []
+        self._strings: List[str] = []
+        self._string_codes: Dict[str, int] = {}
+        self._devices: Dict[str, Any] = {}
+        self._dirty: Set[int] = set()
+        self._stale = True
+        self.build_count = 0
+        self.write_count = 0
+        hub.add_event_listener(self._handle_event)
+        hub._add_update_listener(self._handle_update)
+
+    def __repr__(self) -> str:
+        return f"<ColumnarExporter rows={len(self._keys)}>"
+
+    def close(self) -> None:
+        """Stop following the hub's events."""
+        self._hub.remove_event_listener(self._handle_event)
+        self._hub._remove_update_listener(self._handle_update)
+
+    def export(self) -> ColumnarState:
+        """Return the current attribute values as columns.
+
+        The returned arrays are reused, and overwritten in place, by later
+        exports until the columns need to be rebuilt. Copy them if an export
+        must not change.
+        """
+        state = self._state
+        if state is None or self._stale or self._devices_changed():
+            return self._build()
+        if len(state.strings) > 2 * len(self._keys) + 64:
+            # Replaced strings are never removed from the dictionary
+            return self._build()
+
+        dirty = self._dirty
+        if dirty:
+            devices = self._hub.devices
+            keys = self._keys
+            numbers = state.numbers
+            string_index = state.string_index
+            timestamps = state.timestamps
+            for row in dirty:
+                device_id, attr_name = keys[row]
+                device = devices[device_id]
+                attr = device.attributes.get(attr_name)
+                numbers[row], string_index[row] = self._encode(attr)
+                timestamps[row] = device.last_update
+            self.write_count += len(dirty)
+            dirty.clear()
+        return state
+
+    def _build(self) -> ColumnarState:
+        """Build the columns in new arrays."""
+        devices = self._hub.devices
+        if self._device_ids is None:
+            self._devices = dict(devices)
+        else:
+            self._devices = {
+                device_id: devices.get(device_id) for device_id in self._device_ids
+            }
+
+        wanted = self._wanted
+        rows: Dict[Tuple[str, str], int] = {}
+        keys: List[Tuple[str, str]] = []
+        attr_codes: Dict[str, int] = {}
+        state = ColumnarState(
+            [], [], [], array("i"), array("i"), array("d"), array("i"), array("d")
+        )
+        self._state = state
+        self._strings = state.strings
+        self._string_codes = {}
+        encode = self._encode
+        # Columns are built in lists and converted once, which is much
+        # faster than appending to arrays one value at a time
+        device_index: List[int] = []
+        attribute_index: List[int] = []
+        numbers: List[float] = []
+        string_index: List[int] = []
+        timestamps: List[float] = []
+
+        for device_id, device in self._devices.items():
+            if device is None:
+                continue
+            device_code = len(state.device_ids)
+            state.device_ids.append(device_id)
+            timestamp = device.last_update
+            for attr_name, attr in device.attributes.items():
+                if wanted is not None and attr_name not in wanted:
+                    continue
+                attr_code = attr_codes.get(attr_name)
+                if attr_code is None:
+                    attr_code = attr_codes[attr_name] = len(state.attributes)
+                    state.attributes.append(attr_name)
+                key = (device_id, attr_name)
+                rows[key] = len(keys)
+                keys.append(key)
+                value = attr.typed_value
+                if value.__class__ is float:
+                    numbers.append(value)
+                    string_index.append(-1)
+                else:
+                    number, string = encode(attr)
+                    numbers.append(number)
+                    string_index.append(string)
+                device_index.append(device_code)
+                attribute_index.append(attr_code)
+                timestamps.append(timestamp)
+
+        state.device_index.fromlist(device_index)
+        state.attribute_index.fromlist(attribute_index)
+        state.numbers.fromlist(numbers)
+        state.string_index.fromlist(string_index)
+        state.timestamps.fromlist(timestamps)
+
+        self._rows = rows
+        self._keys = keys
+        self._dirty.clear()
+        self._stale = False
+        self.build_count += 1
+        self.write_count += len(keys)
+        return state
+
+    def _encode(self, attr: Optional[Attribute]) -> Tuple[float, int]:
+        """Return the numbers and string_index values for an attribute."""
+        value = None if attr is None else attr.typed_value
+        if value is None:
+            return _NAN, -1
+        if isinstance(value, (float, int)):
+            return float(value), -1
+        if not isinstance(value, str):
+            value = json.dumps(value, separators=(",", ":"))
+        code = self._string_codes.get(value)
+        if code is None:
+            code = self._string_codes[value] = len(self._strings)
+            self._strings.append(value)
+        return _NAN, code
+
+    def _devices_changed(self) -> bool:
+        """Return True if the exported devices have been loaded or unloaded."""
+        devices = self._hub.devices
+        if self._device_ids is None:
+            return self._devices != devices
+        return any(
+            devices.get(device_id) is not device
+            for device_id, device in self._devices.items()
+        )
+
+    def _handle_event(self, event: Event) -> None:
+        device_id = event.device_id
+        if device_id is None or self._stale:
+            return
+        self._mark_changed(device_id, event.attribute)
+
+    def _handle_update(self, device_id: str, attr_names: Set[str]) -> None:
+        if self._stale:
+            return
+        device = self._devices.get(device_id)
+        if device is None:
+            return
+        attributes = device.attributes
+        for attr_name in attr_names:
+            if attr_name not in attributes and (device_id, attr_name) in self._rows:
+                # A removed attribute
+                self._stale = True
+                return
+            self._mark_changed(device_id, attr_name)
+
+    def _mark_changed(self, device_id: str, attr_name: str) -> None:
+        """Note that an attribute's value has changed."""
+        row = self._rows.get((device_id, attr_name))
+        if row is not None:
+            self._dirty.add(row)
+        elif device_id in self._devices and (
+            self._wanted is None or attr_name in self._wanted
+        ):
+            # A new attribute
+            self._stale = True
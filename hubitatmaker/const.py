@@ -1,3 +1,9 @@
+AGG_COUNT = "count"
+AGG_MAX = "max"
+AGG_MEAN = "mean"
+AGG_MIN = "min"
+AGG_SUM = "sum"
+
 CAP_ALARM = "Alarm"
 CAP_CARBON_DIOXIDE = "CarbonDioxideMeasurement"
 CAP_CARBON_MONOXIDE = "CarbonMonoxideDetector"
@@ -146,6 +152,10 @@ HSM_STATUS_ALL_DISARMED = "allDisarmed"
 
 ID_MODE = "hub_mode"
 ID_HSM_STATUS = "hub_hsm_status"
+ID_INVENTORY = "hub_inventory"
+
+EVENT_DEVICE_ADDED = "deviceAdded"
+EVENT_DEVICE_REMOVED = "deviceRemoved"
 
 STATE_ARMED_AWAY = "armed away"
 STATE_ARMED_HOME = "armed home"
@@ -1,6 +1,7 @@
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from aiohttp import ClientResponse
+if TYPE_CHECKING:
+    from aiohttp import ClientResponse
 
 
 class ConnectionError(Exception):
@@ -25,9 +26,10 @@ class InvalidMode(Exception):
 class RequestError(Exception):
     """An error indicating that a request failed."""
 
-    def __init__(self, resp: ClientResponse, **kwargs):
+    def __init__(self, resp: "ClientResponse", **kwargs):
         # Pyright doesn't like the @reify used on ClientResponse.url
         any_resp: Any = resp
         super().__init__(
             f"{resp.method} {any_resp.url} - [{resp.status}] {resp.reason}"
         )
+        self.status = resp.status
@@ -0,0 +1,316 @@
+"""Management of many hubs in one process."""
+
+import asyncio
+from functools import partial
+from logging import getLogger
+from ssl import SSLContext
+from types import MappingProxyType
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+from urllib.parse import quote
+
+import aiohttp
+
+from . import server
+from .hub import Hub, _get_local_address
+from .types import Device, Event
+
+FleetListener = Callable[[str, Event], None]
+
+DEFAULT_FLEET_START_CONCURRENCY = 4
+DEFAULT_FLEET_CONNECTION_LIMIT = 32
+DEFAULT_FLEET_EVENT_QUEUE_SIZE = 1024
+
+_LOGGER = getLogger(__name__)
+
+
+class FleetDevices(Mapping[Tuple[str, str], Device]):
+    """A read-only view of the devices of every hub in a fleet.
+
+    Devices are keyed by (hub key, device ID). The view reads through to the
+    hubs, so it's always up to date and never copies device maps.
+    """
+
+    def __init__(self, hubs: Mapping[str, Hub]):
+        self._hubs = hubs
+
+    def __getitem__(self, key: Tuple[str, str]) -> Device:
+        hub_key, device_id = key
+        return self._hubs[hub_key].devices[device_id]
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        for hub_key, hub in self._hubs.items():
+            for device_id in hub.devices:
+                yield hub_key, device_id
+
+    def __len__(self) -> int:
+        return sum(len(hub.devices) for hub in self._hubs.values())
+
+
+class HubFleet:
+    """A collection of hubs managed together.
+
+    Hubs in a fleet share one aiohttp connection pool and one event server.
+    Each hub's events are posted to its own path on the server (/<hub key>),
+    so events are routed to the right hub without a server thread per hub.
+    Hubs are started concurrently, with at most start_concurrency starting at
+    once.
+
+    Devices are available in a merged namespace keyed by (hub key, device
+    ID), and fleet listeners receive the events posted by every hub.
+    """
+
+    def __init__(
+        self,
+        port: Optional[int] = None,
+        event_url: Optional[str] = None,
+        ssl_context: Optional[SSLContext] = None,
+        start_concurrency: int = DEFAULT_FLEET_START_CONCURRENCY,
+        connection_limit: int = DEFAULT_FLEET_CONNECTION_LIMIT,
+    ):
+        """Initialize a HubFleet.
+
+        port:
+          The port the shared event server listens on (optional). Defaults to
+          a random open port.
+        event_url:
+          The base URL that hubs should send events to (optional). Each hub
+          appends its own path. Defaults to the server's actual address and
+          port.
+        ssl_context:
+          The SSLContext the event server will use (optional)
+        start_concurrency:
+          The maximum number of hubs that may be starting at once
+        connection_limit:
+          The maximum number of simultaneous connections to all hubs
+        """
+        self.port = port
+        self.event_url = event_url
+        self.ssl_context = ssl_context
+        self.start_concurrency = start_concurrency
+        self.connection_limit = connection_limit
+
+        self._hubs: Dict[str, Hub] = {}
+        self._devices = FleetDevices(self._hubs)
+        self._listeners: List[FleetListener] = []
+        self._queues: List["asyncio.Queue[Tuple[str, Event]]"] = []
+        self._server: Optional[server.Server] = None
+        self._connector: Optional[aiohttp.BaseConnector] = None
+
+    def __repr__(self) -> str:
+        return f"<HubFleet hubs={len(self._hubs)}>"
+
+    @property
+    def hubs(self) -> Mapping[str, Hub]:
+        """Return the hubs in the fleet, by key."""
+        return MappingProxyType(self._hubs)
+
+    @property
+    def devices(self) -> FleetDevices:
+        """Return the devices of every hub, keyed by (hub key, device ID)."""
+        return self._devices
+
+    def add_hub(
+        self,
+        host: str,
+        app_id: str,
+        access_token: str,
+        key: Optional[str] = None,
+        keep_raw: bool = False,
+        snapshot_path: Optional[str] = None,
+        resolve_mac: bool = True,
+    ) -> Hub:
+        """Add a hub to the fleet.
+
+        key:
+          A unique name for the hub (optional). Defaults to the hub's host.
+
+        The other parameters are passed to the Hub. A hub added after the
+        fleet has started must be started with its start() method.
+        """
+        hub = Hub(
+            host,
+            app_id,
+            access_token,
+            keep_raw=keep_raw,
+            snapshot_path=snapshot_path,
+            resolve_mac=resolve_mac,
+            connector=self._connector,
+        )
+        key = key or hub.host
+        if key in self._hubs:
+            raise ValueError(f"Fleet already has a hub '{key}'")
+        self._hubs[key] = hub
+        if self._server is not None:
+            self._attach(key, hub)
+        return hub
+
+    def remove_hub(self, key: str) -> None:
+        """Stop a hub and remove it from the fleet."""
+        hub = self._hubs.pop(key)
+        if self._server is not None:
+            self._server.remove_handler(_hub_path(key))
+        hub.stop()
+
+    def add_listener(self, listener: FleetListener) -> None:
+        """Listen for events from every hub.
+
+        Listeners are called with the key of the hub that sent the event and
+        the event.
+        """
+        self._listeners.append(listener)
+
+    def remove_listeners(self) -> None:
+        """Remove all fleet listeners."""
+        self._listeners = []
+
+    async def events(
+        self, maxsize: int = DEFAULT_FLEET_EVENT_QUEUE_SIZE
+    ) -> AsyncGenerator[Tuple[str, Event], None]:
+        """Iterate over (hub key, event) pairs for events from every hub.
+
+        Events are buffered in a queue of up to maxsize events. If the
+        consumer falls behind, new events are dropped.
+        """
+        queue: "asyncio.Queue[Tuple[str, Event]]" = asyncio.Queue(maxsize)
+        self._queues.append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._queues.remove(queue)
+
+    def query_devices(
+        self,
+        capability: Optional[str] = None,
+        where: Optional[Mapping[str, Any]] = None,
+    ) -> List[Tuple[str, Device]]:
+        """Return (hub key, device) pairs for matching devices on every hub.
+
+        See Hub.query_devices.
+        """
+        return [
+            (key, device)
+            for key, hub in self._hubs.items()
+            for device in hub.query_devices(capability, where)
+        ]
+
+    def find_devices(
+        self,
+        name: Optional[str] = None,
+        type: Optional[str] = None,
+        prefix: bool = False,
+    ) -> List[Tuple[str, Device]]:
+        """Return (hub key, device) pairs for matching devices on every hub.
+
+        See Hub.find_devices.
+        """
+        return [
+            (key, device)
+            for key, hub in self._hubs.items()
+            for device in hub.find_devices(name, type, prefix)
+        ]
+
+    async def start(self) -> Dict[str, Exception]:
+        """Start the shared event server and every hub.
+
+        Return the errors raised by hubs that failed to start, by hub key. A
+        hub that fails to start doesn't prevent the others from starting.
+        """
+        if not self._hubs:
+            return {}
+
+        if self._connector is None:
+            self._connector = aiohttp.TCPConnector(
+                ssl=False, limit=self.connection_limit
+            )
+            for hub in self._hubs.values():
+                hub._connector = self._connector
+
+        if self._server is None:
+            self._start_server()
+
+        semaphore = asyncio.Semaphore(self.start_concurrency)
+
+        async def start_hub(hub: Hub) -> None:
+            async with semaphore:
+                await hub.start()
+
+        keys = list(self._hubs)
+        results = await asyncio.gather(
+            *(start_hub(self._hubs[key]) for key in keys), return_exceptions=True
+        )
+
+        errors: Dict[str, Exception] = {}
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):
+                _LOGGER.error("Unable to start hub %s: %s", key, result)
+                errors[key] = result
+        return errors
+
+    async def stop(self) -> None:
+        """Stop every hub, the shared event server, and the connection pool."""
+        for hub in self._hubs.values():
+            hub.stop()
+        if self._server is not None:
+            self._server.stop()
+            self._server = None
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
+        self._listeners = []
+
+    def _start_server(self) -> None:
+        """Start the shared event server and attach every hub to it."""
+        # Assume the hubs share a network
+        address = _get_local_address(next(iter(self._hubs.values())).host)
+        self._server = server.create_server(
+            self._handle_unrouted_event, address, self.port or 0, self.ssl_context
+        )
+        self._server.start()
+        _LOGGER.debug("Fleet listening on %s:%d", address, self._server.port)
+
+        for key, hub in self._hubs.items():
+            self._attach(key, hub)
+
+    def _attach(self, key: str, hub: Hub) -> None:
+        """Route a hub's events through the shared event server."""
+        assert self._server is not None
+        self._server.add_handler(_hub_path(key), partial(self._handle_event, key, hub))
+        base_url = str(self.event_url or self._server.url).rstrip("/")
+        hub._use_server(self._server, f"{base_url}/{quote(key, safe='')}")
+
+    def _handle_event(self, key: str, hub: Hub, event: Dict[str, Any]) -> None:
+        """Process an event for a hub, then send it to fleet listeners."""
+        # Only events the hub accepted are passed on, sharing the hub's Event
+        evt = hub._process_event(event, bool(self._listeners or self._queues))
+        if evt is None:
+            return
+
+        for listener in self._listeners:
+            listener(key, evt)
+        for queue in self._queues:
+            try:
+                queue.put_nowait((key, evt))
+            except asyncio.QueueFull:
+                _LOGGER.warning("Fleet event queue is full; dropping event")
+
+    def _handle_unrouted_event(self, event: Dict[str, Any]) -> None:
+        _LOGGER.warning("Received event for an unknown hub: %s", event)
+
+
+def _hub_path(key: str) -> str:
+    """Return the event server path for a hub.
+
+    This is the decoded path; the hub's event URL holds the key URL-encoded.
+    """
+    return "/" + key
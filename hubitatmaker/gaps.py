@@ -0,0 +1,109 @@
+"""Detection of gaps in the events received from a hub."""
+
+from typing import Optional
+
+DEFAULT_GAP_CHECK_INTERVAL = 30.0
+DEFAULT_GAP_FACTOR = 10.0
+DEFAULT_GAP_MIN_SILENCE = 120.0
+DEFAULT_GAP_MAX_SILENCE = 3600.0
+DEFAULT_RESYNC_MAX_DEVICES = 50
+
+
+class GapDetector:
+    """Decides when a hub has been silent for suspiciously long.
+
+    The detector is given the hub's running event count and the time of its
+    last event at regular intervals. From those it learns the hub's usual
+    event rate (as an exponentially weighted moving average), and reports a
+    gap when the hub has been silent for factor times the expected time
+    between events, clamped to [min_silence, max_silence]. A busy hub that
+    goes quiet is noticed quickly, while a hub that rarely sends events
+    isn't resynchronized constantly.
+
+    Each silence is reported once; the detector is re-armed by the next
+    event.
+    """
+
+    def __init__(
+        self,
+        factor: float = DEFAULT_GAP_FACTOR,
+        min_silence: float = DEFAULT_GAP_MIN_SILENCE,
+        max_silence: float = DEFAULT_GAP_MAX_SILENCE,
+        smoothing: float = 0.1,
+    ):
+        """Initialize a GapDetector.
+
+        factor:
+          How many expected inter-event intervals of silence indicate a gap
+        min_silence:
+          The shortest silence that is considered a gap, in seconds
+        max_silence:
+          The longest silence that is not considered a gap, in seconds
+        smoothing:
+          The weight of each new rate sample in the moving average
+        """
+        self.factor = factor
+        self.min_silence = min_silence
+        self.max_silence = max_silence
+        self.smoothing = smoothing
+        self._rate: Optional[float] = None
+        self._last_count: Optional[int] = None
+        self._last_time: Optional[float] = None
+        self._start_time: Optional[float] = None
+        self._reported = False
+
+    @property
+    def rate(self) -> Optional[float]:
+        """Return the learned event rate, in events per second."""
+        return self._rate
+
+    @property
+    def threshold(self) -> float:
+        """Return the length of silence, in seconds, that indicates a gap."""
+        if not self._rate:
+            return self.max_silence
+        silence = self.factor / self._rate
+        return min(max(silence, self.min_silence), self.max_silence)
+
+    def observe(
+        self, event_count: int, last_event_time: Optional[float], now: float
+    ) -> bool:
+        """Update the baseline, and return True if a new gap was detected.
+
+        event_count:
+          The total number of events the hub has received
+        last_event_time:
+          When the hub last received an event, or None if it hasn't
+        now:
+          The current time, on the same clock as last_event_time
+        """
+        last_count = self._last_count
+        last_time = self._last_time
+        self._last_count = event_count
+        self._last_time = now
+        if last_count is None or last_time is None or self._start_time is None:
+            self._start_time = now
+            return False
+
+        new_events = event_count - last_count
+        if new_events > 0:
+            self._reported = False
+
+        if last_event_time is None or last_event_time < self._start_time:
+            last_event_time = self._start_time
+        silence = now - last_event_time
+        if silence > self.threshold:
+            if self._reported:
+                return False
+            self._reported = True
+            return True
+
+        # Only learn from periods that aren't part of a gap
+        elapsed = now - last_time
+        if elapsed > 0:
+            sample = new_events / elapsed
+            if self._rate is None:
+                self._rate = sample
+            else:
+                self._rate += self.smoothing * (sample - self._rate)
+        return False
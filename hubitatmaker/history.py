@@ -0,0 +1,326 @@
+"""In-memory attribute history."""
+
+from array import array
+from math import isnan
+from time import time
+from typing import (
+    AbstractSet,
+    Any,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from .types import is_number
+
+DEFAULT_HISTORY_CAPACITY = 1024
+
+_NAN = float("nan")
+
+
+class AttributeHistory:
+    """A fixed-capacity ring buffer of values for one device attribute.
+
+    Timestamps are stored in an array of doubles. Numeric attributes store
+    their values in a parallel array of doubles (with None stored as NaN);
+    other attributes store an array of integer codes into a table of the
+    distinct values seen. Once the buffer is full, each new value overwrites
+    the oldest one.
+
+    Windowed queries walk the buffer in place from the newest entry back to
+    the start of the window, so they never copy the buffer.
+    """
+
+    def __init__(self, capacity: int, numeric: bool):
+        if capacity < 1:
+            raise ValueError("History capacity must be at least 1")
+
+        self.capacity = capacity
+        self.numeric = numeric
+        # The declared data type of the attribute, if known
+        self.data_type: Optional[str] = None
+        self._times = array("d", [0.0]) * capacity
+        self._values = array("d" if numeric else "l", [0]) * capacity
+        self._symbols: List[Any] = []
+        self._symbol_codes: Dict[Hashable, int] = {}
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Tuple[float, Any]]:
+        """Iterate over (timestamp, value) pairs from oldest to newest."""
+        for i in range(self._size - 1, -1, -1):
+            yield self._entry(i)
+
+    def append(self, value: Any, timestamp: Optional[float] = None) -> None:
+        """Add a value to the history."""
+        i = self._next
+        self._times[i] = time() if timestamp is None else timestamp
+        self._values[i] = self._encode(value)
+        self._next = (i + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def latest(self) -> Optional[Tuple[float, Any]]:
+        """Return the newest (timestamp, value) pair."""
+        if self._size == 0:
+            return None
+        return self._entry(0)
+
+    def window(
+        self, seconds: Optional[float] = None, now: Optional[float] = None
+    ) -> Iterator[Tuple[float, Any]]:
+        """Iterate over (timestamp, value) pairs in a window, newest first.
+
+        The window covers the given number of seconds up to now (the current
+        time by default). With no window, the whole buffer is covered.
+        """
+        for i in self._window_offsets(seconds, now):
+            yield self._entry(i)
+
+    def min(
+        self, seconds: Optional[float] = None, now: Optional[float] = None
+    ) -> Optional[float]:
+        """Return the minimum numeric value in a window."""
+        result: Optional[float] = None
+        for value in self._numbers(seconds, now):
+            if result is None or value < result:
+                result = value
+        return result
+
+    def max(
+        self, seconds: Optional[float] = None, now: Optional[float] = None
+    ) -> Optional[float]:
+        """Return the maximum numeric value in a window."""
+        result: Optional[float] = None
+        for value in self._numbers(seconds, now):
+            if result is None or value > result:
+                result = value
+        return result
+
+    def mean(
+        self, seconds: Optional[float] = None, now: Optional[float] = None
+    ) -> Optional[float]:
+        """Return the mean of the numeric values recorded in a window."""
+        total = 0.0
+        count = 0
+        for value in self._numbers(seconds, now):
+            total += value
+            count += 1
+        return total / count if count else None
+
+    def seen(
+        self,
+        values: AbstractSet[Any],
+        seconds: Optional[float] = None,
+        now: Optional[float] = None,
+    ) -> bool:
+        """Return True if any of the given values was recorded in a window."""
+        for _, value in self.window(seconds, now):
+            if value in values:
+                return True
+        return False
+
+    def last_change(
+        self, seconds: Optional[float] = None, now: Optional[float] = None
+    ) -> Optional[float]:
+        """Return the time at which the value last changed in a window.
+
+        This is the timestamp of the newest entry whose value differs from
+        the entry before it. If every recorded value is the same, the oldest
+        timestamp is returned. None is returned if the value didn't change
+        within the window.
+        """
+        if self._size == 0:
+            return None
+
+        change = self._size - 1
+        newest = self._raw(0)
+        for i in range(1, self._size):
+            if not self._same(self._raw(i), newest):
+                change = i - 1
+                break
+
+        timestamp = self._times[self._index(change)]
+        if seconds is not None:
+            start = (time() if now is None else now) - seconds
+            if timestamp < start:
+                return None
+        return timestamp
+
+    def converted(self, numeric: bool) -> "AttributeHistory":
+        """Return a copy of this history with numeric or symbolic storage.
+
+        When converting to numeric storage, values that aren't numbers are
+        stored as None.
+        """
+        history = AttributeHistory(self.capacity, numeric)
+        history.data_type = self.data_type
+        for timestamp, value in self:
+            history.append(value, timestamp)
+        return history
+
+    def _numbers(
+        self, seconds: Optional[float], now: Optional[float]
+    ) -> Iterator[float]:
+        if not self.numeric:
+            return
+        values = self._values
+        for i in self._window_offsets(seconds, now):
+            value = values[self._index(i)]
+            if not isnan(value):
+                yield value
+
+    def _window_offsets(
+        self, seconds: Optional[float], now: Optional[float]
+    ) -> Iterator[int]:
+        """Iterate over the offsets (0 is the newest) of entries in a window."""
+        if seconds is None:
+            yield from range(self._size)
+            return
+
+        start = (time() if now is None else now) - seconds
+        times = self._times
+        for i in range(self._size):
+            if times[self._index(i)] < start:
+                return
+            yield i
+
+    def _index(self, offset: int) -> int:
+        """Return the buffer index of an entry, counting back from the newest."""
+        return (self._next - 1 - offset) % self.capacity
+
+    def _raw(self, offset: int) -> float:
+        return self._values[self._index(offset)]
+
+    def _same(self, a: float, b: float) -> bool:
+        return a == b or (self.numeric and isnan(a) and isnan(b))
+
+    def _entry(self, offset: int) -> Tuple[float, Any]:
+        i = self._index(offset)
+        return self._times[i], self._decode(self._values[i])
+
+    def _encode(self, value: Any) -> Any:
+        if self.numeric:
+            if value is None:
+                return _NAN
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return _NAN
+
+        try:
+            code = self._symbol_codes.get(value)
+        except TypeError:
+            # Unhashable values, such as decoded JSON, are stored as strings
+            value = str(value)
+            code = self._symbol_codes.get(value)
+        if code is None:
+            if len(self._symbols) >= 2 * self.capacity:
+                self._compact_symbols()
+            code = len(self._symbols)
+            self._symbols.append(value)
+            self._symbol_codes[value] = code
+        return code
+
+    def _compact_symbols(self) -> None:
+        """Drop symbols that are no longer referenced by the buffer.
+
+        This keeps the symbol table bounded for attributes that see many
+        distinct values.
+        """
+        old_symbols = self._symbols
+        self._symbols = []
+        self._symbol_codes = {}
+        values = self._values
+        for offset in range(self._size - 1, -1, -1):
+            i = self._index(offset)
+            values[i] = self._encode(old_symbols[values[i]])
+
+    def _decode(self, value: Any) -> Any:
+        if self.numeric:
+            return None if isnan(value) else value
+        return self._symbols[value]
+
+
+class HistoryStore:
+    """Attribute histories for a collection of devices.
+
+    A history buffer is created for each (device ID, attribute) pair the
+    first time a value is recorded for it. Buffers for NUMBER attributes
+    store their values as doubles, and other buffers store symbols. If a
+    NUMBER attribute records a value that isn't a number, its buffer is
+    converted to symbolic storage so the value isn't lost.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_HISTORY_CAPACITY,
+        attributes: Optional[Iterable[str]] = None,
+    ):
+        """Initialize a HistoryStore.
+
+        capacity:
+          The number of entries kept for each device attribute
+        attributes:
+          The attribute names to record (optional). Defaults to all
+          attributes.
+        """
+        self.capacity = capacity
+        self.attributes: Optional[AbstractSet[str]] = (
+            frozenset(attributes) if attributes is not None else None
+        )
+        self._histories: Dict[Tuple[str, str], AttributeHistory] = {}
+
+    def __len__(self) -> int:
+        return len(self._histories)
+
+    def get(self, device_id: str, attr_name: str) -> Optional[AttributeHistory]:
+        """Return the history for a device attribute, if one exists."""
+        return self._histories.get((device_id, attr_name))
+
+    def record(
+        self,
+        device_id: str,
+        attr_name: str,
+        value: Any,
+        timestamp: Optional[float] = None,
+        data_type: Optional[str] = None,
+    ) -> None:
+        """Record a device attribute value.
+
+        data_type is the attribute's declared data type (see Attribute.type).
+        If it isn't given, a buffer is numeric if its first value is a
+        number.
+        """
+        if self.attributes is not None and attr_name not in self.attributes:
+            return
+
+        key = (device_id, attr_name)
+        history = self._histories.get(key)
+        if history is None:
+            numeric = data_type == "NUMBER" if data_type else is_number(value)
+            history = self._histories[key] = AttributeHistory(self.capacity, numeric)
+            history.data_type = data_type
+        elif history.numeric:
+            if value is not None and not is_number(value):
+                history = self._histories[key] = history.converted(False)
+        elif data_type != history.data_type and data_type:
+            # The attribute's declared type has changed
+            history.data_type = data_type
+            if data_type == "NUMBER" and all(
+                v is None or is_number(v) for _, v in history
+            ):
+                history = self._histories[key] = history.converted(True)
+        history.append(value, timestamp)
+
+    def remove_device(self, device_id: str) -> None:
+        """Drop all histories for a device."""
+        for key in [k for k in self._histories if k[0] == device_id]:
+            del self._histories[key]
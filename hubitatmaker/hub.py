@@ -1,11 +1,26 @@
 """Hubitat API."""
+
 from contextlib import contextmanager
-from logging import getLogger
+from logging import DEBUG, getLogger
 import re
 import socket
 from ssl import SSLContext
+from time import monotonic
 from types import MappingProxyType
-from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Union
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 from urllib.parse import ParseResult, quote, urlparse
 
 import asyncio
@@ -13,23 +28,64 @@ import aiohttp
 import getmac
 
 from . import server
-from .const import ID_HSM_STATUS, ID_MODE
+from .aggregate import Aggregate, AggregateSet
+from .cache import DEFAULT_CACHE_MAX_DEVICES, DeviceCache
+from .const import (
+    EVENT_DEVICE_ADDED,
+    EVENT_DEVICE_REMOVED,
+    ID_HSM_STATUS,
+    ID_INVENTORY,
+    ID_MODE,
+)
 from .error import InvalidConfig, InvalidMode, InvalidToken, RequestError
-from .types import Device, Event, Mode
+from .gaps import (
+    DEFAULT_GAP_CHECK_INTERVAL,
+    DEFAULT_GAP_FACTOR,
+    DEFAULT_RESYNC_MAX_DEVICES,
+    GapDetector,
+)
+from .history import DEFAULT_HISTORY_CAPACITY, HistoryStore
+from .index import DeviceIndex
+from .journal import (
+    DEFAULT_JOURNAL_BACKUP_COUNT,
+    DEFAULT_JOURNAL_MAX_BYTES,
+    Journal,
+    read_journal,
+)
+from .poller import (
+    DEFAULT_POLL_BULK_FRACTION,
+    DEFAULT_POLL_MAX_INTERVAL,
+    DEFAULT_POLL_MIN_INTERVAL,
+    Poller,
+)
+from .readiness import Readiness
+from .snapshot import load_snapshot, save_snapshot
+from .types import Device, Event, MetadataPool, Mode
+from .versioned import VersionedState
+from .watchdog import DEFAULT_WATCHDOG_BUDGET, DEFAULT_WATCHDOG_MAX_AGE, Watchdog
 
 Listener = Callable[[Event], None]
+# Called with a device ID and the names of attributes that were added,
+# removed or changed when a device is updated from a full payload
+UpdateListener = Callable[[str, Set[str]], None]
 
 MAX_REQUEST_ATTEMPT_COUNT = 3
 REQUEST_RETRY_DELAY_INTERVAL = 0.5
+MAC_CACHE_TTL = 3600.0
+EVENT_URL_CHECK_DELAY = 300.0
 
 _LOGGER = getLogger(__name__)
 
+# Resolved MAC addresses by host, with the time each was resolved
+_mac_cache: Dict[str, Tuple[float, str]] = {}
+
 
 class Hub:
     """A representation of a Hubitat hub.
 
     This class downloads initial device data from a Hubitat hub and waits for
-    the hub to push it state updates for devices.
+    the hub to push it state updates for devices. If polling is enabled, the
+    hub is polled for updates instead.
     """
 
     api_url: str
@@ -37,7 +93,6 @@ class Hub:
     host: str
     scheme: str
     token: str
-    mac: str
 
     _server: server.Server
 
@@ -49,6 +104,10 @@ class Hub:
         port: Optional[int] = None,
         event_url: Optional[str] = None,
         ssl_context: Optional[SSLContext] = None,
+        keep_raw: bool = False,
+        snapshot_path: Optional[str] = None,
+        resolve_mac: bool = True,
+        connector: Optional[aiohttp.BaseConnector] = None,
     ):
         """Initialize a Hubitat hub interface.
 
@@ -67,23 +126,73 @@ class Hub:
         ssl_context:
           The SSLContext the event listener server will use. Passing in a SSLContext object
           will make the event listener server HTTPS only.
+        keep_raw:
+          Retain the raw JSON payloads received from the hub on devices,
+          attributes and events (optional). Defaults to False.
+        snapshot_path:
+          A file to persist hub state to (optional). If a snapshot exists when
+          the hub is started, its state is used right away and reconciled
+          with the hub in the background.
+        resolve_mac:
+          Look up the hub's MAC address (optional). Defaults to True. If
+          False, mac is always an empty string.
+        connector:
+          An aiohttp connector to make requests with (optional), so that
+          connections can be pooled and shared with other hubs. By default,
+          each request uses its own connection.
         """
         if not host or not app_id or not access_token:
             raise InvalidConfig()
 
         self._devices: Dict[str, Device] = {}
+        self._metadata = MetadataPool()
+        self._index = DeviceIndex(self._devices)
+        self._aggregates = AggregateSet()
+        self._history: Optional[HistoryStore] = None
+        self._journal: Optional[Journal] = None
+        self._watchdog: Optional[Watchdog] = None
+        self._poller: Optional[Poller] = None
+        self._device_cache: Optional[DeviceCache] = None
+        self._device_loads: Dict[str, "asyncio.Task[None]"] = {}
+        self._versioned_state: Optional[VersionedState] = None
         self._listeners: Dict[str, List[Listener]] = {}
+        self._event_listeners: List[Listener] = []
+        self._update_listeners: List[UpdateListener] = []
         self._modes: List[Mode] = []
+        self._modes_by_name: Dict[str, Mode] = {}
+        self._active_mode: Optional[Mode] = None
         self._mode_supported = None
         self._hsm_status: Optional[str] = None
         self._hsm_supported = None
+        self._stale = False
+        self._reconcile_task: Optional["asyncio.Task[None]"] = None
+        self._readiness = Readiness()
+        self._mac_future: Optional["asyncio.Future[str]"] = None
+        self._mac_host: Optional[str] = None
+        self._registered_event_url: Optional[str] = None
+        self._event_url_check_task: Optional["asyncio.Task[None]"] = None
+        self._last_event_time: Optional[float] = None
+        self._event_count = 0
+        self._event_devices: Set[str] = set()
+        # Event times, counts and senders are only tracked while something
+        # needs them (gap detection, or checking the event URL registration)
+        self._track_events = False
+        self._gap_detector: Optional[GapDetector] = None
+        self._gap_check_interval = DEFAULT_GAP_CHECK_INTERVAL
+        self._gap_task: Optional["asyncio.Task[None]"] = None
+        self._resync_task: Optional["asyncio.Task[None]"] = None
+        self.resync_max_devices = DEFAULT_RESYNC_MAX_DEVICES
+        self._connector = connector
+        self._owns_server = True
 
         self.event_url = _get_event_url(port, event_url)
         self.port = _get_event_port(port, event_url)
         self.app_id = app_id
         self.token = access_token
-        self.mac = ""
+        self.resolve_mac = resolve_mac
         self.ssl_context = ssl_context
+        self.keep_raw = keep_raw
+        self.snapshot_path = snapshot_path
 
         self.set_host(host)
 
@@ -98,13 +207,58 @@ class Hub:
         """Return a list of devices managed by the Hubitat hub."""
         return MappingProxyType(self._devices)
 
+    @property
+    def device_cache(self) -> Optional[DeviceCache]:
+        """Return the hub's device cache, if lazy loading is enabled."""
+        return self._device_cache
+
+    @property
+    def history(self) -> Optional[HistoryStore]:
+        """Return the attribute history store, if history is enabled."""
+        return self._history
+
+    @property
+    def versioned_state(self) -> Optional[VersionedState]:
+        """Return the hub's versioned state, if it has been enabled."""
+        return self._versioned_state
+
+    @property
+    def watchdog(self) -> Optional[Watchdog]:
+        """Return the staleness watchdog, if it is enabled."""
+        return self._watchdog
+
+    @property
+    def poller(self) -> Optional[Poller]:
+        """Return the hub's poller, if polling is enabled."""
+        return self._poller
+
+    @property
+    def mac(self) -> str:
+        """Return the MAC address of the hub, if it is known.
+
+        Looking up a MAC address can block, so when this is read from a
+        running event loop before the address has been resolved, it returns
+        an empty string and starts resolving the address in the background.
+        Use get_mac() to wait for the address.
+        """
+        if not self.resolve_mac:
+            return ""
+        mac = _get_cached_mac(self.host)
+        if mac is not None:
+            return mac
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return _resolve_mac_address(self.host)
+        self._start_mac_lookup()
+        return ""
+
     @property
     def mode(self) -> Optional[str]:
         """Return the current hub mode."""
-        for mode in self._modes:
-            if mode.active:
-                return mode.name
-        return None
+        if self._active_mode is None:
+            return None
+        return self._active_mode.name
 
     @property
     def mode_supported(self) -> Optional[bool]:
@@ -123,12 +277,323 @@ class Hub:
     def hsm_supported(self) -> Optional[bool]:
         return self._hsm_supported
 
+    @property
+    def readiness(self) -> Readiness:
+        """Return the signals that track the progress of startup."""
+        return self._readiness
+
+    @property
+    def stale(self) -> bool:
+        """Return True if state loaded from a snapshot hasn't been reconciled.
+
+        A hub started from a snapshot serves the snapshot's state until it
+        has been refreshed from the hub in the background.
+        """
+        return self._stale
+
+    async def get_mac(self) -> str:
+        """Return the MAC address of the hub, resolving it if necessary.
+
+        The lookup runs in an executor, and its result is cached for each host
+        for MAC_CACHE_TTL seconds.
+        """
+        if not self.resolve_mac:
+            return ""
+        mac = _get_cached_mac(self.host)
+        if mac is not None:
+            return mac
+        return await self._start_mac_lookup()
+
+    def query_devices(
+        self,
+        capability: Optional[str] = None,
+        where: Optional[Mapping[str, Any]] = None,
+    ) -> List[Device]:
+        """Return the devices matching all of the given conditions.
+
+        capability:
+          Only match devices with this capability (optional)
+        where:
+          A mapping of attribute names to predicates (optional). A predicate
+          may be a value to match exactly, a set (or list or tuple) of values
+          to match any of, or a Range to match numeric values within.
+          Attribute values are compared by their typed_value.
+
+        With no conditions, all devices are returned.
+        """
+        ids = self._index.query(capability, where)
+        if ids is None:
+            return list(self._devices.values())
+        return [self._devices[i] for i in ids if i in self._devices]
+
+    def enable_history(
+        self,
+        capacity: int = DEFAULT_HISTORY_CAPACITY,
+        attributes: Optional[Iterable[str]] = None,
+    ) -> HistoryStore:
+        """Start recording attribute values as they change.
+
+        capacity:
+          The number of values kept for each device attribute
+        attributes:
+          The attribute names to record (optional). Defaults to all attributes.
+
+        Calling this again replaces the existing history store.
+        """
+        self._history = HistoryStore(capacity, attributes)
+        return self._history
+
+    def enable_versioned_state(self) -> VersionedState:
+        """Start publishing immutable, versioned views of device state.
+
+        Device objects are updated in place as events arrive, so code running
+        in other threads may see them part way through an update. The
+        returned VersionedState's current view is an immutable mapping of
+        device IDs to DeviceStates, and a new view with a higher version is
+        published each time a device changes. Views are tries that share
+        everything but the path to the changed device with earlier versions,
+        so publishing a change copies O(log n) small nodes for a hub with n
+        devices, rather than the whole view.
+        """
+        if self._versioned_state is None:
+            self._versioned_state = VersionedState(self._devices)
+        return self._versioned_state
+
+    def enable_watchdog(
+        self,
+        budget: int = DEFAULT_WATCHDOG_BUDGET,
+        max_age: float = DEFAULT_WATCHDOG_MAX_AGE,
+    ) -> Watchdog:
+        """Start refreshing stale devices in the background.
+
+        budget:
+          The maximum number of devices to refresh per minute
+        max_age:
+          The number of seconds without an update after which a device is
+          considered stale
+
+        The device that has gone longest without an update is refreshed
+        first, and listeners are sent events for any values that changed.
+        If this is called outside of a running event loop, the watchdog is
+        started when the hub is. Calling this again replaces the existing
+        watchdog.
+        """
+        if self._watchdog is not None:
+            self._watchdog.stop()
+        self._watchdog = Watchdog(self._devices, self.refresh_device, budget, max_age)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            self._watchdog.start()
+        return self._watchdog
+
+    def enable_lazy_loading(
+        self, max_devices: int = DEFAULT_CACHE_MAX_DEVICES
+    ) -> DeviceCache:
+        """Load device details on demand instead of at startup.
+
+        max_devices:
+          The maximum number of devices to keep loaded
+
+        When lazy loading is enabled, start() only loads the hub's device
+        list. A device's details are loaded the first time it's requested
+        with get_device(), and devices only contains the loaded devices.
+        When more than max_devices are loaded, the least recently used
+        devices without listeners are evicted; they're loaded again if
+        they're requested again. Queries and aggregates only cover loaded
+        devices. This must be called before start().
+        """
+        self._device_cache = DeviceCache(self._is_pinned, max_devices)
+        return self._device_cache
+
+    def enable_polling(
+        self,
+        min_interval: float = DEFAULT_POLL_MIN_INTERVAL,
+        max_interval: float = DEFAULT_POLL_MAX_INTERVAL,
+        bulk_fraction: float = DEFAULT_POLL_BULK_FRACTION,
+    ) -> Poller:
+        """Poll the hub for changes instead of receiving pushed events.
+
+        min_interval:
+          How often to poll a device that recently changed or was sent a
+          command, in seconds
+        max_interval:
+          How often to poll an idle device, in seconds
+        bulk_fraction:
+          The fraction of devices that must be due to poll them all with one
+          request
+
+        A polling hub doesn't start an event server, so it works where the
+        hub can't connect back to this host (e.g., behind NAT). Each device
+        is polled more slowly the longer it goes without changing, and all
+        devices are polled with the hub's bulk device endpoint when enough
+        are due at once. Listeners are only sent events for values that
+        changed. This should be called before start(); if it's called in a
+        running event loop, polling starts immediately. Calling this again
+        replaces the existing poller.
+        """
+        if self._poller is not None:
+            self._poller.stop()
+        self._poller = Poller(
+            self._devices,
+            self._poll_device,
+            self._poll_all,
+            self._poll_hub,
+            min_interval,
+            max_interval,
+            bulk_fraction,
+        )
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            self._poller.start()
+        return self._poller
+
+    def enable_gap_detection(
+        self,
+        check_interval: float = DEFAULT_GAP_CHECK_INTERVAL,
+        factor: float = DEFAULT_GAP_FACTOR,
+        max_devices: int = DEFAULT_RESYNC_MAX_DEVICES,
+    ) -> GapDetector:
+        """Resync when the hub has been silent for longer than usual.
+
+        check_interval:
+          How often to check for silence, in seconds
+        factor:
+          How many expected intervals between events must pass without an
+          event to indicate a gap
+        max_devices:
+          The maximum number of devices refreshed by each resync
+
+        The hub's usual event rate is learned as events arrive. Gaps caused
+        by restarting the event server or re-registering the event URL
+        trigger a resync whether or not this is enabled.
+        """
+        if self._gap_task is not None:
+            self._gap_task.cancel()
+            self._gap_task = None
+        self._gap_detector = GapDetector(factor)
+        self._gap_check_interval = check_interval
+        self._update_event_tracking()
+        self.resync_max_devices = max_devices
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            self._start_gap_detection()
+        return self._gap_detector
+
+    def enable_journal(
+        self,
+        path: str,
+        max_bytes: int = DEFAULT_JOURNAL_MAX_BYTES,
+        backup_count: int = DEFAULT_JOURNAL_BACKUP_COUNT,
+    ) -> Journal:
+        """Start recording received events to an on-disk journal.
+
+        path:
+          The journal file to append to
+        max_bytes:
+          The size at which the journal file is rotated
+        backup_count:
+          The number of rotated journal files to keep
+
+        Events are written in batches by a background thread. The journal is
+        closed when the hub is stopped.
+        """
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = Journal(path, max_bytes, backup_count)
+        return self._journal
+
+    def replay_journal(self, path: str) -> int:
+        """Apply the events recorded in a journal to the hub's state.
+
+        Events are processed as if they had just been received, so listeners
+        are notified. Replayed events aren't written to the hub's own journal.
+        Return the number of events replayed.
+        """
+        journal = self._journal
+        self._journal = None
+        count = 0
+        try:
+            for record in read_journal(path):
+                self._process_event({"content": record.to_content()})
+                count += 1
+        finally:
+            self._journal = journal
+        return count
+
+    def find_devices(
+        self,
+        name: Optional[str] = None,
+        type: Optional[str] = None,
+        prefix: bool = False,
+    ) -> List[Device]:
+        """Return the devices with a given name (label) and/or type.
+
+        Names and types are compared case-insensitively. If prefix is True,
+        devices whose name or type starts with the given value are returned.
+        With no name or type, no devices are returned.
+        """
+        ids: Optional[AbstractSet[str]] = None
+        if name is not None:
+            ids = self._index.with_name(name, prefix)
+        if type is not None:
+            type_ids = self._index.with_type(type, prefix)
+            ids = type_ids if ids is None else ids & type_ids
+        if not ids:
+            return []
+        return [self._devices[i] for i in ids if i in self._devices]
+
+    def add_aggregate(
+        self,
+        attribute: str,
+        function: str,
+        capability: Optional[str] = None,
+        device_ids: Optional[Iterable[str]] = None,
+        match: Any = None,
+    ) -> Aggregate:
+        """Register an aggregate over an attribute of a selection of devices.
+
+        attribute:
+          The attribute to aggregate
+        function:
+          One of the AGG_* constants
+        capability:
+          Only include devices with this capability (optional)
+        device_ids:
+          Only include devices with these IDs (optional)
+        match:
+          For AGG_COUNT, only count devices whose value equals this (optional)
+
+        The returned Aggregate is kept up to date as events are received.
+        Listeners added to it are called when its value changes.
+        """
+        aggregate = Aggregate(attribute, function, capability, device_ids, match)
+        aggregate.reset(self._devices.values())
+        self._aggregates.add(aggregate)
+        return aggregate
+
+    def remove_aggregate(self, aggregate: Aggregate) -> None:
+        """Stop maintaining an aggregate."""
+        self._aggregates.remove(aggregate)
+
     def add_device_listener(self, device_id: str, listener: Listener) -> None:
         """Listen for updates for a particular device."""
         if device_id not in self._listeners:
             self._listeners[device_id] = []
         self._listeners[device_id].append(listener)
 
+    def add_event_listener(self, listener: Listener) -> None:
+        """Listen for every device, mode and HSM status update."""
+        self._event_listeners.append(listener)
+
     def add_mode_listener(self, listener: Listener) -> None:
         """Listen for updates for the hub mode."""
         if ID_MODE not in self._listeners:
@@ -141,6 +606,18 @@ class Hub:
             self._listeners[ID_HSM_STATUS] = []
         self._listeners[ID_HSM_STATUS].append(listener)
 
+    def add_inventory_listener(self, listener: Listener) -> None:
+        """Listen for devices being added to or removed from the hub."""
+        if ID_INVENTORY not in self._listeners:
+            self._listeners[ID_INVENTORY] = []
+        self._listeners[ID_INVENTORY].append(listener)
+
+    def remove_device_listener(self, device_id: str, listener: Listener) -> None:
+        """Remove a listener for a particular device."""
+        listeners = self._listeners.get(device_id)
+        if listeners and listener in listeners:
+            listeners.remove(listener)
+
     def remove_device_listeners(self, device_id: str) -> None:
         """Remove all listeners for a particular device."""
         self._listeners[device_id] = []
@@ -149,10 +626,23 @@ class Hub:
         """Remove all listeners for mode changes."""
         self._listeners[ID_MODE] = []
 
+    def remove_event_listener(self, listener: Listener) -> None:
+        """Remove a listener for every update."""
+        if listener in self._event_listeners:
+            self._event_listeners.remove(listener)
+
+    def remove_event_listeners(self) -> None:
+        """Remove all listeners for every update."""
+        self._event_listeners = []
+
     def remove_hsm_status_listeners(self) -> None:
         """Remove all listeners for HSM status changes."""
         self._listeners[ID_HSM_STATUS] = []
 
+    def remove_inventory_listeners(self) -> None:
+        """Remove all listeners for added and removed devices."""
+        self._listeners[ID_INVENTORY] = []
+
     async def check_config(self) -> None:
         """Verify that the hub is accessible.
 
@@ -165,58 +655,236 @@ class Hub:
             raise ConnectionError(str(e))
 
     async def load_devices(self, force_refresh=False) -> None:
-        """Load the current state of all devices."""
+        """Load the current state of all devices.
+
+        If lazy loading is enabled, only the device list is loaded, and
+        refreshing only refreshes the devices that are already loaded.
+        """
         if force_refresh or len(self._devices) == 0:
             devices: List[Dict[str, Any]] = await self._api_request("devices")
             _LOGGER.debug("Loaded device list")
+            self._readiness._set_device_ids([dev["id"] for dev in devices])
+
+            cache = self._device_cache
+            if cache is not None:
+                cache.set_catalog(devices)
+                if force_refresh:
+                    devices = [dev for dev in devices if dev["id"] in self._devices]
+                else:
+                    devices = []
 
             # load devices sequentially to avoid overloading the hub
             for dev in devices:
                 await self._load_device(dev["id"], force_refresh)
+                self._readiness._set_device_loaded(dev["id"])
+
+            if force_refresh:
+                self._aggregates.reset(self._devices.values())
+
+        self._readiness.devices.set()
 
     async def start(self) -> None:
         """Download initial state data, and start an event server if requested.
 
-        Hub and device data will not be available until this method has
-        completed. Methods that rely on that data will raise an error if called
-        before this method has completed.
+        Starting the event server, loading devices, and loading the mode and
+        HSM status run concurrently. Hub and device data will not be fully
+        available until this method has completed, but the readiness signals
+        may be awaited to use parts of it as soon as they have loaded. If
+        polling is enabled, polling is started instead of an event server.
         """
 
         self._mode_supported = None
         self._hsm_supported = None
 
+        if self.snapshot_path is not None and self._load_snapshot(self.snapshot_path):
+            try:
+                await self._start_updates()
+            except aiohttp.ClientError as e:
+                raise ConnectionError(str(e))
+            self._reconcile_task = asyncio.ensure_future(self._reconcile())
+            if self._watchdog is not None:
+                self._watchdog.start()
+            self._start_gap_detection()
+            return
+
+        tasks = [
+            asyncio.ensure_future(self._start_updates()),
+            asyncio.ensure_future(self.load_devices()),
+            asyncio.ensure_future(self._load_mode_and_hsm()),
+        ]
         try:
-            await self._start_server()
-            await self.load_devices()
+            await asyncio.gather(*tasks)
             _LOGGER.debug("Connected to Hubitat hub at %s", self.host)
         except aiohttp.ClientError as e:
             raise ConnectionError(str(e))
+        finally:
+            # If any step failed, don't leave the others running
+            for task in tasks:
+                task.cancel()
 
-        try:
-            await self._load_modes()
-            self._mode_supported = True
-        except Exception as e:
-            self._mode_supported = False
-            _LOGGER.warning(f"Unable to access modes: {e}")
+        if self.snapshot_path is not None:
+            self.save_snapshot()
+
+        if self._watchdog is not None:
+            self._watchdog.start()
+        self._start_gap_detection()
+
+    def save_snapshot(self) -> None:
+        """Write the hub's current state to its snapshot file.
 
+        This does nothing if the hub has no snapshot_path.
+        """
+        if self.snapshot_path is None:
+            return
         try:
-            await self._load_hsm_status()
-            self._hsm_supported = True
-        except Exception as e:
-            self._hsm_supported = False
-            _LOGGER.warning(f"Unable to access HSM status: {e}")
+            save_snapshot(
+                self.snapshot_path,
+                self._devices.values(),
+                self._modes,
+                self._hsm_status,
+                self._snapshot_extra(),
+            )
+        except OSError as e:
+            _LOGGER.warning("Unable to save snapshot: %s", e)
 
     def stop(self) -> None:
         """Remove all listeners and stop the event server (if running)."""
-        if self._server:
+        if self._reconcile_task is not None:
+            self._reconcile_task.cancel()
+            self._reconcile_task = None
+        if self._event_url_check_task is not None:
+            self._event_url_check_task.cancel()
+            self._event_url_check_task = None
+            self._update_event_tracking()
+        if self._watchdog is not None:
+            self._watchdog.stop()
+        if self._poller is not None:
+            self._poller.stop()
+        for task in (self._gap_task, self._resync_task):
+            if task is not None:
+                task.cancel()
+        self._gap_task = None
+        self._resync_task = None
+        if not self._stale:
+            self.save_snapshot()
+        if getattr(self, "_server", None) and self._owns_server:
             self._server.stop()
             _LOGGER.info("Stopped event server")
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
         self._listeners = {}
+        self._event_listeners = []
+
+    async def get_device(self, device_id: str) -> Device:
+        """Return a device, loading its details first if necessary.
+
+        This is how devices are accessed when lazy loading is enabled.
+        Concurrent requests for the same device share one load. A KeyError
+        is raised if the device isn't in the hub's device list.
+        """
+        cache = self._device_cache
+        device = self._devices.get(device_id)
+        if device is None:
+            if cache is not None and device_id not in cache:
+                raise KeyError(device_id)
+
+            load = self._device_loads.get(device_id)
+            if load is None:
+                load = asyncio.ensure_future(self._load_device(device_id))
+                self._device_loads[device_id] = load
+                load.add_done_callback(
+                    lambda _: self._device_loads.pop(device_id, None)
+                )
+            await asyncio.shield(load)
+            device = self._devices[device_id]
+            self._readiness._set_device_loaded(device_id)
+
+        if cache is not None:
+            cache.touch(device_id)
+            self._evict_devices()
+        return device
 
     async def refresh_device(self, device_id: str) -> None:
         """Refresh a device's state."""
         await self._load_device(device_id, force_refresh=True)
 
+    async def resync(self, max_devices: Optional[int] = None) -> List[str]:
+        """Refresh the devices that may have missed events.
+
+        max_devices:
+          The maximum number of devices to refresh (optional). Defaults to
+          resync_max_devices.
+
+        When gap detection is enabled, only devices that have sent events
+        are refreshed, since their state is kept current by events;
+        otherwise any loaded device may be. The stalest are refreshed first.
+        Listeners are sent events for any values that changed. Return the
+        IDs of the refreshed devices.
+        """
+        if max_devices is None:
+            max_devices = self.resync_max_devices
+        devices = self._resync_candidates()
+        devices.sort(key=lambda d: d.last_update)
+
+        device_ids: List[str] = []
+        for device in devices[:max_devices]:
+            await self._load_device(device.id, force_refresh=True)
+            device_ids.append(device.id)
+        _LOGGER.debug("Resynced %d devices", len(device_ids))
+        return device_ids
+
+    async def sync_devices(self) -> Tuple[List[str], List[str]]:
+        """Bring the set of devices up to date with the hub.
+
+        Only the hub's device list is fetched. Devices that are new are
+        loaded, and devices that are no longer on the hub are removed along
+        with their listeners. Inventory listeners are sent an
+        EVENT_DEVICE_ADDED or EVENT_DEVICE_REMOVED event for each. Return the
+        IDs of the added and removed devices.
+        """
+        devices: List[Dict[str, Any]] = await self._api_request("devices")
+        return await self._sync_device_list(devices)
+
+    async def _sync_device_list(
+        self, devices: List[Dict[str, Any]]
+    ) -> Tuple[List[str], List[str]]:
+        """Add and remove devices to match a device list fetched from the hub.
+
+        Return the IDs of the added and removed devices.
+        """
+        device_ids = [str(dev["id"]) for dev in devices]
+        current = set(device_ids)
+
+        # A lazy hub knows about more devices than it has loaded
+        cache = self._device_cache
+        known = self._devices if cache is None else cache
+        removed = [i for i in known if i not in current]
+        added = [i for i in device_ids if i not in known]
+
+        for device_id in removed:
+            name = self._device_name(device_id)
+            self._remove_device(device_id)
+            self._emit_inventory_event(EVENT_DEVICE_REMOVED, device_id, name)
+
+        if cache is not None:
+            cache.set_catalog(devices)
+
+        # load devices sequentially to avoid overloading the hub
+        for device_id in added:
+            if cache is None:
+                await self._load_device(device_id)
+                self._readiness._set_device_loaded(device_id)
+            name = self._device_name(device_id)
+            self._emit_inventory_event(EVENT_DEVICE_ADDED, device_id, name)
+
+        if added or removed:
+            self._readiness._set_device_ids(device_ids)
+            _LOGGER.debug(
+                "Synced devices: %d added, %d removed", len(added), len(removed)
+            )
+        return added, removed
+
     async def send_command(
         self, device_id: str, command: str, arg: Optional[Union[str, int]]
     ) -> Dict[str, Any]:
@@ -225,7 +893,10 @@ class Hub:
         if arg:
             path += f"/{arg}"
         _LOGGER.debug("Sending command %s(%s) to %s", command, arg, device_id)
-        return await self._api_request(path)
+        result = await self._api_request(path)
+        if self._poller is not None:
+            self._poller.touch(device_id)
+        return result
 
     async def set_event_url(self, event_url: Optional[str]) -> None:
         """Set the URL that Hubitat will POST device events to."""
@@ -234,6 +905,7 @@ class Hub:
         url = quote(str(event_url), safe="")
         _LOGGER.info("Setting event update URL to %s", url)
         await self._api_request(f"postURL/{url}")
+        self._registered_event_url = str(event_url)
 
     async def set_hsm(self, hsm_mode: str) -> None:
         """Update the hub's HSM status.
@@ -245,17 +917,13 @@ class Hub:
 
     async def set_mode(self, name: str) -> None:
         """Update the hub's mode"""
-        id = None
-        for mode in self._modes:
-            if mode.name == name:
-                id = mode.id
-                break
-        if id is None:
+        mode = self._modes_by_name.get(name)
+        if mode is None:
             _LOGGER.error("Invalid mode: %s", name)
             raise InvalidMode(name)
 
-        new_modes: List[Dict[str, Any]] = await self._api_request(f"modes/{id}")
-        self._modes = [Mode(m) for m in new_modes]
+        new_modes: List[Dict[str, Any]] = await self._api_request(f"modes/{mode.id}")
+        self._set_modes(new_modes)
 
     def set_host(self, host: str) -> None:
         """Set the host address that the hub is accessible at."""
@@ -265,7 +933,7 @@ class Hub:
         self.host = host_url.netloc or host_url.path
         self.base_url = f"{self.scheme}://{self.host}"
         self.api_url = f"{self.base_url}/apps/api/{self.app_id}"
-        self.mac = _get_mac_address(self.host) or ""
+        self._registered_event_url = None
 
     async def set_port(self, port: int) -> None:
         """Set the port that the event listener server will listen on.
@@ -274,9 +942,10 @@ class Hub:
         """
         self.port = port
         _LOGGER.info("Setting port to %s", port)
-        if self._server:
+        if self._server and self._owns_server:
             self._server.stop()
         await self._start_server()
+        self._schedule_resync("event server restarted")
 
     async def set_ssl_context(self, ssl_context: Optional[SSLContext]) -> None:
         """Set the SSLContext that the event listener server will use. Passing in a SSLContext object
@@ -292,9 +961,10 @@ class Hub:
         else:
             _LOGGER.debug("Enabling SSL for event listener server")
 
-        if self._server:
+        if self._server and self._owns_server:
             self._server.stop()
         await self._start_server()
+        self._schedule_resync("event server restarted")
 
     async def _check_api(self) -> None:
         """Check for api access.
@@ -303,66 +973,127 @@ class Hub:
         """
         await self._api_request("devices")
 
-    def _process_event(self, event: Dict[str, Any]) -> None:
-        """Process an event received from the hub."""
+    def _process_event(
+        self, event: Dict[str, Any], want_event: bool = False
+    ) -> Optional[Event]:
+        """Process an event received from the hub.
+
+        This is the ingest hot path. Event objects are only created when there
+        is at least one listener to receive them, or when want_event is True.
+        The Event is returned if one was created; None is returned for events
+        the hub ignored.
+        """
         try:
             content = event["content"]
-            _LOGGER.debug("Received event: %s", content)
         except KeyError:
             _LOGGER.warning("Received invalid event: %s", event)
-            return
-
-        if content["deviceId"] is not None:
-            device_id = content["deviceId"]
-            self._update_device_attr(device_id, content["name"], content["value"])
-
-            evt = Event(content)
-
-            if device_id in self._listeners:
-                for listener in self._listeners[device_id]:
-                    listener(evt)
-        elif content["name"] == "mode":
-            name = content["value"]
-            mode_set = False
-            for mode in self._modes:
-                if mode.name == name:
-                    mode.active = True
-                    mode_set = True
-                else:
-                    mode.active = False
+            return None
 
-            # If the mode wasn't set, this is a new mode. Add a placeholder
-            # to the modes list, and reload the modes
-            if not mode_set:
-                self._modes.append(Mode({"active": True, "name": name}))
-                _ = self._load_modes()
-
-            evt = Event(content)
-
-            for listener in self._listeners.get(ID_MODE, []):
-                listener(evt)
+        if _LOGGER.isEnabledFor(DEBUG):
+            _LOGGER.debug("Received event: %s", content)
 
-        elif content["name"] == "hsmStatus":
-            self._hsm_status = content["value"]
-            evt = Event(content)
-            for listener in self._listeners.get(ID_HSM_STATUS, []):
+        device_id = content["deviceId"]
+        if self._track_events:
+            self._last_event_time = monotonic()
+            self._event_count += 1
+            if device_id is not None:
+                self._event_devices.add(device_id)
+        name = content["name"]
+        value = content["value"]
+        if device_id is not None:
+            value = self._update_device_attr(device_id, name, value)
+            listeners = self._listeners.get(device_id)
+        elif name == "mode":
+            self._activate_mode(value)
+            listeners = self._listeners.get(ID_MODE)
+        elif name == "hsmStatus":
+            self._hsm_status = value
+            listeners = self._listeners.get(ID_HSM_STATUS)
+        else:
+            return None
+
+        if self._journal is not None:
+            # Journal the typed value so numbers are stored as numbers
+            self._journal.record(device_id, name, value)
+
+        event_listeners = self._event_listeners
+        if not (listeners or event_listeners or want_event):
+            return None
+        evt = Event(content, self.keep_raw)
+        if listeners:
+            for listener in listeners:
                 listener(evt)
+        for listener in event_listeners:
+            listener(evt)
+        return evt
+
+    def _activate_mode(self, name: str) -> None:
+        """Mark the mode with the given name as the active mode."""
+        mode = self._modes_by_name.get(name)
+
+        # If the mode wasn't found, this is a new mode. Add a placeholder to
+        # the modes list, and reload the modes
+        if mode is None:
+            mode = Mode({"active": False, "name": name})
+            self._modes.append(mode)
+            self._modes_by_name[name] = mode
+            _ = self._load_modes()
+
+        if mode is not self._active_mode:
+            if self._active_mode is not None:
+                self._active_mode.active = False
+            mode.active = True
+            self._active_mode = mode
+
+    def _set_modes(self, modes: List[Dict[str, Any]]) -> None:
+        """Replace the hub's modes and rebuild the mode index."""
+        self._modes = [Mode(m) for m in modes]
+        self._modes_by_name = {m.name: m for m in self._modes}
+        self._active_mode = None
+        for mode in self._modes:
+            if mode.active:
+                self._active_mode = mode
+                break
 
     def _update_device_attr(
         self, device_id: str, attr_name: str, value: Union[int, str]
-    ) -> None:
-        """Update a device attribute value."""
-        _LOGGER.debug("Updating %s of %s to %s", attr_name, device_id, value)
+    ) -> Any:
+        """Update a device attribute value.
+
+        Return the attribute's new typed value, or the given value if the
+        device or attribute is unknown.
+        """
+        if _LOGGER.isEnabledFor(DEBUG):
+            _LOGGER.debug("Updating %s of %s to %s", attr_name, device_id, value)
         try:
             dev = self._devices[device_id]
         except KeyError:
-            _LOGGER.warning("Tried to update unknown device %s", device_id)
-            return
+            # Lazy hubs receive events for devices they haven't loaded
+            if self._device_cache is None:
+                _LOGGER.warning("Tried to update unknown device %s", device_id)
+            return value
 
         try:
-            dev.update_attr(attr_name, value)
+            value = dev.update_attr(attr_name, value)
         except KeyError:
             _LOGGER.warning("Tried to update unknown attribute %s", attr_name)
+            return value
+
+        index = self._index
+        if attr_name in index.indexed:
+            index.update_attr(device_id, attr_name, value)
+        aggregates = self._aggregates
+        if attr_name in aggregates.attributes:
+            aggregates.update(device_id, attr_name, value)
+        if self._history is not None:
+            self._history.record(
+                device_id, attr_name, value, data_type=dev.attributes[attr_name].type
+            )
+        if self._versioned_state is not None:
+            self._versioned_state.update_attr(
+                device_id, attr_name, value, dev.last_update
+            )
+        return value
 
     async def _load_device(self, device_id: str, force_refresh=False) -> None:
         """Return full info for a specific device."""
@@ -370,15 +1101,426 @@ class Hub:
             _LOGGER.debug("Loading device %s", device_id)
             json = await self._api_request(f"devices/{device_id}")
             try:
-                if device_id in self._devices:
-                    self._devices[device_id].update_state(json)
-                else:
-                    self._devices[device_id] = Device(json)
+                self._apply_device_state(device_id, json)
             except Exception as e:
                 _LOGGER.error("Invalid device info: %s", json)
                 raise e
             _LOGGER.debug("Loaded device %s", device_id)
 
+    def _apply_device_state(
+        self, device_id: str, properties: Dict[str, Any]
+    ) -> Set[str]:
+        """Add a device, or update an existing device from a full payload.
+
+        When an existing device is updated, the hub's indexes, aggregates and
+        history are updated and listeners are sent events for the attributes
+        that changed. Return the names of the attributes that changed.
+        """
+        device = self._devices.get(device_id)
+        if device is None:
+            device = Device(properties, self.keep_raw, self._metadata)
+            self._add_device(device_id, device)
+            return set(device.attributes)
+
+        changed = device.update_state(properties)
+        self._index.update_device(device)
+        self._aggregates.update_device(device)
+        if changed:
+            if self._history is not None:
+                for name in changed:
+                    attr = device.attributes.get(name)
+                    if attr is not None:
+                        self._history.record(
+                            device_id, name, attr.typed_value, data_type=attr.type
+                        )
+            for update_listener in self._update_listeners:
+                update_listener(device_id, changed)
+            self._emit_attr_changes(device, changed)
+        if self._versioned_state is not None:
+            self._versioned_state.update_device(device_id, device)
+        return changed
+
+    def _apply_bulk_state(self, devices: List[Dict[str, Any]]) -> Set[str]:
+        """Update existing devices from a bulk device payload.
+
+        Each device in the payload has its current attribute values, either
+        as a mapping of names to values or as a list of attribute payloads.
+        Only values that differ are applied, and listeners are sent events
+        for them. Return the IDs of the devices that changed.
+        """
+        changed_ids: Set[str] = set()
+        for props in devices:
+            device_id = str(props.get("id"))
+            device = self._devices.get(device_id)
+            if device is None:
+                continue
+
+            values = props.get("attributes")
+            if isinstance(values, list):
+                values = {a.get("name"): a.get("currentValue") for a in values}
+            elif not isinstance(values, dict):
+                continue
+
+            attributes = device.attributes
+            changed: List[str] = []
+            for name, value in values.items():
+                attr = attributes.get(name)
+                if attr is None or value == attr.value:
+                    continue
+                old_value = attr.typed_value
+                self._update_device_attr(device_id, name, value)
+                if attr.typed_value != old_value:
+                    changed.append(name)
+
+            if changed:
+                changed_ids.add(device_id)
+                self._emit_attr_changes(device, changed)
+        return changed_ids
+
+    def _add_update_listener(self, listener: UpdateListener) -> None:
+        """Listen for devices being updated from full payloads.
+
+        Unlike events, updates include attributes that were removed.
+        """
+        self._update_listeners.append(listener)
+
+    def _remove_update_listener(self, listener: UpdateListener) -> None:
+        if listener in self._update_listeners:
+            self._update_listeners.remove(listener)
+
+    def _add_device(self, device_id: str, device: Device) -> None:
+        """Add a new device to the hub."""
+        self._devices[device_id] = device
+        self._index.update_device(device)
+        self._aggregates.update_device(device)
+        if self._versioned_state is not None:
+            self._versioned_state.update_device(device_id, device)
+
+    def _remove_device(self, device_id: str) -> None:
+        """Remove a device, and everything the hub tracks for it."""
+        self._unload_device(device_id)
+        if self._history is not None:
+            self._history.remove_device(device_id)
+        self._event_devices.discard(device_id)
+        self._listeners.pop(device_id, None)
+
+    def _unload_device(self, device_id: str) -> None:
+        """Drop a device's details and the state derived from them."""
+        if self._devices.pop(device_id, None) is None:
+            return
+        self._index.remove_device(device_id)
+        self._aggregates.remove_device(device_id)
+        if self._poller is not None:
+            self._poller.remove_device(device_id)
+        if self._versioned_state is not None:
+            self._versioned_state.remove_device(device_id)
+        if self._device_cache is not None:
+            self._device_cache.discard(device_id)
+
+    def _evict_devices(self) -> None:
+        """Unload the least recently used devices beyond the cache's limit."""
+        cache = self._device_cache
+        if cache is None:
+            return
+        for device_id in cache.evictable():
+            _LOGGER.debug("Evicting device %s", device_id)
+            self._unload_device(device_id)
+            cache.eviction_count += 1
+
+    def _is_pinned(self, device_id: str) -> bool:
+        """Return True if a device has listeners, so it must stay loaded."""
+        return bool(self._listeners.get(device_id))
+
+    def _device_name(self, device_id: str) -> Optional[str]:
+        """Return a device's name, whether or not it's loaded."""
+        device = self._devices.get(device_id)
+        if device is not None:
+            return device.name
+        if self._device_cache is not None:
+            summary = self._device_cache.summary(device_id)
+            if summary is not None:
+                return summary.get("label")
+        return None
+
+    def _emit_attr_changes(self, device: Device, attr_names: Iterable[str]) -> None:
+        """Send synthetic events to a device's listeners for changed attributes.
+
+        Attributes that no longer exist on the device are skipped.
+        """
+        listeners = self._listeners.get(device.id, []) + self._event_listeners
+        if not listeners:
+            return
+
+        for name in attr_names:
+            attr = device.attributes.get(name)
+            if attr is None:
+                continue
+            evt = Event(
+                {
+                    "deviceId": device.id,
+                    "displayName": device.name,
+                    "name": name,
+                    "value": attr.value,
+                    "descriptionText": None,
+                    "type": None,
+                },
+                self.keep_raw,
+            )
+            for listener in listeners:
+                listener(evt)
+
+    def _start_mac_lookup(self) -> "asyncio.Future[str]":
+        """Start resolving the hub's MAC address in an executor.
+
+        Concurrent lookups for the same host share one future.
+        """
+        future = self._mac_future
+        if future is None or future.done() or self._mac_host != self.host:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(None, _resolve_mac_address, self.host)
+            self._mac_future = future
+            self._mac_host = self.host
+        return future
+
+    async def _load_mode_and_hsm(self) -> None:
+        """Load the hub mode and HSM status, noting whether each is supported."""
+
+        async def load_modes() -> None:
+            try:
+                await self._load_modes()
+                self._mode_supported = True
+            except Exception as e:
+                self._mode_supported = False
+                _LOGGER.warning(f"Unable to access modes: {e}")
+            self._readiness.modes.set()
+
+        async def load_hsm_status() -> None:
+            try:
+                await self._load_hsm_status()
+                self._hsm_supported = True
+            except Exception as e:
+                self._hsm_supported = False
+                _LOGGER.warning(f"Unable to access HSM status: {e}")
+            self._readiness.hsm.set()
+
+        await asyncio.gather(load_modes(), load_hsm_status())
+
+    def _load_snapshot(self, path: str) -> bool:
+        """Load hub state from a snapshot file.
+
+        Return True if a usable snapshot was loaded. The loaded state is
+        marked as stale.
+        """
+        snapshot = load_snapshot(path)
+        if snapshot is None:
+            return False
+
+        registration = snapshot.extra.get("event_url")
+        if (
+            registration is not None
+            and registration.get("host") == self.host
+            and registration.get("app_id") == self.app_id
+        ):
+            self._registered_event_url = registration.get("url")
+
+        if not snapshot.devices:
+            return False
+
+        device_ids = []
+        for props in snapshot.devices:
+            device = Device(props, self.keep_raw, self._metadata)
+            self._add_device(device.id, device)
+            self._readiness._set_device_loaded(device.id)
+            device_ids.append(device.id)
+        self._readiness._set_device_ids(device_ids)
+
+        cache = self._device_cache
+        if cache is not None:
+            cache.set_catalog(
+                {"id": d.id, "label": d.name, "name": d.type}
+                for d in self._devices.values()
+            )
+            for device_id in device_ids:
+                cache.touch(device_id)
+            self._evict_devices()
+        self._readiness.devices.set()
+        if snapshot.modes:
+            self._set_modes(snapshot.modes)
+            self._mode_supported = True
+            self._readiness.modes.set()
+        if snapshot.hsm_status is not None:
+            self._hsm_status = snapshot.hsm_status
+            self._hsm_supported = True
+            self._readiness.hsm.set()
+
+        self._stale = True
+        _LOGGER.debug("Loaded %d devices from snapshot %s", len(snapshot.devices), path)
+        return True
+
+    async def _reconcile(self) -> None:
+        """Bring state loaded from a snapshot up to date with the hub.
+
+        Devices are synced with the hub's device list as by sync_devices, and
+        the devices that were already known are refreshed. Listeners are sent
+        events for anything that differs.
+        """
+        old_mode = self.mode
+        old_hsm_status = self._hsm_status
+        try:
+            devices: List[Dict[str, Any]] = await self._api_request("devices")
+            added, _ = await self._sync_device_list(devices)
+            # load devices sequentially to avoid overloading the hub
+            for dev in devices:
+                device_id = str(dev["id"])
+                if device_id in self._devices and device_id not in added:
+                    await self._load_device(device_id, force_refresh=True)
+            self._aggregates.reset(self._devices.values())
+            await self._load_mode_and_hsm()
+        except Exception as e:
+            _LOGGER.error("Unable to reconcile snapshot with hub: %s", e)
+            return
+        finally:
+            self._reconcile_task = None
+
+        self._emit_mode_and_hsm_changes(old_mode, old_hsm_status)
+
+        self._stale = False
+        self.save_snapshot()
+        _LOGGER.debug("Reconciled snapshot with hub")
+
+    def _emit_mode_and_hsm_changes(
+        self, old_mode: Optional[str], old_hsm_status: Optional[str]
+    ) -> None:
+        """Send synthetic events if the mode or HSM status have changed."""
+        if self.mode is not None and self.mode != old_mode:
+            self._emit_hub_event(ID_MODE, "mode", self.mode)
+        if self._hsm_status is not None and self._hsm_status != old_hsm_status:
+            self._emit_hub_event(ID_HSM_STATUS, "hsmStatus", self._hsm_status)
+
+    async def _poll_device(self, device_id: str) -> bool:
+        """Poll a device, and return True if it changed."""
+        json = await self._api_request(f"devices/{device_id}")
+        return len(self._apply_device_state(device_id, json)) > 0
+
+    async def _poll_all(self) -> Optional[Set[str]]:
+        """Poll all devices with one request.
+
+        Return the IDs of the devices that changed, or None if the hub
+        doesn't support bulk device requests. Other request errors are
+        raised, so bulk requests are tried again on the next poll.
+        """
+        try:
+            devices = await self._api_request("devices/all")
+        except RequestError as e:
+            if e.status in (404, 405):
+                return None
+            raise
+        if not isinstance(devices, list):
+            return None
+        return self._apply_bulk_state(devices)
+
+    async def _poll_hub(self) -> None:
+        """Poll the hub's mode and HSM status, if they're supported."""
+        old_mode = self.mode
+        old_hsm_status = self._hsm_status
+        if self._mode_supported:
+            await self._load_modes()
+        if self._hsm_supported:
+            await self._load_hsm_status()
+        self._emit_mode_and_hsm_changes(old_mode, old_hsm_status)
+
+    def _start_gap_detection(self) -> None:
+        """Start checking for gaps in events, if gap detection is enabled."""
+        if self._gap_detector is not None and self._gap_task is None:
+            self._gap_task = asyncio.ensure_future(
+                self._monitor_gaps(self._gap_detector)
+            )
+
+    async def _monitor_gaps(self, detector: GapDetector) -> None:
+        """Periodically check for a gap in events, and resync if one is found."""
+        while True:
+            if detector.observe(self._event_count, self._last_event_time, monotonic()):
+                self._schedule_resync(f"no events for {detector.threshold:.0f}s")
+            await asyncio.sleep(self._gap_check_interval)
+
+    def _update_event_tracking(self) -> None:
+        """Track events only while gap detection or an event URL check needs to."""
+        self._track_events = (
+            self._gap_detector is not None or self._event_url_check_task is not None
+        )
+
+    def _resync_candidates(self) -> List[Device]:
+        """Return the devices a resync may refresh."""
+        if self._gap_detector is None:
+            return list(self._devices.values())
+        return [self._devices[i] for i in self._event_devices if i in self._devices]
+
+    def _schedule_resync(self, reason: str) -> None:
+        """Start a background resync, unless one is already running."""
+        if self._resync_task is not None or not self._resync_candidates():
+            return
+        _LOGGER.info("Events may have been missed (%s), resyncing", reason)
+        self._resync_task = asyncio.ensure_future(self._run_resync())
+
+    async def _run_resync(self) -> None:
+        try:
+            await self.resync()
+        except Exception as e:
+            _LOGGER.warning("Unable to resync: %s", e)
+        finally:
+            self._resync_task = None
+
+    def _snapshot_extra(self) -> Dict[str, Any]:
+        """Return local state to be saved with snapshots."""
+        extra: Dict[str, Any] = {}
+        if self._registered_event_url is not None:
+            extra["event_url"] = {
+                "host": self.host,
+                "app_id": self.app_id,
+                "url": self._registered_event_url,
+            }
+        return extra
+
+    def _emit_hub_event(self, listener_id: str, name: str, value: str) -> None:
+        """Send a synthetic mode or HSM event to listeners."""
+        listeners = self._listeners.get(listener_id, []) + self._event_listeners
+        if not listeners:
+            return
+        evt = Event(
+            {
+                "deviceId": None,
+                "name": name,
+                "value": value,
+                "displayName": None,
+                "descriptionText": None,
+                "type": None,
+            },
+            self.keep_raw,
+        )
+        for listener in listeners:
+            listener(evt)
+
+    def _emit_inventory_event(
+        self, name: str, device_id: str, device_name: Optional[str]
+    ) -> None:
+        """Send a synthetic device added or removed event to listeners."""
+        listeners = self._listeners.get(ID_INVENTORY)
+        if not listeners:
+            return
+        evt = Event(
+            {
+                "deviceId": device_id,
+                "name": name,
+                "value": device_id,
+                "displayName": device_name,
+                "descriptionText": None,
+                "type": None,
+            },
+            self.keep_raw,
+        )
+        for listener in listeners:
+            listener(evt)
+
     async def _load_hsm_status(self) -> None:
         """Load the current hub HSM status."""
         hsm: Dict[str, str] = await self._api_request("hsm")
@@ -389,7 +1531,7 @@ class Hub:
         """Load the current hub mode."""
         modes: List[Dict[str, Any]] = await self._api_request("modes")
         _LOGGER.debug("Loaded modes")
-        self._modes = [Mode(m) for m in modes]
+        self._set_modes(modes)
 
     async def _api_request(self, path: str, method="GET") -> Any:
         """Make a Maker API request."""
@@ -398,7 +1540,7 @@ class Hub:
         attempt = 0
         while attempt <= MAX_REQUEST_ATTEMPT_COUNT:
             attempt += 1
-            conn = aiohttp.TCPConnector(ssl=False)
+            conn = self._connector or aiohttp.TCPConnector(ssl=False)
             try:
                 async with aiohttp.request(
                     method, f"{self.api_url}/{path}", params=params, connector=conn
@@ -409,9 +1551,14 @@ class Hub:
                             if attempt < MAX_REQUEST_ATTEMPT_COUNT:
                                 _LOGGER.debug(
                                     "%s request to %s failed with code %d: %s. Retrying...",
-                                    method, path, resp.status, resp.reason
+                                    method,
+                                    path,
+                                    resp.status,
+                                    resp.reason,
+                                )
+                                await asyncio.sleep(
+                                    attempt * REQUEST_RETRY_DELAY_INTERVAL
                                 )
-                                await asyncio.sleep(attempt * REQUEST_RETRY_DELAY_INTERVAL)
                                 continue
 
                         if resp.status == 401:
@@ -427,36 +1574,95 @@ class Hub:
                 if attempt < MAX_REQUEST_ATTEMPT_COUNT:
                     _LOGGER.debug(
                         "%s request to %s failed with %s. Retrying...",
-                        method, path, str(e)
+                        method,
+                        path,
+                        str(e),
                     )
                     await asyncio.sleep(attempt * REQUEST_RETRY_DELAY_INTERVAL)
                     continue
                 else:
                     raise e
             finally:
-                await conn.close()
+                if conn is not self._connector:
+                    await conn.close()
+
+    def _use_server(self, event_server: server.Server, event_url: str) -> None:
+        """Receive events through an event server owned by someone else.
+
+        The server must route events posted to event_url to _process_event.
+        It won't be started or stopped by this hub.
+        """
+        self._server = event_server
+        self._owns_server = False
+        self.event_url = event_url
+
+    async def _start_updates(self) -> None:
+        """Start receiving updates, by polling or from an event server."""
+        if self._poller is None:
+            await self._start_server()
+            return
+        self._poller.start()
+        self._readiness.server.set()
 
     async def _start_server(self) -> None:
         """Start an event listener server."""
-        # First, figure out what address to listen on. Open a connection to
-        # the Hubitat hub and see what address it used. This assumes this
-        # machine and the Hubitat hub are on the same network.
-        with _open_socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-            s.connect((self.host, 80))
-            address = s.getsockname()[0]
-
-        self._server = server.create_server(
-            self._process_event, address, self.port or 0, self.ssl_context
-        )
-        self._server.start()
-        _LOGGER.debug(
-            "Listening on %s:%d with SSL %s",
-            address,
-            self._server.port,
-            "disabled" if self.ssl_context is None else "enabled",
-        )
+        if self._owns_server:
+            address = _get_local_address(self.host)
+            self._server = server.create_server(
+                self._process_event, address, self.port or 0, self.ssl_context
+            )
+            self._server.start()
+            _LOGGER.debug(
+                "Listening on %s:%d with SSL %s",
+                address,
+                self._server.port,
+                "disabled" if self.ssl_context is None else "enabled",
+            )
+
+        event_url = str(self.event_url or self._server.url)
+        if event_url == self._registered_event_url:
+            # The hub should already be sending events here; make sure it is
+            # before trusting the registration.
+            _LOGGER.debug("Event URL %s is already registered", event_url)
+            if self._event_url_check_task is None:
+                self._event_url_check_task = asyncio.ensure_future(
+                    self._check_event_url(monotonic())
+                )
+                self._update_event_tracking()
+        else:
+            await self.set_event_url(event_url)
+        self._readiness.server.set()
 
-        await self.set_event_url(self.event_url)
+    async def _check_event_url(self, started: float) -> None:
+        """Re-register the event URL if no events arrive soon after startup.
+
+        This runs when registration was skipped at startup because the URL
+        was already registered. The hub may have lost that registration
+        (e.g., if another client registered a different URL).
+        """
+        try:
+            await asyncio.sleep(EVENT_URL_CHECK_DELAY)
+            if self._last_event_time is None or self._last_event_time < started:
+                _LOGGER.info("No events received, re-registering event URL")
+                await self.set_event_url(self.event_url)
+                self.save_snapshot()
+                self._schedule_resync("event URL re-registered")
+        except aiohttp.ClientError as e:
+            _LOGGER.warning("Unable to re-register event URL: %s", e)
+        finally:
+            self._event_url_check_task = None
+            self._update_event_tracking()
+
+
+def _get_local_address(host: str) -> str:
+    """Return the local address used to reach a host.
+
+    This opens a (UDP) connection to the host and sees what address it used,
+    which assumes this machine and the host are on the same network.
+    """
+    with _open_socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.connect((host, 80))
+        return s.getsockname()[0]
 
 
 @contextmanager
@@ -501,3 +1707,25 @@ def _get_mac_address(host: str) -> Optional[str]:
     if re.match("\\d+\\.\\d+\\.\\d+\\.\\d+", host):
         return getmac.get_mac_address(ip=host)
     return getmac.get_mac_address(hostname=host)
+
+
+def _get_cached_mac(host: str) -> Optional[str]:
+    """Return the cached mac address of a host, if it hasn't expired."""
+    entry = _mac_cache.get(host)
+    if entry is None or monotonic() - entry[0] > MAC_CACHE_TTL:
+        return None
+    return entry[1]
+
+
+def _resolve_mac_address(host: str) -> str:
+    """Look up the mac address of a host and cache it.
+
+    Failed lookups are cached as an empty string.
+    """
+    try:
+        mac = _get_mac_address(host) or ""
+    except Exception as e:
+        _LOGGER.warning("Unable to get mac address of %s: %s", host, e)
+        mac = ""
+    _mac_cache[host] = (monotonic(), mac)
+    return mac
@@ -0,0 +1,326 @@
+"""Secondary device indexes."""
+
+from bisect import bisect_left, bisect_right, insort
+from typing import (
+    AbstractSet,
+    Any,
+    Collection,
+    Dict,
+    FrozenSet,
+    Hashable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from .types import Device, is_number
+
+_EMPTY: FrozenSet[str] = frozenset()
+_MISSING = object()
+
+# Types of typed attribute values that are always hashable
+_SCALAR_TYPES = frozenset((str, float, int, bool, type(None)))
+
+
+class Range(NamedTuple):
+    """A numeric range predicate.
+
+    Both ends are inclusive. Either end may be None to leave it unbounded.
+    """
+
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+class TextIndex:
+    """A case-insensitive index of device IDs by a text field.
+
+    Exact lookups use a dict of case-folded values. Prefix lookups use a
+    sorted list of (folded value, device ID) pairs.
+    """
+
+    def __init__(self) -> None:
+        self._exact: Dict[str, Set[str]] = {}
+        self._sorted: List[Tuple[str, str]] = []
+        self._values: Dict[str, str] = {}
+
+    def update(self, device_id: str, value: str) -> None:
+        """Set the indexed value for a device."""
+        folded = value.casefold()
+        old = self._values.get(device_id)
+        if old == folded:
+            return
+        if old is not None:
+            self.remove(device_id)
+
+        self._values[device_id] = folded
+        self._exact.setdefault(folded, set()).add(device_id)
+        insort(self._sorted, (folded, device_id))
+
+    def remove(self, device_id: str) -> None:
+        """Remove a device from the index."""
+        folded = self._values.pop(device_id, None)
+        if folded is None:
+            return
+        ids = self._exact[folded]
+        ids.discard(device_id)
+        if not ids:
+            del self._exact[folded]
+        entries = self._sorted
+        del entries[bisect_left(entries, (folded, device_id))]
+
+    def find(self, value: str) -> AbstractSet[str]:
+        """Return the IDs of devices whose value equals value, ignoring case."""
+        return self._exact.get(value.casefold(), _EMPTY)
+
+    def find_prefix(self, prefix: str) -> AbstractSet[str]:
+        """Return the IDs of devices whose value starts with prefix.
+
+        The comparison ignores case.
+        """
+        folded = prefix.casefold()
+        entries = self._sorted
+        ids: Set[str] = set()
+        for i in range(bisect_left(entries, (folded, "")), len(entries)):
+            value, device_id = entries[i]
+            if not value.startswith(folded):
+                break
+            ids.add(device_id)
+        return ids
+
+
+class DeviceIndex:
+    """Indexes of device IDs by capability and by attribute value.
+
+    Attribute values are indexed by their typed value (see
+    Attribute.typed_value), so NUMBER attributes are matched as floats and
+    ENUM attributes as strings. Values that aren't hashable, such as decoded
+    JSON objects, aren't indexed.
+
+    The value index for an attribute is built from the current values of
+    devices the first time the attribute is queried, and maintained
+    incrementally from then on. Callers only need to report changes to
+    attributes in indexed, so attributes that are never queried cost nothing
+    to keep up to date.
+    """
+
+    def __init__(self, devices: Mapping[str, Device]) -> None:
+        """Initialize a DeviceIndex over a live mapping of device IDs to devices."""
+        self._devices = devices
+        self._by_capability: Dict[str, Set[str]] = {}
+        # Value indexes for the attributes that have been queried
+        self._by_value: Dict[str, Dict[Hashable, Set[str]]] = {}
+        # Sorted numeric keys of _by_value for each attribute, for range queries
+        self._numeric_keys: Dict[str, List[float]] = {}
+        self._device_caps: Dict[str, Tuple[str, ...]] = {}
+        # Indexed values of each device, for removing them when they change
+        self._device_values: Dict[str, Dict[str, Any]] = {}
+        self._names = TextIndex()
+        self._types = TextIndex()
+        self.indexed: AbstractSet[str] = self._by_value.keys()
+
+    def update_device(self, device: Device) -> None:
+        """Add a device to the index, or re-index an existing device."""
+        device_id = device.id
+        self._names.update(device_id, device.name)
+        self._types.update(device_id, device.type)
+
+        caps = tuple(device.capabilities)
+        old_caps = self._device_caps.get(device_id)
+        if caps != old_caps:
+            if old_caps:
+                for cap in old_caps:
+                    self._discard(self._by_capability, cap, device_id)
+            for cap in caps:
+                self._by_capability.setdefault(cap, set()).add(device_id)
+            self._device_caps[device_id] = caps
+
+        if not self._by_value:
+            return
+        attributes = device.attributes
+        values = self._device_values.get(device_id)
+        if values:
+            for name in [n for n in values if n not in attributes]:
+                self._remove_value(device_id, name, values.pop(name))
+        for name in self._by_value:
+            attr = attributes.get(name)
+            if attr is not None:
+                self.update_attr(device_id, name, attr.typed_value)
+
+    def remove_device(self, device_id: str) -> None:
+        """Remove a device from the index."""
+        self._names.remove(device_id)
+        self._types.remove(device_id)
+        for cap in self._device_caps.pop(device_id, ()):
+            self._discard(self._by_capability, cap, device_id)
+        for name, value in self._device_values.pop(device_id, {}).items():
+            self._remove_value(device_id, name, value)
+
+    def update_attr(self, device_id: str, attr_name: str, value: Any) -> None:
+        """Update the indexed value of a device attribute.
+
+        Updates to attributes that aren't in indexed are ignored.
+        """
+        attr_values = self._by_value.get(attr_name)
+        if attr_values is None:
+            return
+        values = self._device_values.get(device_id)
+        if values is None:
+            values = self._device_values[device_id] = {}
+
+        old_value = values.get(attr_name, _MISSING)
+        if old_value is not _MISSING:
+            if old_value == value and type(old_value) is type(value):
+                return
+            del values[attr_name]
+            self._remove_value(device_id, attr_name, old_value)
+
+        if type(value) not in _SCALAR_TYPES and not _is_hashable(value):
+            return
+
+        values[attr_name] = value
+        ids = attr_values.get(value)
+        if ids is None:
+            ids = attr_values[value] = set()
+            if is_number(value):
+                insort(self._numeric_keys.setdefault(attr_name, []), value)
+        ids.add(device_id)
+
+    def with_capability(self, capability: str) -> AbstractSet[str]:
+        """Return the IDs of devices that have a capability."""
+        return self._by_capability.get(capability, _EMPTY)
+
+    def with_name(self, name: str, prefix: bool = False) -> AbstractSet[str]:
+        """Return the IDs of devices with a name (label), ignoring case."""
+        if prefix:
+            return self._names.find_prefix(name)
+        return self._names.find(name)
+
+    def with_type(self, type: str, prefix: bool = False) -> AbstractSet[str]:
+        """Return the IDs of devices with a type (driver name), ignoring case."""
+        if prefix:
+            return self._types.find_prefix(type)
+        return self._types.find(type)
+
+    def with_value(self, attr_name: str, value: Any) -> AbstractSet[str]:
+        """Return the IDs of devices whose attribute equals a value."""
+        if not _is_hashable(value):
+            return _EMPTY
+        return self._values_of(attr_name).get(value, _EMPTY)
+
+    def with_values(self, attr_name: str, values: Collection[Any]) -> AbstractSet[str]:
+        """Return the IDs of devices whose attribute is one of a set of values."""
+        ids: Set[str] = set()
+        for value in values:
+            ids.update(self.with_value(attr_name, value))
+        return ids
+
+    def in_range(self, attr_name: str, bounds: Range) -> AbstractSet[str]:
+        """Return the IDs of devices whose numeric attribute is in a range."""
+        attr_values = self._values_of(attr_name)
+        keys = self._numeric_keys.get(attr_name)
+        if not keys:
+            return _EMPTY
+
+        start = 0 if bounds.min is None else bisect_left(keys, bounds.min)
+        end = len(keys) if bounds.max is None else bisect_right(keys, bounds.max)
+        ids: Set[str] = set()
+        for key in keys[start:end]:
+            ids.update(attr_values[key])
+        return ids
+
+    def match(self, attr_name: str, predicate: Any) -> AbstractSet[str]:
+        """Return the IDs of devices whose attribute matches a predicate.
+
+        A Range matches numeric values within the range, a set, frozenset,
+        list or tuple matches any of its values, and anything else is
+        matched by equality.
+        """
+        if isinstance(predicate, Range):
+            return self.in_range(attr_name, predicate)
+        if isinstance(predicate, (set, frozenset, list, tuple)):
+            return self.with_values(attr_name, predicate)
+        return self.with_value(attr_name, predicate)
+
+    def query(
+        self,
+        capability: Optional[str] = None,
+        where: Optional[Mapping[str, Any]] = None,
+    ) -> Optional[AbstractSet[str]]:
+        """Return the IDs of devices matching all of the given conditions.
+
+        Returns None if no conditions were given.
+        """
+        result: Optional[AbstractSet[str]] = None
+        if capability is not None:
+            result = self.with_capability(capability)
+        for attr_name, predicate in (where or {}).items():
+            ids = self.match(attr_name, predicate)
+            result = ids if result is None else result & ids
+            if not result:
+                break
+        return result
+
+    def _values_of(self, attr_name: str) -> Dict[Hashable, Set[str]]:
+        """Return the value index for an attribute, building it if necessary."""
+        attr_values = self._by_value.get(attr_name)
+        if attr_values is not None:
+            return attr_values
+
+        attr_values = self._by_value[attr_name] = {}
+        keys: List[float] = []
+        device_values = self._device_values
+        for device_id, device in self._devices.items():
+            attr = device.attributes.get(attr_name)
+            if attr is None:
+                continue
+            value: Any = attr.typed_value
+            if type(value) not in _SCALAR_TYPES and not _is_hashable(value):
+                continue
+            values = device_values.get(device_id)
+            if values is None:
+                values = device_values[device_id] = {}
+            values[attr_name] = value
+            ids = attr_values.get(value)
+            if ids is None:
+                ids = attr_values[value] = set()
+                if is_number(value):
+                    keys.append(value)
+            ids.add(device_id)
+        if keys:
+            keys.sort()
+            self._numeric_keys[attr_name] = keys
+        return attr_values
+
+    def _remove_value(self, device_id: str, attr_name: str, value: Any) -> None:
+        attr_values = self._by_value.get(attr_name)
+        if attr_values is None:
+            return
+        ids = attr_values.get(value)
+        if ids is None:
+            return
+        ids.discard(device_id)
+        if not ids:
+            del attr_values[value]
+            if is_number(value):
+                keys = self._numeric_keys[attr_name]
+                del keys[bisect_left(keys, value)]
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[str]], key: str, device_id: str) -> None:
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(device_id)
+            if not ids:
+                del index[key]
+
+
+def _is_hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
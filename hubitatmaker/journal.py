@@ -0,0 +1,257 @@
+"""An append-only on-disk journal of received events."""
+
+import json
+from logging import getLogger
+import mmap
+import os
+from queue import Queue
+import struct
+import threading
+from time import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+DEFAULT_JOURNAL_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_JOURNAL_BACKUP_COUNT = 4
+
+# Every journal file starts with this marker
+MAGIC = b"HMJ1"
+
+# A record is a little-endian u32 length of the rest of the record, followed
+# by the timestamp (f64), the value tag (u8), the device ID and attribute
+# name (each a u16 length and UTF-8 bytes), and the encoded value.
+_HEADER = struct.Struct("<IdB")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_F64 = struct.Struct("<d")
+
+_TAG_NONE = 0
+_TAG_NUMBER = 1
+_TAG_STRING = 2
+_TAG_JSON = 3
+
+_LOGGER = getLogger(__name__)
+
+
+class JournalRecord(NamedTuple):
+    """An event read from a journal."""
+
+    timestamp: float
+    device_id: Optional[str]
+    name: str
+    value: Any
+
+    def to_content(self) -> Dict[str, Any]:
+        """Return the record as hub event content."""
+        return {
+            "deviceId": self.device_id,
+            "name": self.name,
+            "value": self.value,
+            "displayName": None,
+            "descriptionText": None,
+            "type": None,
+        }
+
+
+def encode_record(
+    timestamp: float, device_id: Optional[str], name: str, value: Any
+) -> bytes:
+    """Encode an event as a journal record."""
+    if value is None:
+        tag = _TAG_NONE
+        value_bytes = b""
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        tag = _TAG_NUMBER
+        value_bytes = _F64.pack(value)
+    elif isinstance(value, str):
+        tag = _TAG_STRING
+        data = value.encode("utf-8")
+        value_bytes = _U32.pack(len(data)) + data
+    else:
+        tag = _TAG_JSON
+        data = json.dumps(value).encode("utf-8")
+        value_bytes = _U32.pack(len(data)) + data
+
+    id_bytes = (device_id or "").encode("utf-8")
+    name_bytes = name.encode("utf-8")
+    body = b"".join(
+        (
+            _U16.pack(len(id_bytes)),
+            id_bytes,
+            _U16.pack(len(name_bytes)),
+            name_bytes,
+            value_bytes,
+        )
+    )
+    return _HEADER.pack(_HEADER.size - 4 + len(body), timestamp, tag) + body
+
+
+def decode_records(buffer: Any) -> Iterator[JournalRecord]:
+    """Decode the records in a journal buffer.
+
+    buffer may be any object supporting the buffer protocol, such as an mmap.
+    Decoding stops at the first truncated record, which may be left behind
+    if the process exited while writing.
+    """
+    view = memoryview(buffer)
+    end = len(view)
+    if bytes(view[: len(MAGIC)]) != MAGIC:
+        raise ValueError("Not a journal file")
+
+    offset = len(MAGIC)
+    while offset + _HEADER.size <= end:
+        length, timestamp, tag = _HEADER.unpack_from(view, offset)
+        record_end = offset + 4 + length
+        if record_end > end:
+            _LOGGER.warning("Ignoring truncated journal record at %d", offset)
+            break
+
+        pos = offset + _HEADER.size
+        (id_len,) = _U16.unpack_from(view, pos)
+        pos += 2
+        device_id = str(view[pos : pos + id_len], "utf-8") or None
+        pos += id_len
+        (name_len,) = _U16.unpack_from(view, pos)
+        pos += 2
+        name = str(view[pos : pos + name_len], "utf-8")
+        pos += name_len
+
+        value: Any = None
+        if tag == _TAG_NUMBER:
+            (value,) = _F64.unpack_from(view, pos)
+        elif tag == _TAG_STRING or tag == _TAG_JSON:
+            (value_len,) = _U32.unpack_from(view, pos)
+            pos += 4
+            value = str(view[pos : pos + value_len], "utf-8")
+            if tag == _TAG_JSON:
+                value = json.loads(value)
+
+        yield JournalRecord(timestamp, device_id, name, value)
+        offset = record_end
+
+
+def journal_files(path: str) -> List[str]:
+    """Return the files of a rotated journal, oldest first."""
+    files: List[str] = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        files.append(f"{path}.{i}")
+        i += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_journal(path: str) -> Iterator[JournalRecord]:
+    """Read every record in a journal, including rotated files, oldest first.
+
+    Files are memory mapped and decoded sequentially.
+    """
+    for file in journal_files(path):
+        with open(file, "rb") as f:
+            if os.fstat(f.fileno()).st_size <= len(MAGIC):
+                continue
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                yield from decode_records(m)
+
+
+class Journal:
+    """An append-only event journal.
+
+    Events are queued by append and written in batches by a background
+    thread, so the caller (typically the event loop) never blocks on disk
+    I/O. When the current file would grow beyond max_bytes, it is rotated to
+    path.1 (shifting older files up, and deleting any beyond backup_count).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = DEFAULT_JOURNAL_MAX_BYTES,
+        backup_count: int = DEFAULT_JOURNAL_BACKUP_COUNT,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._queue: "Queue[Optional[Tuple[float, Optional[str], str, Any]]]" = Queue()
+        self._file = self._open()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def append(self, content: Dict[str, Any]) -> None:
+        """Queue an event's content to be written."""
+        self.record(content.get("deviceId"), content["name"], content.get("value"))
+
+    def record(self, device_id: Optional[str], name: str, value: Any) -> None:
+        """Queue an event to be written.
+
+        Numeric values are stored as numbers, so callers should pass values
+        that have already been decoded from the hub's strings.
+        """
+        self._queue.put((time(), device_id, name, value))
+
+    def flush(self) -> None:
+        """Wait until all queued events have been written."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Write any queued events and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+    def _open(self):
+        f = open(self.path, "ab")
+        if f.tell() == 0:
+            f.write(MAGIC)
+            f.flush()
+        return f
+
+    def _rotate(self) -> None:
+        self._file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = self._open()
+
+    def _run(self) -> None:
+        queue = self._queue
+        running = True
+        while running:
+            items = [queue.get()]
+            # Drain whatever else is waiting so it's written as one batch
+            while not queue.empty():
+                items.append(queue.get_nowait())
+
+            try:
+                batch: List[bytes] = []
+                for item in items:
+                    if item is None:
+                        running = False
+                        continue
+                    try:
+                        batch.append(encode_record(*item))
+                    except Exception:
+                        # Drop the record rather than losing the writer
+                        _LOGGER.exception("Can't journal event %s", item)
+                self._write(batch)
+            except Exception:
+                _LOGGER.exception("Error writing to journal %s", self.path)
+            finally:
+                for _ in items:
+                    queue.task_done()
+
+    def _write(self, records: List[bytes]) -> None:
+        f = self._file
+        for record in records:
+            if f.tell() + len(record) > self.max_bytes and f.tell() > len(MAGIC):
+                f.flush()
+                self._rotate()
+                f = self._file
+            f.write(record)
+        f.flush()
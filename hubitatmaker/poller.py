@@ -0,0 +1,185 @@
+"""Polling for device state when the hub can't push events."""
+
+import asyncio
+from logging import getLogger
+from time import monotonic
+from typing import Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Set
+
+from .types import Device
+
+DEFAULT_POLL_MIN_INTERVAL = 2.0
+DEFAULT_POLL_MAX_INTERVAL = 60.0
+DEFAULT_POLL_BULK_FRACTION = 0.25
+
+_LOGGER = getLogger(__name__)
+
+
+class Poller:
+    """Polls a hub for device state on adaptive per-device schedules.
+
+    Each device has its own polling interval. A device that changed, or that
+    was just sent a command, is polled every min_interval seconds; each poll
+    that finds no change doubles its interval, up to max_interval. Busy
+    devices are therefore kept current while idle devices cost little.
+
+    When at least bulk_fraction of the devices are due at once, they are all
+    polled with a single bulk request instead of one request per device. If
+    the hub doesn't support bulk requests, devices are always polled
+    individually; a bulk request that fails for another reason fails that
+    poll, and bulk requests are tried again on the next one. Hub state (mode and HSM status) is polled every
+    max_interval seconds.
+    """
+
+    def __init__(
+        self,
+        devices: Mapping[str, Device],
+        poll_device: Callable[[str], Awaitable[bool]],
+        poll_all: Callable[[], Awaitable[Optional[Set[str]]]],
+        poll_hub: Callable[[], Awaitable[None]],
+        min_interval: float = DEFAULT_POLL_MIN_INTERVAL,
+        max_interval: float = DEFAULT_POLL_MAX_INTERVAL,
+        bulk_fraction: float = DEFAULT_POLL_BULK_FRACTION,
+    ):
+        """Initialize a Poller.
+
+        devices:
+          The devices to poll
+        poll_device:
+          An async function that polls one device, given its ID, and returns
+          True if it changed
+        poll_all:
+          An async function that polls every device with one request, and
+          returns the IDs of the devices that changed, or None if bulk
+          requests aren't supported
+        poll_hub:
+          An async function that polls the hub's mode and HSM status
+        min_interval:
+          The shortest polling interval, in seconds
+        max_interval:
+          The longest polling interval, in seconds
+        bulk_fraction:
+          The fraction of devices that must be due to make a bulk request
+        """
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError("Invalid polling intervals")
+
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.bulk_fraction = bulk_fraction
+        self.request_count = 0
+        self._devices = devices
+        self._poll_device = poll_device
+        self._poll_all = poll_all
+        self._poll_hub = poll_hub
+        self._bulk_supported: Optional[bool] = None
+        self._intervals: Dict[str, float] = {}
+        self._next_poll: Dict[str, float] = {}
+        self._next_hub_poll: Optional[float] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def running(self) -> bool:
+        """Return True if the poller is running."""
+        return self._task is not None
+
+    def interval(self, device_id: str) -> float:
+        """Return the current polling interval of a device."""
+        return self._intervals.get(device_id, self.max_interval)
+
+    def start(self) -> None:
+        """Start polling in the background."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        """Stop polling."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def touch(self, device_id: str, now: Optional[float] = None) -> None:
+        """Poll a device soon and often, e.g. after sending it a command."""
+        now = monotonic() if now is None else now
+        self._intervals[device_id] = self.min_interval
+        self._next_poll[device_id] = now + self.min_interval
+
+    def due(self, now: Optional[float] = None) -> List[str]:
+        """Return the IDs of the devices that are due to be polled.
+
+        Devices that haven't been scheduled yet are scheduled to be polled
+        after max_interval.
+        """
+        now = monotonic() if now is None else now
+        next_poll = self._next_poll
+        due: List[str] = []
+        for device_id in self._devices:
+            when = next_poll.get(device_id)
+            if when is None:
+                next_poll[device_id] = now + self.interval(device_id)
+            elif when <= now:
+                due.append(device_id)
+        return due
+
+    async def poll(self, now: Optional[float] = None) -> Set[str]:
+        """Poll the devices that are due, and return the IDs that changed."""
+        now = monotonic() if now is None else now
+        changed: Set[str] = set()
+
+        if self._next_hub_poll is None:
+            self._next_hub_poll = now + self.max_interval
+        elif self._next_hub_poll <= now:
+            self._next_hub_poll = now + self.max_interval
+            self.request_count += 1
+            await self._poll_hub()
+
+        due = self.due(now)
+        if not due:
+            return changed
+
+        polled: Iterable[str] = due
+        bulk_changed: Optional[Set[str]] = None
+        if self._bulk_supported is not False and len(due) > 1:
+            if len(due) >= self.bulk_fraction * len(self._devices):
+                self.request_count += 1
+                bulk_changed = await self._poll_all()
+                if bulk_changed is None:
+                    _LOGGER.debug("Bulk polling isn't supported")
+                    self._bulk_supported = False
+                else:
+                    self._bulk_supported = True
+
+        if bulk_changed is not None:
+            changed = bulk_changed
+            polled = list(self._devices)
+        else:
+            for device_id in due:
+                self.request_count += 1
+                if await self._poll_device(device_id):
+                    changed.add(device_id)
+
+        for device_id in polled:
+            self._reschedule(device_id, device_id in changed, now)
+        return changed
+
+    def remove_device(self, device_id: str) -> None:
+        """Stop polling a device."""
+        self._intervals.pop(device_id, None)
+        self._next_poll.pop(device_id, None)
+
+    def _reschedule(self, device_id: str, changed: bool, now: float) -> None:
+        if changed:
+            interval = self.min_interval
+        else:
+            interval = min(self.interval(device_id) * 2, self.max_interval)
+        self._intervals[device_id] = interval
+        self._next_poll[device_id] = now + interval
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _LOGGER.warning("Unable to poll hub: %s", e)
+            await asyncio.sleep(self.min_interval)
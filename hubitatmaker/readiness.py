@@ -0,0 +1,85 @@
+"""Hub startup readiness signals."""
+
+import asyncio
+from typing import Dict, List, Optional
+
+
+class Readiness:
+    """Signals that track the progress of Hub startup.
+
+    Each signal is an asyncio.Event that is set when the corresponding part
+    of the hub's state becomes available:
+
+    server:
+      The event server is listening and its URL has been registered, or
+      polling has started
+    device_list:
+      The list of device IDs is known (see device_ids)
+    devices:
+      Every device in the device list has been loaded (or, for lazy hubs,
+      the device list has been loaded)
+    modes:
+      Modes have been loaded, or found to be unsupported
+    hsm:
+      The HSM status has been loaded, or found to be unsupported
+
+    device(device_id) returns an event that is set when a particular device
+    has been loaded.
+    """
+
+    def __init__(self) -> None:
+        self.device_ids: Optional[List[str]] = None
+        # Events are created when they're first used, so that a Hub can be
+        # created outside of an event loop (which on Python < 3.10 binds the
+        # events to the loop that's current at creation time, or fails)
+        self._signals: Dict[str, asyncio.Event] = {}
+        self._devices: Dict[str, asyncio.Event] = {}
+
+    @property
+    def server(self) -> asyncio.Event:
+        return self._signal("server")
+
+    @property
+    def device_list(self) -> asyncio.Event:
+        return self._signal("device_list")
+
+    @property
+    def devices(self) -> asyncio.Event:
+        return self._signal("devices")
+
+    @property
+    def modes(self) -> asyncio.Event:
+        return self._signal("modes")
+
+    @property
+    def hsm(self) -> asyncio.Event:
+        return self._signal("hsm")
+
+    def device(self, device_id: str) -> asyncio.Event:
+        """Return an event that is set when a device has been loaded."""
+        event = self._devices.get(device_id)
+        if event is None:
+            event = self._devices[device_id] = asyncio.Event()
+        return event
+
+    async def wait(self) -> None:
+        """Wait until the hub is fully started."""
+        await asyncio.gather(
+            self.server.wait(),
+            self.devices.wait(),
+            self.modes.wait(),
+            self.hsm.wait(),
+        )
+
+    def _signal(self, name: str) -> asyncio.Event:
+        event = self._signals.get(name)
+        if event is None:
+            event = self._signals[name] = asyncio.Event()
+        return event
+
+    def _set_device_ids(self, device_ids: List[str]) -> None:
+        self.device_ids = device_ids
+        self.device_list.set()
+
+    def _set_device_loaded(self, device_id: str) -> None:
+        self.device(device_id).set()
@@ -7,7 +7,8 @@ from typing import Any, Callable, Dict, List, Optional, cast
 
 from aiohttp import web
 
-EventCallback = Callable[[Dict[str, Any]], None]
+# Any value returned by a callback is ignored
+EventCallback = Callable[[Dict[str, Any]], object]
 
 
 class Server:
@@ -25,6 +26,7 @@ class Server:
         self.port = port
         self.handle_event = handle_event
         self.ssl_context = ssl_context
+        self._handlers: Dict[str, EventCallback] = {}
         self._main_loop = asyncio.get_event_loop()
 
     @property
@@ -32,10 +34,23 @@ class Server:
         scheme = "http" if self.ssl_context is None else "https"
         return f"{scheme}://{self.host}:{self.port}"
 
+    def add_handler(self, path: str, handle_event: EventCallback) -> None:
+        """Send events posted to a path (e.g., "/hub1") to a handler.
+
+        Paths are matched after URL decoding, so an event posted to
+        "/my%20hub" is sent to the handler for "/my hub". Events posted to "/"
+        are always sent to the server's handle_event.
+        """
+        self._handlers[path] = handle_event
+
+    def remove_handler(self, path: str) -> None:
+        """Stop routing events posted to a path."""
+        self._handlers.pop(path, None)
+
     def start(self) -> None:
         """Start a new server running in a background thread."""
         app = web.Application()
-        app.add_routes([web.post("/", self._handle_request)])
+        app.add_routes([web.post("/{path:.*}", self._handle_request)])
         self._runner = web.AppRunner(app)
 
         self._startup_event = threading.Event()
@@ -58,10 +73,15 @@ class Server:
 
     async def _handle_request(self, request: web.Request) -> web.Response:
         """Handle an incoming request."""
+        path = request.path
+        handle_event = self.handle_event if path == "/" else self._handlers.get(path)
+        if handle_event is None:
+            raise web.HTTPNotFound()
+
         event = await request.json()
         # This handler will be called on the server thread. Call the external
         # handler on the app thread.
-        self._main_loop.call_soon_threadsafe(self.handle_event, event)
+        self._main_loop.call_soon_threadsafe(handle_event, event)
         return web.Response(text="OK")
 
     def _run(self) -> None:
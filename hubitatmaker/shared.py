@@ -0,0 +1,306 @@
+"""Sharing device state with other processes through shared memory.
+
+A SharedStateExporter mirrors the numeric and enum attribute values of a
+hub's devices into a fixed-layout table in a shared memory block. Any number
+of processes can open the block with a SharedStateReader and read current
+values without loading devices from, or receiving events from, the hub.
+
+The block starts with a header, followed by a JSON directory describing each
+row of the table, followed by the table itself. Each row holds an attribute
+value and the time it was updated, as doubles. Enum values are stored as
+indexes into the values listed in the directory. Writes are protected by a
+seqlock: the writer increments a sequence number before and after each
+write, and readers retry if the number was odd or changed while they read.
+If a writer stops part way through a write (e.g., if its process is killed),
+readers give up after a timeout.
+"""
+
+import json
+from multiprocessing import shared_memory
+import struct
+import sys
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+from .types import Device, Event
+
+if TYPE_CHECKING:
+    from .hub import Hub
+
+LAYOUT_VERSION = 1
+DEFAULT_READ_TIMEOUT = 1.0
+
+_MAGIC = b"HMST"
+# magic, layout version, sequence number, row count, directory length
+_HEADER = struct.Struct("<4sIQII")
+_HEADER_SIZE = 32
+_SEQ = struct.Struct("<Q")
+_SEQ_OFFSET = 8
+_ROW = struct.Struct("<dd")
+
+_NAN = float("nan")
+
+
+class SharedStateExporter:
+    """Mirrors a hub's numeric and enum attribute values into shared memory.
+
+    The table's layout is fixed when the exporter is created: it has a row
+    for each NUMBER or ENUM attribute of each device the hub has loaded (or
+    of the given devices and attributes). Rows are updated as the hub
+    processes events, using device listeners.
+    """
+
+    def __init__(
+        self,
+        hub: "Hub",
+        name: Optional[str] = None,
+        device_ids: Optional[Iterable[str]] = None,
+        attributes: Optional[Iterable[str]] = None,
+    ):
+        """Initialize a SharedStateExporter and create its shared memory.
+
+        hub:
+          The hub to export state from
+        name:
+          The name of the shared memory block (optional). Defaults to a
+          random name, available as the name property.
+        device_ids:
+          The devices to export (optional). Defaults to every loaded device.
+        attributes:
+          The attributes to export (optional). Defaults to every NUMBER and
+          ENUM attribute.
+        """
+        self._hub = hub
+        self._seq = 0
+        self._rows: Dict[Tuple[str, str], Tuple[int, Optional[Dict[str, int]]]] = {}
+
+        wanted = None if attributes is None else set(attributes)
+        if device_ids is None:
+            device_ids = list(hub.devices)
+
+        directory: List[List[Any]] = []
+        for device_id in device_ids:
+            device = hub.devices[device_id]
+            for attr in device.attributes.values():
+                if wanted is not None and attr.name not in wanted:
+                    continue
+                if attr.type == "NUMBER":
+                    directory.append([device_id, attr.name, None])
+                elif attr.type == "ENUM" and attr.values:
+                    directory.append([device_id, attr.name, list(attr.values)])
+
+        dir_data = json.dumps({"rows": directory}).encode()
+        table_offset = _table_offset(len(dir_data))
+        size = table_offset + len(directory) * _ROW.size
+        self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+        self._buf = buf = _buffer(self._shm)
+        _HEADER.pack_into(
+            buf, 0, _MAGIC, LAYOUT_VERSION, 0, len(directory), len(dir_data)
+        )
+        buf[_HEADER_SIZE : _HEADER_SIZE + len(dir_data)] = dir_data
+
+        for row, (device_id, attr_name, values) in enumerate(directory):
+            offset = table_offset + row * _ROW.size
+            codes = None if values is None else {v: i for i, v in enumerate(values)}
+            self._rows[(device_id, attr_name)] = (offset, codes)
+            self._write_row(device_id, attr_name)
+
+        for device_id in {device_id for device_id, _ in self._rows}:
+            hub.add_device_listener(device_id, self._handle_event)
+
+    def __repr__(self) -> str:
+        return f"<SharedStateExporter name={self.name} rows={len(self._rows)}>"
+
+    @property
+    def name(self) -> str:
+        """Return the name of the shared memory block."""
+        return self._shm.name
+
+    @property
+    def version(self) -> int:
+        """Return the number of writes made to the table."""
+        return self._seq // 2
+
+    def close(self) -> None:
+        """Stop exporting, and destroy the shared memory block.
+
+        Readers that have already opened the block can keep reading it (the
+        values won't change), but no new readers can open it.
+        """
+        if self._rows:
+            for device_id in {device_id for device_id, _ in self._rows}:
+                self._hub.remove_device_listener(device_id, self._handle_event)
+            self._rows = {}
+            self._shm.close()
+            self._shm.unlink()
+
+    def _handle_event(self, event: Event) -> None:
+        self._write_row(event.device_id, event.attribute)
+
+    def _write_row(self, device_id: str, attr_name: str) -> None:
+        """Copy an attribute's current value into its row."""
+        row = self._rows.get((device_id, attr_name))
+        if row is None:
+            return
+        device: Optional[Device] = self._hub.devices.get(device_id)
+        if device is None:
+            return
+        attr = device.attributes.get(attr_name)
+        if attr is None:
+            return
+
+        offset, codes = row
+        value = attr.typed_value
+        if codes is not None:
+            value = codes.get(value, _NAN) if isinstance(value, str) else _NAN
+        elif value is None:
+            value = _NAN
+
+        buf = self._buf
+        self._seq += 1
+        _SEQ.pack_into(buf, _SEQ_OFFSET, self._seq)
+        _ROW.pack_into(buf, offset, value, device.last_update)
+        self._seq += 1
+        _SEQ.pack_into(buf, _SEQ_OFFSET, self._seq)
+
+
+class SharedStateReader:
+    """Reads device state exported by a SharedStateExporter.
+
+    Readers may run in any process. Reading never blocks the exporter; a
+    read that overlaps a write is retried. If the table is still being
+    written after timeout seconds, a TimeoutError is raised.
+    """
+
+    def __init__(self, name: str, timeout: float = DEFAULT_READ_TIMEOUT):
+        """Open the shared memory block exported with the given name.
+
+        name:
+          The name of the exporter's shared memory block
+        timeout:
+          How long a read may wait for a write to finish, in seconds
+          (optional). Defaults to DEFAULT_READ_TIMEOUT.
+        """
+        self.timeout = timeout
+        self._shm = _attach(name)
+        self._buf = buf = _buffer(self._shm)
+        magic, version, _, row_count, dir_len = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC or version != LAYOUT_VERSION:
+            self._shm.close()
+            raise ValueError(f"{name} is not a hub state table")
+
+        directory = json.loads(bytes(buf[_HEADER_SIZE : _HEADER_SIZE + dir_len]))
+        self._table_offset = _table_offset(dir_len)
+        self._table_end = self._table_offset + row_count * _ROW.size
+        self._rows: Dict[Tuple[str, str], Tuple[int, Optional[List[str]]]] = {}
+        self._keys: List[Tuple[str, str]] = []
+        self._values: List[Optional[List[str]]] = []
+        for row, (device_id, attr_name, values) in enumerate(directory["rows"]):
+            offset = self._table_offset + row * _ROW.size
+            self._rows[(device_id, attr_name)] = (offset, values)
+            self._keys.append((device_id, attr_name))
+            self._values.append(values)
+
+    def __repr__(self) -> str:
+        return f"<SharedStateReader name={self._shm.name} rows={len(self._rows)}>"
+
+    @property
+    def keys(self) -> List[Tuple[str, str]]:
+        """Return the (device ID, attribute name) pairs in the table."""
+        return list(self._keys)
+
+    @property
+    def version(self) -> int:
+        """Return the number of writes made to the table."""
+        return _SEQ.unpack_from(self._buf, _SEQ_OFFSET)[0] // 2
+
+    def get(self, device_id: str, attr_name: str) -> Tuple[Any, float]:
+        """Return the value of an attribute and the time it was updated.
+
+        NUMBER values are floats and ENUM values are strings. The value is
+        None if it's unknown. A KeyError is raised if the attribute isn't
+        exported.
+        """
+        offset, values = self._rows[(device_id, attr_name)]
+        buf = self._buf
+        deadline: Optional[float] = None
+        while True:
+            seq = _SEQ.unpack_from(buf, _SEQ_OFFSET)[0]
+            value, timestamp = _ROW.unpack_from(buf, offset)
+            if not seq & 1 and _SEQ.unpack_from(buf, _SEQ_OFFSET)[0] == seq:
+                return _decode(value, values), timestamp
+            deadline = self._retry(deadline)
+
+    def read(self) -> Dict[Tuple[str, str], Tuple[Any, float]]:
+        """Return a consistent copy of every exported value.
+
+        Values are keyed by (device ID, attribute name), and are pairs of the
+        value and the time it was updated, as returned by get().
+        """
+        buf = self._buf
+        deadline: Optional[float] = None
+        while True:
+            seq = _SEQ.unpack_from(buf, _SEQ_OFFSET)[0]
+            data = bytes(buf[self._table_offset : self._table_end])
+            if not seq & 1 and _SEQ.unpack_from(buf, _SEQ_OFFSET)[0] == seq:
+                break
+            deadline = self._retry(deadline)
+
+        return {
+            key: (_decode(value, values), timestamp)
+            for key, values, (value, timestamp) in zip(
+                self._keys, self._values, _ROW.iter_unpack(data)
+            )
+        }
+
+    def close(self) -> None:
+        """Stop reading the shared memory block."""
+        self._shm.close()
+
+    def _retry(self, deadline: Optional[float]) -> float:
+        """Wait before retrying a read, and return the read's deadline.
+
+        A TimeoutError is raised if the deadline has passed.
+        """
+        now = monotonic()
+        if deadline is None:
+            deadline = now + self.timeout
+        elif now > deadline:
+            raise TimeoutError(f"{self._shm.name} is still being written")
+        sleep(0)
+        return deadline
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Open an existing shared memory block without taking ownership of it."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+
+    shm = shared_memory.SharedMemory(name)
+    # Before Python 3.13, attaching registers the block with this process's
+    # resource tracker, which would destroy it when this process exits.
+    from multiprocessing import resource_tracker
+
+    resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore
+    return shm
+
+
+def _buffer(shm: shared_memory.SharedMemory) -> memoryview:
+    """Return the memory of an open shared memory block."""
+    buf = shm.buf
+    if buf is None:
+        raise ValueError(f"{shm.name} is closed")
+    return buf
+
+
+def _decode(value: float, values: Optional[List[str]]) -> Any:
+    if value != value:
+        return None
+    if values is not None:
+        return values[int(value)]
+    return value
+
+
+def _table_offset(dir_len: int) -> int:
+    """Return the offset of the table, aligned to 8 bytes."""
+    return (_HEADER_SIZE + dir_len + 7) & ~7
@@ -0,0 +1,77 @@
+"""Local snapshots of hub state for warm starts."""
+
+import json
+from logging import getLogger
+import os
+from time import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from .types import Device, Mode
+
+SNAPSHOT_VERSION = 1
+
+_LOGGER = getLogger(__name__)
+
+
+class Snapshot(NamedTuple):
+    """Hub state loaded from a snapshot file."""
+
+    timestamp: float
+    devices: List[Dict[str, Any]]
+    modes: List[Dict[str, Any]]
+    hsm_status: Optional[str]
+    extra: Dict[str, Any]
+
+
+def save_snapshot(
+    path: str,
+    devices: Iterable[Device],
+    modes: Iterable[Mode],
+    hsm_status: Optional[str],
+    extra: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Write a snapshot of hub state to a file.
+
+    The file is replaced atomically, so a crash while saving leaves the
+    previous snapshot intact. extra may hold any other JSON-serializable
+    local state.
+    """
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "timestamp": time(),
+        "devices": [d.to_properties() for d in devices],
+        "modes": [m.to_properties() for m in modes],
+        "hsm_status": hsm_status,
+        "extra": extra or {},
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str) -> Optional[Snapshot]:
+    """Load a snapshot of hub state from a file.
+
+    Return None if the file doesn't exist or can't be read.
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        _LOGGER.warning("Unable to read snapshot %s: %s", path, e)
+        return None
+
+    if data.get("version") != SNAPSHOT_VERSION:
+        _LOGGER.warning("Ignoring snapshot %s with unknown version", path)
+        return None
+
+    return Snapshot(
+        data["timestamp"],
+        data["devices"],
+        data["modes"],
+        data["hsm_status"],
+        data.get("extra", {}),
+    )
@@ -0,0 +1,48 @@
+import json
+from os.path import dirname, join
+from typing import Dict, List, Union
+
+import pytest
+
+from hubitatmaker.hub import Hub
+from hubitatmaker.types import Device
+
+
+class FakeResponse:
+    """A stand-in for an aiohttp response."""
+
+    def __init__(
+        self,
+        status=200,
+        data: Union[str, Dict, List] = "",
+        method: str = "GET",
+        url: str = "/",
+        reason: str = "",
+    ):
+        self.status = status
+        self._data = data
+        self.method = method
+        self.url = url
+        self.reason = reason
+
+    async def json(self):
+        if isinstance(self._data, str):
+            return json.loads(self._data)
+        return self._data
+
+    async def text(self):
+        if isinstance(self._data, str):
+            return self._data
+        return json.dumps(self._data)
+
+
+@pytest.fixture
+def hub() -> Hub:
+    """Return a hub populated with the fixture devices, without starting it."""
+    with open(join(dirname(__file__), "device_details.json")) as f:
+        device_details = json.loads(f.read())
+
+    hub = Hub("1.2.3.4", "1234", "token", resolve_mac=False)
+    for device_id, details in device_details.items():
+        hub._add_device(device_id, Device(details))
+    return hub
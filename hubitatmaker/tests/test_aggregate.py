@@ -0,0 +1,110 @@
+import json
+from math import fsum
+from os.path import dirname, join
+from typing import Any, List
+
+import pytest
+
+from hubitatmaker.aggregate import SUM_RECOMPUTE_INTERVAL, Aggregate, AggregateSet
+from hubitatmaker.const import AGG_COUNT, AGG_MAX, AGG_MEAN, AGG_MIN, AGG_SUM
+from hubitatmaker.types import Device
+
+with open(join(dirname(__file__), "device_details.json")) as f:
+    device_details = json.loads(f.read())
+
+
+def create_devices() -> List[Device]:
+    return [Device(json.loads(json.dumps(d))) for d in device_details.values()]
+
+
+def test_aggregate_checks_function() -> None:
+    """An aggregate should only accept known functions."""
+    pytest.raises(ValueError, Aggregate, "battery", "median")
+
+
+def test_aggregate_functions() -> None:
+    """Aggregates should compute their initial values."""
+    devices = create_devices()
+    values = {}
+    for function in AGG_SUM, AGG_MIN, AGG_MAX, AGG_MEAN, AGG_COUNT:
+        agg = Aggregate("battery", function, capability="Battery")
+        agg.reset(devices)
+        values[function] = agg.value
+    assert values == {
+        AGG_SUM: 166,
+        AGG_MIN: 66,
+        AGG_MAX: 100,
+        AGG_MEAN: 83,
+        AGG_COUNT: 2,
+    }
+
+
+def test_aggregate_updates_incrementally() -> None:
+    """Aggregates should update and notify listeners on changes."""
+    agg = Aggregate("battery", AGG_MIN)
+    agg.reset(create_devices())
+    changes: List[Any] = []
+    agg.add_listener(lambda a: changes.append(a.value))
+
+    agg.update("6", 50.0)
+    agg.update("6", 55.0)
+    agg.update("32", 70.0)
+    agg.update("176", 1.0)
+    assert agg.value == 55
+    assert changes == [50, 55]
+
+    agg.remove_device("6")
+    assert agg.value == 70
+    assert agg.device_count == 1
+
+
+def test_aggregate_count_matching() -> None:
+    """Count aggregates should count matching values."""
+    agg = Aggregate("contact", AGG_COUNT, match="open")
+    agg.reset(create_devices())
+    assert agg.value == 1
+    agg.update("6", "closed")
+    assert agg.value == 0
+
+
+def test_aggregate_device_ids() -> None:
+    """Aggregates should only include selected devices."""
+    agg = Aggregate("battery", AGG_SUM, device_ids=["32"])
+    agg.reset(create_devices())
+    assert agg.value == 66
+    agg.update("6", 1.0)
+    assert agg.value == 66
+
+
+def test_aggregate_sum_does_not_drift() -> None:
+    """Running sums should be recomputed exactly from the members."""
+    agg = Aggregate("battery", AGG_SUM)
+    agg.reset(create_devices())
+    naive = agg.value
+    for i in range(SUM_RECOMPUTE_INTERVAL):
+        old = agg._values["6"]
+        agg.update("6", 0.1 * (i % 10) + 0.01 * i)
+        naive += agg._values["6"] - old
+    assert agg.value == fsum(agg._values.values())
+    assert naive != agg.value
+
+    agg.remove_device("6")
+    agg.remove_device("32")
+    assert agg.value == 0.0
+
+
+def test_aggregate_set_membership() -> None:
+    """Device updates should re-evaluate which aggregates include a device."""
+    devices = create_devices()
+    aggregates = AggregateSet()
+    agg = Aggregate("battery", AGG_COUNT, capability="Battery")
+    aggregates.add(agg)
+    aggregates.reset(devices)
+    assert agg.value == 2
+
+    details = json.loads(json.dumps(device_details["6"]))
+    details["capabilities"] = [c for c in details["capabilities"] if c != "Battery"]
+    devices[0].update_state(details)
+    aggregates.update_device(devices[0])
+    assert agg.value == 1
+    assert "battery" in aggregates.attributes
@@ -0,0 +1,195 @@
+import asyncio
+import json
+from os.path import dirname, join
+import socket
+from typing import Any, List
+
+import pytest
+
+from hubitatmaker.broadcast import (
+    BroadcastClient,
+    EventBroadcaster,
+    encode_frame,
+    read_frame,
+)
+from hubitatmaker.hub import Hub
+
+with open(join(dirname(__file__), "events.json")) as f:
+    events = json.loads(f.read())
+
+
+async def wait_for_clients(broadcaster: EventBroadcaster, count: int) -> None:
+    while broadcaster.client_count < count:
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_broadcast(hub: Hub, tmp_path: Any) -> None:
+    """Clients should receive the events a hub processes."""
+    broadcaster = EventBroadcaster(hub, str(tmp_path / "hub.sock"))
+    await broadcaster.start()
+    client = BroadcastClient(broadcaster.path)
+    await client.start()
+    await wait_for_clients(broadcaster, 1)
+
+    device_events: List[Any] = []
+    hsm_events: List[Any] = []
+    client.add_device_listener("176", device_events.append)
+    client.add_hsm_listener(hsm_events.append)
+    iterator = client.events()
+    received = asyncio.ensure_future(iterator.__anext__())
+    await asyncio.sleep(0)
+
+    hub._process_event(events["device"])
+    event = await asyncio.wait_for(received, 1)
+    assert event.device_id == "176"
+    assert event.attribute == "switch"
+    assert event.value == "on"
+    assert event.device_name == "Loft Fan"
+    assert event.description == "Loft Fan is on"
+    assert len(device_events) == 1
+
+    hub._process_event(events["hsmArmedAway"])
+    event = await asyncio.wait_for(iterator.__anext__(), 1)
+    assert event.attribute == "hsmStatus"
+    assert event.value == "armedAway"
+    assert len(hsm_events) == 1
+
+    # Iteration ends when the broadcaster goes away
+    await broadcaster.stop()
+    with pytest.raises(StopAsyncIteration):
+        await asyncio.wait_for(iterator.__anext__(), 1)
+    assert not client.connected
+    await client.stop()
+
+
+@pytest.mark.asyncio
+async def test_broadcast_filters(hub: Hub, tmp_path: Any) -> None:
+    """Clients should only receive the events they subscribe to."""
+    hub_events: List[Any] = []
+    hub.add_event_listener(hub_events.append)
+    broadcaster = EventBroadcaster(hub, str(tmp_path / "hub.sock"))
+    await broadcaster.start()
+    client = BroadcastClient(
+        broadcaster.path, device_ids=["176"], attributes=["level"], hub_events=False
+    )
+    await client.start()
+    await wait_for_clients(broadcaster, 1)
+
+    received: List[Any] = []
+    client.add_event_listener(received.append)
+    hub._process_event(events["device"])
+    hub._process_event(events["hsmArmedAway"])
+    hub._process_event(
+        {"content": dict(events["device"]["content"], name="level", value="50")}
+    )
+    await asyncio.sleep(0.1)
+    assert [e.attribute for e in received] == ["level"]
+
+    # Stopping the broadcaster leaves other hub listeners alone
+    await broadcaster.stop()
+    await client.stop()
+    hub._process_event(events["device"])
+    assert len(hub_events) == 4
+
+
+@pytest.mark.asyncio
+async def test_broadcast_slow_client(hub: Hub, tmp_path: Any) -> None:
+    """Events should be dropped for clients whose buffers are full."""
+    broadcaster = EventBroadcaster(hub, str(tmp_path / "hub.sock"), buffer_size=2)
+    await broadcaster.start()
+    client = BroadcastClient(broadcaster.path)
+    await client.start()
+    await wait_for_clients(broadcaster, 1)
+
+    # Nothing is sent until the event loop runs
+    for _ in range(5):
+        hub._process_event(events["device"])
+    assert broadcaster.drop_count == 3
+
+    await client.stop()
+    await broadcaster.stop()
+
+
+@pytest.mark.asyncio
+async def test_frames() -> None:
+    """Frames should round trip and invalid frames should be rejected."""
+    reader = asyncio.StreamReader()
+    reader.feed_data(encode_frame({"a": 1}) + encode_frame({"b": [2]}))
+    reader.feed_data(b"\x05\x00\x00\x00[1,2]")
+    reader.feed_eof()
+    assert await read_frame(reader) == {"a": 1}
+    assert await read_frame(reader) == {"b": [2]}
+    with pytest.raises(ValueError):
+        await read_frame(reader)
+    assert await read_frame(reader) is None
+
+    reader = asyncio.StreamReader()
+    reader.feed_data(b"\xff\xff\xff\xff")
+    with pytest.raises(ValueError):
+        await read_frame(reader)
+
+    reader = asyncio.StreamReader()
+    reader.feed_data(b"\x05\x00")
+    reader.feed_eof()
+    with pytest.raises(asyncio.IncompleteReadError):
+        await read_frame(reader)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_socket_path(hub: Hub, tmp_path: Any) -> None:
+    """Only sockets left behind by exited broadcasters should be replaced."""
+    path = str(tmp_path / "hub.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    broadcaster = EventBroadcaster(hub, path)
+    await broadcaster.start()
+
+    # A running broadcaster's socket is left alone
+    other = EventBroadcaster(hub, path)
+    with pytest.raises(FileExistsError):
+        await other.start()
+    client = BroadcastClient(path)
+    await client.start()
+    await wait_for_clients(broadcaster, 1)
+    await client.stop()
+    await broadcaster.stop()
+
+    # So is anything that isn't a socket
+    with open(path, "w") as f:
+        f.write("data")
+    with pytest.raises(FileExistsError):
+        await other.start()
+    with open(path) as f:
+        assert f.read() == "data"
+
+
+@pytest.mark.asyncio
+async def test_broadcast_remove_listener(hub: Hub, tmp_path: Any) -> None:
+    """Clients should remove individual listeners like a hub."""
+    broadcaster = EventBroadcaster(hub, str(tmp_path / "hub.sock"))
+    await broadcaster.start()
+    client = BroadcastClient(broadcaster.path)
+    await client.start()
+    await wait_for_clients(broadcaster, 1)
+
+    kept: List[Any] = []
+    removed: List[Any] = []
+    client.add_device_listener("176", kept.append)
+    client.add_device_listener("176", removed.append)
+    client.add_event_listener(kept.append)
+    client.add_event_listener(removed.append)
+    client.remove_device_listener("176", removed.append)
+    client.remove_event_listener(removed.append)
+    # Removing a listener that was never added does nothing
+    client.remove_device_listener("6", removed.append)
+    client.remove_event_listener(removed.append)
+
+    hub._process_event(events["device"])
+    await asyncio.sleep(0.1)
+    assert len(kept) == 2
+    assert removed == []
+
+    await client.stop()
+    await broadcaster.stop()
@@ -0,0 +1,45 @@
+from typing import Set
+
+import pytest
+
+from hubitatmaker.cache import DeviceCache
+
+
+def test_cache_checks_size() -> None:
+    """A cache must be able to hold a device."""
+    pytest.raises(ValueError, DeviceCache, lambda device_id: False, 0)
+
+
+def test_cache_catalog() -> None:
+    """The catalog should track the hub's device list."""
+    cache = DeviceCache(lambda device_id: False)
+    cache.set_catalog([{"id": "6", "label": "Office Door"}, {"id": 32}])
+    assert list(cache) == ["6", "32"]
+    assert len(cache) == 2
+    assert "32" in cache
+    assert "176" not in cache
+    assert cache.summary("6") == {"id": "6", "label": "Office Door"}
+    assert cache.summary("176") is None
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    """Eviction should choose the least recently used unpinned devices."""
+    pinned: Set[str] = {"2"}
+    cache = DeviceCache(lambda device_id: device_id in pinned, 2)
+    for device_id in ("1", "2", "3"):
+        cache.touch(device_id)
+    assert cache.loaded_count == 3
+    assert cache.evictable() == ["1"]
+
+    cache.touch("1")
+    assert cache.evictable() == ["3"]
+    cache.discard("3")
+    assert cache.evictable() == []
+
+    # Pinned devices may keep the cache over its limit, but the most recently
+    # used device is never evicted
+    pinned.add("1")
+    cache.touch("4")
+    cache.touch("5")
+    assert cache.evictable() == ["4"]
+    assert cache.load_count == 5
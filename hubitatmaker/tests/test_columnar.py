@@ -0,0 +1,107 @@
+import json
+from os.path import dirname, join
+
+from hubitatmaker.columnar import ColumnarExporter
+from hubitatmaker.hub import Hub
+from hubitatmaker.types import Device
+
+with open(join(dirname(__file__), "device_details.json")) as f:
+    device_details = json.loads(f.read())
+
+with open(join(dirname(__file__), "events.json")) as f:
+    events = json.loads(f.read())
+
+
+def test_export(hub: Hub) -> None:
+    """Exports should hold a row for every device attribute."""
+    exporter = ColumnarExporter(hub)
+    state = exporter.export()
+    assert state.numbers.typecode == "d"
+    assert state.string_index.typecode == "i"
+    assert len(state.device_index) == 8
+    assert state.device_ids == ["6", "32", "176"]
+    assert state.attributes[:3] == ["battery", "contact", "tamper"]
+
+    rows = {(d, a): (v, t) for d, a, v, t in state.rows()}
+    assert rows[("32", "temperature")] == (63.99, hub.devices["32"].last_update)
+    assert rows[("6", "contact")][0] == "open"
+    assert rows[("176", "switch")][0] == "off"
+
+    # Columns are plain buffers
+    assert memoryview(state.numbers).nbytes == 8 * 8
+
+
+def test_export_updates_changed_rows(hub: Hub) -> None:
+    """Later exports should only rewrite rows that changed, in place."""
+    exporter = ColumnarExporter(hub)
+    state = exporter.export()
+    numbers = state.numbers
+    assert exporter.write_count == 8
+
+    assert exporter.export() is state
+    assert exporter.write_count == 8
+
+    hub._process_event(events["device"])
+    hub._process_event(events["hsmArmedAway"])
+    hub._process_event(
+        {"content": dict(events["device"]["content"], name="power", value="12.5")}
+    )
+    assert exporter.export() is state
+    assert exporter.write_count == 10
+    assert exporter.build_count == 1
+    assert state.numbers is numbers
+
+    rows = {(d, a): (v, t) for d, a, v, t in state.rows()}
+    assert rows[("176", "switch")] == ("on", hub.devices["176"].last_update)
+    assert rows[("176", "power")][0] == 12.5
+    assert rows[("6", "contact")][0] == "open"
+
+    # New attributes and devices rebuild the columns
+    hub._process_event(
+        {"content": dict(events["device"]["content"], name="level", value="50")}
+    )
+    hub._add_device("999", Device(json.loads(json.dumps(device_details["6"]))))
+    new_state = exporter.export()
+    assert new_state is not state
+    assert exporter.build_count == 2
+    assert "999" in new_state.device_ids
+
+    exporter.close()
+    hub._process_event(events["device"])
+    assert not exporter._dirty
+
+
+def test_export_selection(hub: Hub) -> None:
+    """Exports may be limited to some devices and attributes."""
+    exporter = ColumnarExporter(hub, device_ids=["6", "32"], attributes=["battery"])
+    state = exporter.export()
+    assert list(state.rows()) == [
+        ("6", "battery", 100.0, hub.devices["6"].last_update),
+        ("32", "battery", 66.0, hub.devices["32"].last_update),
+    ]
+
+    # Events for other devices and attributes are ignored
+    hub._process_event(events["device"])
+    assert exporter.export() is state
+    assert exporter.write_count == 2
+
+
+def test_export_follows_refreshes(hub: Hub) -> None:
+    """Refreshes that change or remove attributes should update the columns."""
+    exporter = ColumnarExporter(hub)
+    state = exporter.export()
+
+    details = json.loads(json.dumps(device_details["6"]))
+    details["attributes"][1]["currentValue"] = "closed"
+    hub._apply_device_state("6", details)
+    assert exporter.export() is state
+    rows = {(d, a): v for d, a, v, _ in state.rows()}
+    assert rows[("6", "contact")] == "closed"
+
+    del details["attributes"][2]
+    hub._apply_device_state("6", details)
+    new_state = exporter.export()
+    assert new_state is not state
+    assert ("6", "tamper") not in {(d, a) for d, a, _, _ in new_state.rows()}
+    exporter.close()
+    assert not hub._update_listeners
@@ -0,0 +1,200 @@
+import asyncio
+import json
+from os.path import dirname, join
+from typing import Any, Dict, List
+from unittest.mock import MagicMock, patch
+
+import aiohttp
+import pytest
+
+from hubitatmaker.error import InvalidToken
+from hubitatmaker.fleet import HubFleet
+from hubitatmaker.hub import Hub
+from hubitatmaker.tests.conftest import FakeResponse
+
+with open(join(dirname(__file__), "devices.json")) as f:
+    devices = json.loads(f.read())
+
+with open(join(dirname(__file__), "device_details.json")) as f:
+    device_details = json.loads(f.read())
+
+with open(join(dirname(__file__), "events.json")) as f:
+    events = json.loads(f.read())
+
+with open(join(dirname(__file__), "modes.json")) as f:
+    modes = json.loads(f.read())
+
+with open(join(dirname(__file__), "hsm.json")) as f:
+    hsm = json.loads(f.read())
+
+requests: List[Dict[str, Any]] = []
+
+
+class FakeRequest:
+    def __init__(self, method: str, url: str, **kwargs: Any):
+        requests.append({"method": method, "url": url, "data": kwargs})
+        path = url.split("/apps/api/")[1].split("/", 1)[1]
+        if "5.5.5.5" in url:
+            self.response = FakeResponse(401, {}, reason="Unauthorized")
+        elif path == "devices":
+            self.response = FakeResponse(data=devices)
+        elif path.startswith("devices/"):
+            self.response = FakeResponse(data=device_details.get(path[8:], {}))
+        elif path == "modes":
+            self.response = FakeResponse(data=modes)
+        elif path == "hsm":
+            self.response = FakeResponse(data=hsm)
+        else:
+            self.response = FakeResponse(data={})
+
+    async def __aenter__(self):
+        return self.response
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def clear_requests():
+    requests.clear()
+    with patch("getmac.get_mac_address", return_value="aa:bb:cc:dd:ee:ff"):
+        yield
+
+
+@patch("aiohttp.request", new=FakeRequest)
+@patch("hubitatmaker.server.Server")
+@pytest.mark.asyncio
+async def test_fleet_start(MockServer) -> None:
+    """A fleet should start its hubs with one server and connection pool."""
+    fleet = HubFleet(event_url="http://4.3.2.1:8080/")
+    hub1 = fleet.add_hub("1.2.3.4", "1234", "token")
+    hub2 = fleet.add_hub("1.2.3.5", "1234", "token", key="upstairs")
+    pytest.raises(ValueError, fleet.add_hub, "1.2.3.4", "5678", "token")
+
+    assert await fleet.start() == {}
+    assert MockServer.call_count == 1
+    assert hub1._connector is not None
+    assert hub1._connector is hub2._connector
+
+    post_urls = [r["url"] for r in requests if "postURL" in r["url"]]
+    assert len(post_urls) == 2
+    assert any(u.endswith("http%3A%2F%2F4.3.2.1%3A8080%2F1.2.3.4") for u in post_urls)
+    assert any(u.endswith("http%3A%2F%2F4.3.2.1%3A8080%2Fupstairs") for u in post_urls)
+
+    assert len(fleet.devices) == len(hub1.devices) + len(hub2.devices)
+    assert fleet.devices["upstairs", "176"] is hub2.devices["176"]
+    assert ("1.2.3.4", "176") in fleet.devices
+    assert [k for k, _ in fleet.find_devices("office door")] == [
+        "1.2.3.4",
+        "upstairs",
+    ]
+
+    await fleet.stop()
+    # The shared server is only stopped once, by the fleet
+    assert MockServer.return_value.stop.call_count == 1
+
+
+@patch("aiohttp.request", new=FakeRequest)
+@patch("hubitatmaker.server.Server")
+@pytest.mark.asyncio
+async def test_fleet_events(MockServer) -> None:
+    """Events should be routed to their hub and merged for fleet listeners."""
+    fleet = HubFleet(event_url="http://4.3.2.1:8080")
+    hub1 = fleet.add_hub("1.2.3.4", "1234", "token")
+    fleet.add_hub("1.2.3.5", "1234", "token")
+    await fleet.start()
+
+    handlers = {
+        c.args[0]: c.args[1] for c in MockServer.return_value.add_handler.call_args_list
+    }
+    assert set(handlers) == {"/1.2.3.4", "/1.2.3.5"}
+
+    received: List[Any] = []
+    fleet.add_listener(lambda key, evt: received.append((key, evt.value)))
+    stream = fleet.events()
+    next_event = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0)
+
+    hub_events: List[Any] = []
+    hub1.add_event_listener(hub_events.append)
+
+    handlers["/1.2.3.4"](events["device"])
+    assert hub1.devices["176"].attributes["switch"].value == "on"
+    assert received == [("1.2.3.4", "on")]
+    key, evt = await next_event
+    assert key == "1.2.3.4"
+    assert evt.device_id == "176"
+    # Fleet listeners get the same Event as the hub's listeners
+    assert hub_events == [evt]
+
+    # Events the hub ignores aren't passed on
+    handlers["/1.2.3.4"](events["other"])
+    handlers["/1.2.3.4"]({})
+    assert received == [("1.2.3.4", "on")]
+
+    await stream.aclose()
+    await fleet.stop()
+
+
+@patch("aiohttp.request", new=FakeRequest)
+@patch("hubitatmaker.fleet._get_local_address", new=lambda host: "127.0.0.1")
+@pytest.mark.asyncio
+async def test_fleet_event_server() -> None:
+    """Events posted to a hub's event URL should reach it, whatever its key."""
+    fleet = HubFleet()
+    hub = fleet.add_hub("http://10.0.0.5:8080", "1234", "token")
+    assert await fleet.start() == {}
+    received: List[Any] = []
+    fleet.add_listener(lambda key, evt: received.append(key))
+    try:
+        assert hub.event_url is not None
+        assert hub.event_url.endswith("/10.0.0.5%3A8080")
+        async with aiohttp.ClientSession() as session:
+            async with session.post(hub.event_url, json=events["device"]) as resp:
+                assert resp.status == 200
+        for _ in range(100):
+            if received:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await fleet.stop()
+
+    assert received == ["10.0.0.5:8080"]
+
+
+@patch("aiohttp.request", new=FakeRequest)
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_fleet_start_errors() -> None:
+    """A hub that fails to start shouldn't stop the others."""
+    fleet = HubFleet(event_url="http://4.3.2.1:8080")
+    hub = fleet.add_hub("1.2.3.4", "1234", "token")
+    fleet.add_hub("5.5.5.5", "1234", "token")
+    errors = await fleet.start()
+    assert list(errors) == ["5.5.5.5"]
+    assert isinstance(errors["5.5.5.5"], InvalidToken)
+    assert len(hub.devices) > 0
+    await fleet.stop()
+
+
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_fleet_start_concurrency() -> None:
+    """No more than start_concurrency hubs should start at once."""
+    running = 0
+    max_running = 0
+
+    async def start(self: Hub) -> None:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    fleet = HubFleet(event_url="http://4.3.2.1:8080", start_concurrency=2)
+    for i in range(6):
+        fleet.add_hub(f"1.2.3.{i}", "1234", "token")
+    with patch.object(Hub, "start", new=start):
+        assert await fleet.start() == {}
+    assert max_running == 2
+    await fleet.stop()
@@ -0,0 +1,48 @@
+from hubitatmaker.gaps import GapDetector
+
+
+def test_gap_detector_learns_rate() -> None:
+    """The silence threshold should follow the learned event rate."""
+    detector = GapDetector(factor=10, min_silence=5, max_silence=1000)
+    assert detector.threshold == 1000
+
+    # One event per second
+    count = 0
+    assert detector.observe(count, None, 0.0) is False
+    for t in range(10, 110, 10):
+        count += 10
+        assert detector.observe(count, float(t), float(t)) is False
+    assert detector.rate == 1.0
+    assert detector.threshold == 10.0
+
+    # A slower rate is clamped to max_silence
+    detector = GapDetector(factor=10, min_silence=5, max_silence=50)
+    detector.observe(0, None, 0.0)
+    detector.observe(1, 100.0, 100.0)
+    assert detector.threshold == 50
+
+
+def test_gap_detector_reports_gaps_once() -> None:
+    """A silence should be reported once, and re-armed by new events."""
+    detector = GapDetector(factor=10, min_silence=5, max_silence=1000)
+    detector.observe(0, None, 0.0)
+    detector.observe(10, 10.0, 10.0)
+    assert detector.threshold == 10.0
+
+    assert detector.observe(10, 10.0, 15.0) is False
+    assert detector.rate == 0.9
+    assert detector.observe(10, 10.0, 25.0) is True
+    assert detector.observe(10, 10.0, 35.0) is False
+    # The rate isn't learned from the gap
+    assert detector.rate == 0.9
+
+    assert detector.observe(11, 36.0, 40.0) is False
+    assert detector.observe(11, 36.0, 50.0) is True
+
+
+def test_gap_detector_without_events() -> None:
+    """Silence should be measured from the first observation."""
+    detector = GapDetector(min_silence=5, max_silence=20)
+    assert detector.observe(0, None, 100.0) is False
+    assert detector.observe(0, None, 110.0) is False
+    assert detector.observe(0, None, 125.0) is True
@@ -0,0 +1,107 @@
+import pytest
+
+from hubitatmaker.history import AttributeHistory, HistoryStore
+
+
+def test_history_checks_capacity() -> None:
+    """A history should require a positive capacity."""
+    pytest.raises(ValueError, AttributeHistory, 0, True)
+
+
+def test_numeric_history_stats() -> None:
+    """Numeric histories should compute windowed statistics."""
+    history = AttributeHistory(4, True)
+    for t, value in enumerate([10.0, 20.0, None, 30.0, 40.0]):
+        history.append(value, float(t))
+
+    assert len(history) == 4
+    assert list(history) == [(1.0, 20.0), (2.0, None), (3.0, 30.0), (4.0, 40.0)]
+    assert history.latest() == (4.0, 40.0)
+    assert history.min() == 20.0
+    assert history.max() == 40.0
+    assert history.mean() == 30.0
+    assert history.mean(seconds=1.5, now=4.0) == 35.0
+    assert history.min(seconds=0.5, now=10.0) is None
+
+
+def test_enum_history() -> None:
+    """Non-numeric histories should record values and changes."""
+    history = AttributeHistory(8, False)
+    for t, value in enumerate(["active", "inactive", "inactive", "inactive"]):
+        history.append(value, float(t))
+
+    assert history.last_change() == 1.0
+    assert history.last_change(seconds=5, now=4.0) == 1.0
+    assert history.last_change(seconds=2, now=4.0) is None
+    assert history.seen({"active"}, seconds=5, now=4.0) is True
+    assert history.seen({"active"}, seconds=2, now=4.0) is False
+    assert history.mean() is None
+
+
+def test_enum_history_symbols_are_bounded() -> None:
+    """Symbols no longer in the buffer should be dropped."""
+    history = AttributeHistory(2, False)
+    for i in range(100):
+        history.append(f"value {i}", float(i))
+    assert history.last_change(seconds=0, now=99.0) == 99.0
+    assert len(history._symbols) <= 4
+    assert list(history) == [(98.0, "value 98"), (99.0, "value 99")]
+
+
+def test_history_store() -> None:
+    """A store should keep histories per device attribute."""
+    store = HistoryStore(capacity=4, attributes=["power"])
+    store.record("1", "power", 10.0, 1.0)
+    store.record("1", "switch", "on", 1.0)
+    store.record("2", "power", 5.0, 1.0)
+
+    assert len(store) == 2
+    history = store.get("1", "power")
+    assert history is not None
+    assert history.numeric is True
+    assert store.get("1", "switch") is None
+
+    store.remove_device("1")
+    assert store.get("1", "power") is None
+
+
+def test_history_store_data_types() -> None:
+    """Buffers should be numeric based on the declared data type."""
+    store = HistoryStore(capacity=4)
+    store.record("1", "power", None, 1.0, data_type="NUMBER")
+    store.record("1", "power", 10.0, 2.0, data_type="NUMBER")
+    power = store.get("1", "power")
+    assert power is not None
+    assert power.numeric is True
+    assert power.max() == 10.0
+
+    store.record("1", "level", "50", 1.0, data_type="STRING")
+    level = store.get("1", "level")
+    assert level is not None
+    assert level.numeric is False
+
+    # Values that don't match a NUMBER attribute aren't lost
+    store.record("1", "power", "unknown", 3.0, data_type="NUMBER")
+    power = store.get("1", "power")
+    assert power is not None
+    assert power.numeric is False
+    assert list(power) == [(1.0, None), (2.0, 10.0), (3.0, "unknown")]
+
+    # A change of declared type to NUMBER converts the buffer back
+    store.record("1", "level", 60.0, 2.0, data_type="NUMBER")
+    level = store.get("1", "level")
+    assert level is not None
+    assert level.numeric is False
+    store.record("2", "level", "on", 1.0, data_type="ENUM")
+    store.record("2", "level", None, 2.0, data_type="ENUM")
+    store.record("2", "level", 5.0, 3.0, data_type="NUMBER")
+    level = store.get("2", "level")
+    assert level is not None
+    assert level.numeric is False
+
+    store.record("3", "level", None, 1.0, data_type="STRING")
+    store.record("3", "level", 5.0, 2.0, data_type="NUMBER")
+    level = store.get("3", "level")
+    assert level is not None
+    assert level.numeric is True
+    assert list(level) == [(1.0, None), (2.0, 5.0)]
@@ -1,17 +1,28 @@
+import asyncio
 import json
 from os.path import dirname, join
 import re
-from typing import Any, Dict, List, Union
+import threading
+from typing import Any, Dict, List
 from unittest.mock import MagicMock, patch
 from urllib.parse import unquote
 
 import pytest
 
-from hubitatmaker.const import HSM_DISARM
+from hubitatmaker import hub as hub_module
+from hubitatmaker.const import (
+    AGG_COUNT,
+    EVENT_DEVICE_ADDED,
+    EVENT_DEVICE_REMOVED,
+    HSM_DISARM,
+)
+from hubitatmaker.error import RequestError
 from hubitatmaker.hub import Hub, InvalidConfig
+from hubitatmaker.journal import read_journal
+from hubitatmaker.tests.conftest import FakeResponse
 
 hub_edit_page: str = ""
-devices: Dict[str, Any] = {}
+devices: List[Dict[str, Any]] = []
 device_details: Dict[str, Any] = {}
 events: Dict[str, Dict[str, Any]] = {}
 modes: List[Dict[str, Any]] = []
@@ -23,32 +34,6 @@ def fake_get_mac_address(**kwargs: str):
     return "aa:bb:cc:dd:ee:ff"
 
 
-class FakeResponse:
-    def __init__(
-        self,
-        status=200,
-        data: Union[str, Dict, List] = "",
-        method: str = "GET",
-        url: str = "/",
-        reason: str = "",
-    ):
-        self.status = status
-        self._data = data
-        self.method = method
-        self.url = url
-        self.reason = reason
-
-    async def json(self):
-        if isinstance(self._data, str):
-            return json.loads(self._data)
-        return self._data
-
-    async def text(self):
-        if isinstance(self._data, str):
-            return self._data
-        return json.dumps(self._data)
-
-
 def create_fake_request(responses: Dict = {}):
     class FakeRequest:
         def __init__(self, method: str, url: str, **kwargs: Any):
@@ -67,6 +52,8 @@ def create_fake_request(responses: Dict = {}):
                     self.response = responses["/modes"]
                 else:
                     self.response = FakeResponse(data=modes, url=url)
+            elif url.endswith("/devices/all") and "/devices/all" in responses:
+                self.response = responses["/devices/all"]
             elif url.endswith("/hsm"):
                 if "/hsm" in responses.keys():
                     self.response = responses["/hsm"]
@@ -164,6 +151,54 @@ def test_initial_values() -> None:
     assert list(hub.devices) == []
 
 
+def test_init_does_not_resolve_mac() -> None:
+    """Creating a hub should not look up its MAC address."""
+    hub_module._mac_cache.clear()
+    get_mac_address = MagicMock(return_value="aa:bb:cc:dd:ee:ff")
+    with patch("getmac.get_mac_address", new=get_mac_address):
+        hub = Hub("1.2.3.4", "1234", "token")
+        hub.set_host("1.2.3.5")
+        assert get_mac_address.called is False
+
+        # Outside of an event loop, reading mac resolves it directly
+        assert hub.mac == "aa:bb:cc:dd:ee:ff"
+        assert get_mac_address.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_get_mac() -> None:
+    """MAC addresses should be resolved lazily and cached by host."""
+    hub_module._mac_cache.clear()
+    get_mac_address = MagicMock(return_value="aa:bb:cc:dd:ee:ff")
+    with patch("getmac.get_mac_address", new=get_mac_address):
+        hub = Hub("1.2.3.4", "1234", "token")
+        assert hub.mac == ""
+        assert await hub.get_mac() == "aa:bb:cc:dd:ee:ff"
+        assert hub.mac == "aa:bb:cc:dd:ee:ff"
+
+        other = Hub("1.2.3.4", "5678", "token")
+        assert await other.get_mac() == "aa:bb:cc:dd:ee:ff"
+        assert get_mac_address.call_count == 1
+
+        skipped = Hub("1.2.3.6", "1234", "token", resolve_mac=False)
+        assert skipped.mac == ""
+        assert await skipped.get_mac() == ""
+        assert get_mac_address.call_count == 1
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_start_does_not_resolve_mac() -> None:
+    """Starting a hub shouldn't look up its MAC address."""
+    hub_module._mac_cache.clear()
+    get_mac_address = MagicMock(return_value="aa:bb:cc:dd:ee:ff")
+    with patch("getmac.get_mac_address", new=get_mac_address):
+        hub = Hub("1.2.3.4", "1234", "token")
+        await hub.start()
+        assert get_mac_address.called is False
+
+
 @patch("aiohttp.request", new=create_fake_request())
 @patch("hubitatmaker.server.Server")
 @pytest.mark.asyncio
@@ -181,18 +216,60 @@ async def test_start() -> None:
     """start() should request data from the Hubitat hub."""
     hub = Hub("1.2.3.4", "1234", "token")
     await hub.start()
-    # 13 requests:
-    #   0: set event URL
+    # 13 requests, made concurrently:
+    #   1: set event URL
     #   1: request devices
-    #   2...: request device details
-    #   -2: request modes
-    #   -1: request hsm status
-    assert len(requests) == 13
-    assert re.search("devices$", requests[1]["url"]) is not None
-    assert re.search(r"devices/\d+$", requests[2]["url"]) is not None
-    assert re.search(r"devices/\d+$", requests[3]["url"]) is not None
-    assert re.search("modes$", requests[-2]["url"]) is not None
-    assert re.search("hsm$", requests[-1]["url"]) is not None
+    #   9: request device details, after the device list
+    #   1: request modes
+    #   1: request hsm status
+    urls = [r["url"] for r in requests]
+    assert len(urls) == 13
+    assert len([u for u in urls if re.search("postURL", u)]) == 1
+    device_list = [i for i, u in enumerate(urls) if re.search("devices$", u)]
+    details = [i for i, u in enumerate(urls) if re.search(r"devices/\d+$", u)]
+    assert len(device_list) == 1
+    assert len(details) == 9
+    assert device_list[0] < min(details)
+    assert len([u for u in urls if re.search("modes$", u)]) == 1
+    assert len([u for u in urls if re.search("hsm$", u)]) == 1
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_readiness() -> None:
+    """Readiness signals should be set as parts of the hub are loaded."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    readiness = hub.readiness
+    assert readiness.device_list.is_set() is False
+
+    task = asyncio.ensure_future(hub.start())
+    await readiness.device_list.wait()
+    assert readiness.device_ids is not None
+    assert len(readiness.device_ids) == 9
+
+    await readiness.device("176").wait()
+    assert "176" in hub.devices
+
+    await readiness.wait()
+    assert readiness.server.is_set()
+    assert hub.mode == "Day"
+    assert hub.hsm_status is not None
+    await task
+
+
+@patch("hubitatmaker.server.Server", new=MagicMock())
+def test_readiness_outside_loop() -> None:
+    """A hub should be creatable in a thread without an event loop."""
+    hubs: List[Hub] = []
+    thread = threading.Thread(
+        target=lambda: hubs.append(Hub("1.2.3.4", "1234", "token"))
+    )
+    thread.start()
+    thread.join()
+    assert len(hubs) == 1
+    # No events are created until they're used
+    assert hubs[0].readiness._signals == {}
 
 
 @patch(
@@ -221,6 +298,29 @@ async def test_start_no_mode() -> None:
     assert hub.mode_supported is False
 
 
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@patch("hubitatmaker.hub._get_local_address", new=MagicMock(side_effect=OSError))
+@pytest.mark.asyncio
+async def test_start_failure_cancels_loading() -> None:
+    """A failed start shouldn't leave the rest of the startup running."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    cancelled: List[bool] = []
+
+    async def load_devices() -> None:
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with patch.object(hub, "load_devices", new=load_devices):
+        with pytest.raises(OSError):
+            await hub.start()
+    await asyncio.sleep(0)
+    assert cancelled == [True]
+
+
 @patch("aiohttp.request", new=create_fake_request())
 @patch("hubitatmaker.server.Server")
 @pytest.mark.asyncio
@@ -312,6 +412,528 @@ async def test_devices_loaded() -> None:
     assert len(hub.devices) == 9
 
 
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_watchdog() -> None:
+    """The watchdog should refresh stale devices and emit changes."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    await hub.start()
+    watchdog = hub.enable_watchdog(max_age=60)
+    assert hub.watchdog is watchdog
+    assert watchdog.running
+
+    # An event changes the switch locally; the hub still says it's off
+    hub._process_event(events["device"])
+    received: List[Any] = []
+    hub.add_device_listener("176", received.append)
+
+    assert await watchdog.refresh_stalest() is None
+    hub.devices["176"]._last_update = 0
+    assert await watchdog.refresh_stalest() == "176"
+    assert hub.devices["176"].attributes["switch"].value == "off"
+    assert [(e.attribute, e.value) for e in received] == [("switch", "off")]
+
+    hub.stop()
+    assert not watchdog.running
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_resync() -> None:
+    """Resyncs should refresh devices that have sent events."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    await hub.start()
+    hub.enable_gap_detection(check_interval=3600)
+
+    # Nothing to resync until a device has sent an event
+    assert await hub.resync() == []
+
+    hub._process_event(events["device"])
+    received: List[Any] = []
+    hub.add_device_listener("176", received.append)
+    requests.clear()
+    assert await hub.resync() == ["176"]
+    assert len(requests) == 1
+    assert [(e.attribute, e.value) for e in received] == [("switch", "off")]
+    assert await hub.resync(max_devices=0) == []
+
+    # Restarting the event server should trigger a resync
+    hub._process_event(events["device"])
+    await hub.set_port(8080)
+    task = hub._resync_task
+    assert task is not None
+    await task
+    assert hub.devices["176"].attributes["switch"].value == "off"
+    hub.stop()
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_resync_without_gap_detection() -> None:
+    """Without gap detection, events aren't tracked and any device may resync."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    await hub.start()
+    hub._process_event(events["device"])
+    assert hub._event_count == 0
+    assert hub._last_event_time is None
+    assert not hub._event_devices
+
+    stalest = min(hub.devices.values(), key=lambda d: d.last_update)
+    assert await hub.resync(max_devices=1) == [stalest.id]
+    hub.stop()
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_gap_detection() -> None:
+    """A long silence should trigger a resync."""
+    now = [1000.0]
+    with patch.object(hub_module, "monotonic", new=lambda: now[0]):
+        hub = Hub("1.2.3.4", "1234", "token")
+        await hub.start()
+        detector = hub.enable_gap_detection(check_interval=0)
+        detector.min_silence = detector.max_silence = 60
+        hub._process_event(events["device"])
+        assert hub._event_count == 1
+        await asyncio.sleep(0)
+
+        now[0] += 30
+        await asyncio.sleep(0)
+        resyncing = hub._resync_task is not None
+        assert not resyncing
+
+        now[0] += 60
+        await asyncio.sleep(0)
+        task = hub._resync_task
+        assert task is not None
+        await task
+        assert hub.devices["176"].attributes["switch"].value == "off"
+        hub.stop()
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_polling() -> None:
+    """A polling hub should poll devices instead of starting a server."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    poller = hub.enable_polling(min_interval=1, max_interval=8)
+    assert hub.poller is poller
+    await hub.start()
+    assert poller.running
+    assert hub.readiness.server.is_set()
+    assert not any("postURL" in r["url"] for r in requests)
+
+    received: List[Any] = []
+    hub.add_device_listener("176", received.append)
+    details = device_details["176"]
+    for attr in details["attributes"]:
+        if attr["name"] == "switch":
+            attr["currentValue"] = "on"
+
+    # The hub has no bulk endpoint, so devices are polled one at a time (the
+    # mode and HSM status are also polled)
+    await poller.poll(0)
+    requests.clear()
+    assert await poller.poll(1e12) == {"176"}
+    assert len(requests) == 1 + len(hub.devices) + 2
+    assert hub.devices["176"].attributes["switch"].value == "on"
+    assert [(e.attribute, e.value) for e in received] == [("switch", "on")]
+    assert poller.interval("176") == 1
+    assert poller.interval("6") == 8
+
+    # Nothing changed, so no events are sent
+    assert await poller.poll(1e12 + 1) == set()
+    assert len(received) == 1
+    assert poller.interval("176") == 2
+
+    # Commands make a device be polled quickly again
+    await hub.send_command("176", "on", None)
+    assert poller.interval("176") == 1
+
+    hub.stop()
+    assert not poller.running
+
+
+@patch(
+    "aiohttp.request",
+    new=create_fake_request(
+        {
+            "/devices/all": FakeResponse(
+                data=[
+                    {"id": "176", "attributes": {"switch": "on", "power": "0"}},
+                    {"id": "6", "attributes": {"contact": "open"}},
+                    {"id": "999", "attributes": {"switch": "on"}},
+                ]
+            )
+        }
+    ),
+)
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_polling_bulk() -> None:
+    """Bulk polls should only send events for values that changed."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    poller = hub.enable_polling()
+    await hub.start()
+
+    received: List[Any] = []
+    hub.add_device_listener("176", received.append)
+    await poller.poll(0)
+    requests.clear()
+    assert await poller.poll(1e12) == {"176"}
+    assert len([r for r in requests if "/devices" in r["url"]]) == 1
+    assert [(e.attribute, e.value) for e in received] == [("switch", "on")]
+
+    assert await poller.poll(2e12) == set()
+    assert len(received) == 1
+    hub.stop()
+
+
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_polling_bulk_errors() -> None:
+    """Only a missing bulk endpoint should stop bulk polling."""
+    responses: Dict[str, Any] = {"/devices/all": FakeResponse(400, url="/devices/all")}
+
+    def bulk_requests() -> int:
+        return len([r for r in requests if r["url"].endswith("/devices/all")])
+
+    with patch("aiohttp.request", new=create_fake_request(responses)):
+        hub = Hub("1.2.3.4", "1234", "token")
+        poller = hub.enable_polling()
+        await hub.start()
+        await poller.poll(0)
+
+        # Other errors fail the poll, and bulk polling is tried again
+        with pytest.raises(RequestError):
+            await poller.poll(1e12)
+        assert bulk_requests() == 1
+
+        responses["/devices/all"] = FakeResponse(404, url="/devices/all")
+        await poller.poll(2e12)
+        assert bulk_requests() == 2
+        await poller.poll(3e12)
+        assert bulk_requests() == 2
+        hub.stop()
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_sync_devices() -> None:
+    """Syncing should only load new devices and remove missing ones."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    await hub.start()
+    switches = hub.add_aggregate("switch", AGG_COUNT)
+    assert switches.value == 1
+    received: List[Any] = []
+    hub.add_inventory_listener(received.append)
+    hub.add_device_listener("176", received.append)
+
+    requests.clear()
+    assert await hub.sync_devices() == ([], [])
+    assert len(requests) == 1
+
+    new_device = dict(device_details["6"], id="300", label="Back Door")
+    device_details["300"] = new_device
+    devices.append({"id": "300", "label": "Back Door", "name": new_device["name"]})
+    devices[:] = [d for d in devices if d["id"] != "176"]
+
+    requests.clear()
+    assert await hub.sync_devices() == (["300"], ["176"])
+    assert len(requests) == 2
+    assert "176" not in hub.devices
+    assert hub.devices["300"].name == "Back Door"
+    assert [d.id for d in hub.find_devices(name="back door")] == ["300"]
+    assert hub.query_devices("Switch") == []
+    assert switches.value == 0
+    assert [(e.device_id, e.attribute) for e in received] == [
+        ("176", EVENT_DEVICE_REMOVED),
+        ("300", EVENT_DEVICE_ADDED),
+    ]
+
+    # Listeners for removed devices are dropped
+    hub._process_event(events["device"])
+    assert len(received) == 2
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_lazy_loading() -> None:
+    """A lazy hub should load device details on demand."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    cache = hub.enable_lazy_loading(max_devices=1)
+    assert hub.device_cache is cache
+    await hub.start()
+    assert not any(re.search("/devices/\\d+$", r["url"]) for r in requests)
+    assert len(hub.devices) == 0
+    assert cache.device_ids == [d["id"] for d in devices]
+    assert hub.readiness.devices.is_set()
+
+    # Events for devices that haven't been loaded are still sent to listeners
+    received: List[Any] = []
+    hub.add_device_listener("176", received.append)
+    hub._process_event(events["device"])
+    assert len(received) == 1
+
+    requests.clear()
+    device, same = await asyncio.gather(hub.get_device("6"), hub.get_device("6"))
+    assert device is same
+    assert device.name == "Office Door"
+    assert len(requests) == 1
+    assert await hub.get_device("6") is device
+    assert len(requests) == 1
+    with pytest.raises(KeyError):
+        await hub.get_device("999")
+
+    # Devices with listeners are pinned; others are evicted when over the limit
+    await hub.get_device("176")
+    await hub.get_device("32")
+    assert sorted(hub.devices) == ["176", "32"]
+    assert cache.eviction_count == 1
+    await hub.get_device("6")
+    assert sorted(hub.devices) == ["176", "6"]
+    assert cache.load_count == 4
+
+    hub.remove_device_listeners("176")
+    await hub.get_device("32")
+    assert sorted(hub.devices) == ["32"]
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_versioned_state() -> None:
+    """Events should publish new versions of device state."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    await hub.start()
+    versions = hub.enable_versioned_state()
+    assert hub.versioned_state is versions
+    before = versions.current
+    assert sorted(before) == sorted(hub.devices)
+
+    hub._process_event(events["device"])
+    after = versions.current
+    assert after.version == before.version + 1
+    assert after["176"].attributes["switch"] == "on"
+    assert before["176"].attributes["switch"] == "off"
+
+    # Refreshing publishes the hub's state again
+    await hub.refresh_device("176")
+    assert versions.current["176"].attributes["switch"] == "off"
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_query_devices() -> None:
+    """Started hub should find devices through its indexes."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    await hub.start()
+    assert [d.id for d in hub.query_devices("Switch")] == ["176"]
+    assert hub.query_devices(where={"switch": "on"}) == []
+
+    hub._process_event(events["device"])
+    assert [d.id for d in hub.query_devices(where={"switch": "on"})] == ["176"]
+    assert len(hub.query_devices()) == len(hub.devices)
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_find_devices() -> None:
+    """Started hub should find devices by name and type."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    await hub.start()
+    assert [d.id for d in hub.find_devices(name="loft fan")] == ["176"]
+    assert [d.id for d in hub.find_devices(name="LOFT", prefix=True)] == ["176"]
+    assert hub.find_devices(name="loft fan", type="generic z-wave", prefix=True) == []
+    assert hub.find_devices() == []
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_aggregate() -> None:
+    """Hub should keep aggregates up to date."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    await hub.start()
+    agg = hub.add_aggregate("switch", AGG_COUNT, match="on")
+    assert agg.value == 0
+
+    hub._process_event(events["device"])
+    assert agg.value == 1
+
+    for a in device_details["176"]["attributes"]:
+        if a["name"] == "switch":
+            a["currentValue"] = "off"
+    await hub.load_devices(force_refresh=True)
+    assert agg.value == 0
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_history() -> None:
+    """Hub should record attribute history when enabled."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    await hub.start()
+    assert hub.history is None
+
+    history = hub.enable_history(capacity=8)
+    hub._process_event(events["device"])
+    switch = history.get("176", "switch")
+    assert switch is not None
+    assert [v for _, v in switch] == ["on"]
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_journal(tmp_path) -> None:
+    """Hub should journal events and be able to replay them."""
+    path = join(str(tmp_path), "events.journal")
+    hub = Hub("1.2.3.4", "1234", "token")
+    await hub.start()
+    journal = hub.enable_journal(path)
+    hub._process_event(events["device"])
+    hub._process_event(events["mode"])
+    power = {"deviceId": "176", "name": "power", "value": "70.5"}
+    hub._process_event({"content": power})
+    journal.flush()
+    hub.stop()
+
+    # Numeric values are journaled as numbers, not as the hub's strings
+    records = list(read_journal(path))
+    assert [r.value for r in records] == ["on", "Evening", 70.5]
+
+    other = Hub("1.2.3.4", "1234", "token")
+    await other.start()
+    assert other.devices["176"].attributes["switch"].value == "off"
+    assert other.replay_journal(path) == 3
+    assert other.devices["176"].attributes["switch"].value == "on"
+    assert other.devices["176"].attributes["power"].typed_value == 70.5
+    assert other.mode == "Evening"
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_warm_start(tmp_path) -> None:
+    """Hub should start from a snapshot and reconcile in the background."""
+    path = join(str(tmp_path), "hub.snapshot")
+    hub = Hub("1.2.3.4", "1234", "token", snapshot_path=path)
+    await hub.start()
+    hub._process_event(events["device"])
+    hub.stop()
+
+    requests.clear()
+    hub = Hub("1.2.3.4", "1234", "token", snapshot_path=path)
+    received: List[Any] = []
+    hub.add_device_listener("176", received.append)
+    await hub.start()
+
+    # Nothing was requested before start returned; the event URL was
+    # registered by the previous run
+    assert len(requests) == 0
+    assert hub.stale is True
+    assert hub.mode == "Day"
+    assert hub.devices["176"].attributes["switch"].value == "on"
+
+    assert hub._reconcile_task is not None
+    await hub._reconcile_task
+    assert hub.stale is False
+    assert hub.devices["176"].attributes["switch"].value == "off"
+    assert [(e.attribute, e.value) for e in received] == [("switch", "off")]
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_warm_start_syncs_devices(tmp_path) -> None:
+    """Reconciling a snapshot should add new devices and remove missing ones."""
+    path = join(str(tmp_path), "hub.snapshot")
+    # Only devices with details can be restored from a snapshot
+    devices[:] = [d for d in devices if d["id"] in device_details]
+    hub = Hub("1.2.3.4", "1234", "token", snapshot_path=path)
+    await hub.start()
+    hub.stop()
+
+    new_device = dict(device_details["6"], id="300", label="Back Door")
+    device_details["300"] = new_device
+    devices.append({"id": "300", "label": "Back Door", "name": new_device["name"]})
+    devices[:] = [d for d in devices if d["id"] != "176"]
+
+    hub = Hub("1.2.3.4", "1234", "token", snapshot_path=path)
+    received: List[Any] = []
+    hub.add_inventory_listener(received.append)
+    await hub.start()
+    assert "176" in hub.devices
+    assert "300" not in hub.devices
+
+    assert hub._reconcile_task is not None
+    await hub._reconcile_task
+    assert "176" not in hub.devices
+    assert hub.devices["300"].name == "Back Door"
+    assert hub.query_devices("Switch") == []
+    assert [(e.device_id, e.attribute) for e in received] == [
+        ("176", EVENT_DEVICE_REMOVED),
+        ("300", EVENT_DEVICE_ADDED),
+    ]
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@patch("hubitatmaker.hub.EVENT_URL_CHECK_DELAY", new=0)
+@pytest.mark.asyncio
+async def test_skip_registered_event_url(tmp_path) -> None:
+    """Hub should only register its event URL when it isn't registered."""
+    path = join(str(tmp_path), "hub.snapshot")
+    event_url = "http://4.3.2.1:8080"
+
+    def post_url_count() -> int:
+        return len([r for r in requests if "postURL" in r["url"]])
+
+    hub = Hub("1.2.3.4", "1234", "token", event_url=event_url, snapshot_path=path)
+    await hub.start()
+    assert post_url_count() == 1
+    hub.stop()
+
+    # A restarted hub should skip registration, and keep it if events arrive
+    requests.clear()
+    hub = Hub("1.2.3.4", "1234", "token", event_url=event_url, snapshot_path=path)
+    await hub.start()
+    assert post_url_count() == 0
+    hub._process_event(events["device"])
+    task = hub._event_url_check_task
+    assert task is not None
+    await task
+    assert post_url_count() == 0
+    hub.stop()
+
+    # If no events arrive, the event URL should be registered again
+    hub = Hub("1.2.3.4", "1234", "token", event_url=event_url, snapshot_path=path)
+    await hub.start()
+    task = hub._event_url_check_task
+    assert task is not None
+    await task
+    assert post_url_count() == 1
+    hub.stop()
+
+    # A different hub shouldn't use the registration
+    requests.clear()
+    hub = Hub("1.2.3.5", "1234", "token", event_url=event_url, snapshot_path=path)
+    await hub.start()
+    assert post_url_count() == 1
+    hub.stop()
+
+
 @patch("aiohttp.request", new=create_fake_request())
 @patch("hubitatmaker.server.Server", new=MagicMock())
 @pytest.mark.asyncio
@@ -351,6 +973,45 @@ async def test_process_mode_event() -> None:
     assert handler_called is True
 
 
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_process_event_without_listeners() -> None:
+    """Events should not be created when nothing is listening for them."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    await hub.start()
+
+    with patch("hubitatmaker.hub.Event") as MockEvent:
+        hub._process_event(events["device"])
+        hub._process_event(events["mode"])
+        assert MockEvent.called is False
+
+        hub.add_device_listener("176", lambda _: None)
+        hub._process_event(events["device"])
+        assert MockEvent.call_count == 1
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_process_event_event_listeners() -> None:
+    """Event listeners should receive device, mode and HSM events."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    await hub.start()
+
+    received: List[Any] = []
+    hub.add_event_listener(received.append)
+    hub._process_event(events["device"])
+    hub._process_event(events["mode"])
+    hub._process_event(events["hsmArmedAway"])
+    hub._process_event(events["other"])
+    assert [e.attribute for e in received] == ["switch", "mode", "hsmStatus"]
+
+    hub.remove_event_listener(received.append)
+    hub._process_event(events["device"])
+    assert len(received) == 3
+
+
 @patch("aiohttp.request", new=create_fake_request())
 @patch("hubitatmaker.server.Server", new=MagicMock())
 @pytest.mark.asyncio
@@ -418,6 +1079,33 @@ async def test_process_set_mode() -> None:
 
     hub._process_event(events["mode"])
     assert hub.mode == "Evening"
+    assert [m.name for m in hub._modes if m.active] == ["Evening"]
+
+
+@patch("aiohttp.request", new=create_fake_request())
+@patch("hubitatmaker.server.Server", new=MagicMock())
+@pytest.mark.asyncio
+async def test_refresh_device_emits_changes() -> None:
+    """Refreshing a device should emit events for changed attributes."""
+    hub = Hub("1.2.3.4", "1234", "token")
+    await hub.start()
+    device = hub.devices["176"]
+    attr = device.attributes["switch"]
+
+    received: List[Any] = []
+    hub.add_device_listener("176", received.append)
+
+    await hub.refresh_device("176")
+    assert received == []
+
+    for a in device_details["176"]["attributes"]:
+        if a["name"] == "switch":
+            a["currentValue"] = "on"
+    await hub.refresh_device("176")
+
+    assert device.attributes["switch"] is attr
+    assert attr.value == "on"
+    assert [(e.attribute, e.value) for e in received] == [("switch", "on")]
 
 
 @patch("aiohttp.request", new=create_fake_request())
@@ -0,0 +1,104 @@
+import json
+from os.path import dirname, join
+from typing import Any
+
+from hubitatmaker.index import DeviceIndex, Range
+from hubitatmaker.types import Device
+
+with open(join(dirname(__file__), "device_details.json")) as f:
+    device_details = json.loads(f.read())
+
+
+def create_index() -> DeviceIndex:
+    devices = {
+        device_id: Device(json.loads(json.dumps(details)))
+        for device_id, details in device_details.items()
+    }
+    index = DeviceIndex(devices)
+    for device in devices.values():
+        index.update_device(device)
+    return index
+
+
+def set_value(index: DeviceIndex, device_id: str, name: str, value: Any) -> None:
+    """Update a device attribute and report the change, as Hub does."""
+    typed_value = index._devices[device_id].update_attr(name, value)
+    index.update_attr(device_id, name, typed_value)
+
+
+def test_index_by_capability() -> None:
+    """Devices should be indexed by capability."""
+    index = create_index()
+    assert index.with_capability("Battery") == {"6", "32"}
+    assert index.with_capability("Switch") == {"176"}
+    assert index.with_capability("Thermostat") == set()
+
+
+def test_index_by_value() -> None:
+    """Devices should be indexed by attribute value."""
+    index = create_index()
+    assert index.with_value("switch", "off") == {"176"}
+    assert index.with_values("contact", {"open", "closed"}) == {"6"}
+
+    set_value(index, "176", "switch", "on")
+    assert index.with_value("switch", "off") == set()
+    assert index.with_value("switch", "on") == {"176"}
+
+
+def test_index_by_range() -> None:
+    """Numeric values should be queryable by range."""
+    index = create_index()
+    assert index.in_range("battery", Range(max=70)) == {"32"}
+    assert index.in_range("battery", Range(min=66, max=100)) == {"6", "32"}
+
+    set_value(index, "6", "battery", 15)
+    assert index.in_range("battery", Range(max=20)) == {"6"}
+    assert index.in_range("battery", Range(min=90)) == set()
+
+
+def test_index_built_on_first_query() -> None:
+    """Value indexes should reflect updates made before and after a query."""
+    index = create_index()
+    assert "battery" not in index.indexed
+    set_value(index, "6", "battery", 15)
+    assert index.in_range("battery", Range(max=20)) == {"6"}
+    assert "battery" in index.indexed
+    assert index.with_value("battery", {"a": 1}) == set()
+
+    set_value(index, "32", "battery", 10)
+    assert index.in_range("battery", Range(max=20)) == {"6", "32"}
+    index.remove_device("6")
+    assert index.in_range("battery", Range(max=20)) == {"32"}
+
+
+def test_index_query() -> None:
+    """Queries should combine conditions."""
+    index = create_index()
+    assert index.query() is None
+    assert index.query("Battery", {"battery": Range(min=50)}) == {"6", "32"}
+    assert index.query("Battery", {"water": "dry"}) == {"32"}
+    assert index.query("Switch", {"water": "dry"}) == set()
+
+
+def test_index_remove_device() -> None:
+    """Removed devices should no longer be found."""
+    index = create_index()
+    del index._devices["6"]  # type: ignore
+    index.remove_device("6")
+    assert index.with_capability("Battery") == {"32"}
+    assert index.in_range("battery", Range()) == {"32"}
+
+
+def test_index_by_name_and_type() -> None:
+    """Devices should be found by name and type, ignoring case."""
+    index = create_index()
+    assert index.with_name("office door") == {"6"}
+    assert index.with_name("OFFICE", prefix=True) == {"6"}
+    assert index.with_type("generic zigbee", prefix=True) == {"32", "176"}
+    assert index.with_type("Generic Zigbee") == set()
+
+    details = json.loads(json.dumps(device_details["6"]))
+    details["label"] = "Front Door"
+    index.update_device(Device(details))
+    assert index.with_name("office door") == set()
+    assert index.with_name("front", prefix=True) == {"6"}
@@ -0,0 +1,84 @@
+from os.path import join
+import threading
+
+import pytest
+
+from hubitatmaker.journal import (
+    MAGIC,
+    Journal,
+    decode_records,
+    encode_record,
+    journal_files,
+    read_journal,
+)
+
+
+def test_records_round_trip() -> None:
+    """Encoded records should decode to the same values."""
+    data = MAGIC + b"".join(
+        [
+            encode_record(1.0, "176", "switch", "on"),
+            encode_record(2.0, "176", "power", 12.5),
+            encode_record(3.0, None, "mode", "Night"),
+            encode_record(4.0, "6", "lockCodes", {"1": {"name": "a"}}),
+            encode_record(5.0, "6", "battery", None),
+        ]
+    )
+    records = list(decode_records(data))
+    assert [tuple(r) for r in records] == [
+        (1.0, "176", "switch", "on"),
+        (2.0, "176", "power", 12.5),
+        (3.0, None, "mode", "Night"),
+        (4.0, "6", "lockCodes", {"1": {"name": "a"}}),
+        (5.0, "6", "battery", None),
+    ]
+
+
+def test_truncated_record_is_ignored() -> None:
+    """A partially written record should be skipped."""
+    data = MAGIC + encode_record(1.0, "1", "switch", "on")
+    data += encode_record(2.0, "1", "switch", "off")[:-3]
+    assert [r.value for r in decode_records(data)] == ["on"]
+
+
+def test_invalid_journal() -> None:
+    """Decoding should fail for data that isn't a journal."""
+    with pytest.raises(ValueError):
+        list(decode_records(b"nope"))
+
+
+def test_journal_writes_and_rotates(tmp_path) -> None:
+    """A journal should write events and rotate by size."""
+    path = join(str(tmp_path), "events.journal")
+    journal = Journal(path, max_bytes=200, backup_count=2)
+    for i in range(20):
+        journal.append({"deviceId": "176", "name": "power", "value": float(i)})
+    journal.close()
+
+    files = journal_files(path)
+    assert files == [f"{path}.2", f"{path}.1", path]
+
+    values = [r.value for r in read_journal(path)]
+    # The oldest events were rotated out, but the rest are in order
+    assert values == sorted(values)
+    assert values[-1] == 19.0
+    assert len(values) < 20
+
+
+def test_journal_survives_bad_records(tmp_path) -> None:
+    """Records that can't be encoded should be dropped, not stop the writer."""
+    path = join(str(tmp_path), "events.journal")
+    journal = Journal(path)
+    journal.append({"deviceId": 176, "name": "switch", "value": "on"})
+    journal.append({"deviceId": "176", "name": "switch", "value": "off"})
+
+    flushed = threading.Event()
+    flusher = threading.Thread(
+        target=lambda: (journal.flush(), flushed.set()), daemon=True
+    )
+    flusher.start()
+    assert flushed.wait(5)
+
+    journal.append({"deviceId": "176", "name": "switch", "value": "on"})
+    journal.close()
+    assert [r.value for r in read_journal(path)] == ["off", "on"]
@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+import hubitatmaker
+
+
+def test_lazy_import() -> None:
+    """Importing the package should not import the hub's dependencies."""
+    code = (
+        "import sys, hubitatmaker; "
+        "print(' '.join(m for m in ('aiohttp', 'hubitatmaker.hub') "
+        "if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_exports() -> None:
+    """Every exported name should be accessible."""
+    for name in hubitatmaker.__all__:
+        assert getattr(hubitatmaker, name) is not None
+    assert "Hub" in dir(hubitatmaker)
+    assert hubitatmaker.Hub.__name__ == "Hub"
+    assert hubitatmaker.ATTR_SWITCH == "switch"
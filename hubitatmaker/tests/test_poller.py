@@ -0,0 +1,139 @@
+import json
+from os.path import dirname, join
+from typing import Dict, List, Optional, Set
+
+import pytest
+
+from hubitatmaker.poller import Poller
+from hubitatmaker.types import Device
+
+with open(join(dirname(__file__), "device_details.json")) as f:
+    device_details = json.loads(f.read())
+
+
+def create_devices() -> Dict[str, Device]:
+    return {
+        device_id: Device(json.loads(json.dumps(details)))
+        for device_id, details in device_details.items()
+    }
+
+
+def test_poller_checks_intervals() -> None:
+    """A poller needs a positive minimum interval no larger than the maximum."""
+
+    async def poll_device(device_id: str) -> bool:
+        return False
+
+    async def poll_all() -> Optional[Set[str]]:
+        return None
+
+    async def poll_hub() -> None:
+        pass
+
+    pytest.raises(ValueError, Poller, {}, poll_device, poll_all, poll_hub, 0)
+    pytest.raises(ValueError, Poller, {}, poll_device, poll_all, poll_hub, 10, 5)
+
+
+@pytest.mark.asyncio
+async def test_poller_backs_off() -> None:
+    """Idle devices should be polled less often, changed devices more often."""
+    devices = create_devices()
+    changes: Set[str] = set()
+    polled: List[str] = []
+
+    async def poll_device(device_id: str) -> bool:
+        polled.append(device_id)
+        return device_id in changes
+
+    async def poll_all() -> Optional[Set[str]]:
+        return None
+
+    async def poll_hub() -> None:
+        pass
+
+    poller = Poller(devices, poll_device, poll_all, poll_hub, 1, 4)
+    assert await poller.poll(0) == set()
+    assert polled == []
+
+    # Every device is due after max_interval; one of them changed
+    changes.add("6")
+    assert await poller.poll(4) == {"6"}
+    assert sorted(polled) == ["176", "32", "6"]
+    assert poller.interval("6") == 1
+    assert poller.interval("32") == 4
+
+    # Only the changed device is due soon, and it backs off when idle
+    changes.clear()
+    polled.clear()
+    assert await poller.poll(5) == set()
+    assert polled == ["6"]
+    assert poller.interval("6") == 2
+
+    poller.touch("32", 5)
+    assert poller.due(6) == ["32"]
+
+
+@pytest.mark.asyncio
+async def test_poller_bulk() -> None:
+    """Devices should be polled in bulk when many are due, if supported."""
+    devices = create_devices()
+    bulk_supported = True
+    counts: Dict[str, int] = {"all": 0, "device": 0, "hub": 0}
+
+    async def poll_device(device_id: str) -> bool:
+        counts["device"] += 1
+        return False
+
+    async def poll_all() -> Optional[Set[str]]:
+        counts["all"] += 1
+        return {"32"} if bulk_supported else None
+
+    async def poll_hub() -> None:
+        counts["hub"] += 1
+
+    poller = Poller(devices, poll_device, poll_all, poll_hub, 1, 4)
+    await poller.poll(0)
+    assert await poller.poll(4) == {"32"}
+    assert counts == {"all": 1, "device": 0, "hub": 1}
+    assert poller.interval("32") == 1
+
+    # A single due device is polled by itself
+    await poller.poll(5)
+    assert counts == {"all": 1, "device": 1, "hub": 1}
+
+    # A hub without a bulk endpoint is only asked once
+    bulk_supported = False
+    poller = Poller(devices, poll_device, poll_all, poll_hub, 1, 4)
+    await poller.poll(0)
+    await poller.poll(4)
+    await poller.poll(8)
+    assert counts["all"] == 2
+    assert counts["device"] == 7
+    assert poller.request_count == 1 + 6 + 2
+
+
+@pytest.mark.asyncio
+async def test_poller_bulk_error() -> None:
+    """A failed bulk request should be tried again on the next poll."""
+    devices = create_devices()
+    counts: Dict[str, int] = {"all": 0, "device": 0}
+
+    async def poll_device(device_id: str) -> bool:
+        counts["device"] += 1
+        return False
+
+    async def poll_all() -> Optional[Set[str]]:
+        counts["all"] += 1
+        if counts["all"] == 1:
+            raise ConnectionError("hub unavailable")
+        return set()
+
+    async def poll_hub() -> None:
+        pass
+
+    poller = Poller(devices, poll_device, poll_all, poll_hub, 1, 4)
+    await poller.poll(0)
+    with pytest.raises(ConnectionError):
+        await poller.poll(4)
+    assert await poller.poll(5) == set()
+    assert counts == {"all": 2, "device": 0}
@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Dict, List
+from urllib.parse import quote
+
+import aiohttp
+import pytest
+
+from hubitatmaker.server import create_server
+
+
+@pytest.mark.asyncio
+async def test_server_routes_events() -> None:
+    """Events should be sent to the handler for the path they're posted to."""
+    received: List[Any] = []
+    server = create_server(lambda e: received.append(("/", e)), "127.0.0.1")
+    server.add_handler("/hub1", lambda e: received.append(("/hub1", e)))
+    server.start()
+    event: Dict[str, Any] = {"content": {"name": "switch"}}
+    try:
+        async with aiohttp.ClientSession() as session:
+            for path in ("/", "/hub1", "/hub2"):
+                async with session.post(f"{server.url}{path}", json=event) as resp:
+                    assert resp.status == (404 if path == "/hub2" else 200)
+        await asyncio.sleep(0.01)
+    finally:
+        server.stop()
+
+    assert received == [("/", event), ("/hub1", event)]
+
+
+@pytest.mark.asyncio
+async def test_server_routes_encoded_paths() -> None:
+    """Handler paths should match posted paths after URL decoding."""
+    received: List[Any] = []
+    server = create_server(lambda e: None, "127.0.0.1")
+    for key in ("10.0.0.5:8080", "My Hub"):
+        server.add_handler(f"/{key}", lambda e, key=key: received.append(key))
+    server.start()
+    try:
+        async with aiohttp.ClientSession() as session:
+            for key in ("10.0.0.5:8080", "My Hub"):
+                url = f"{server.url}/{quote(key, safe='')}"
+                async with session.post(url, json={"content": {}}) as resp:
+                    assert resp.status == 200
+        await asyncio.sleep(0.01)
+    finally:
+        server.stop()
+
+    assert received == ["10.0.0.5:8080", "My Hub"]
@@ -0,0 +1,105 @@
+import json
+from os.path import dirname, join
+import subprocess
+import sys
+from typing import Any, List
+
+import pytest
+
+from hubitatmaker.hub import Hub
+from hubitatmaker.shared import (
+    _SEQ,
+    _SEQ_OFFSET,
+    SharedStateExporter,
+    SharedStateReader,
+)
+
+with open(join(dirname(__file__), "events.json")) as f:
+    events = json.loads(f.read())
+
+
+def test_export(hub: Hub) -> None:
+    """Readers should see exported values as events are processed."""
+    received: List[Any] = []
+    hub.add_device_listener("176", received.append)
+    exporter = SharedStateExporter(hub)
+    try:
+        reader = SharedStateReader(exporter.name)
+        assert len(reader.keys) == 8
+        assert ("32", "temperature") in reader.keys
+        assert reader.get("32", "temperature")[0] == 63.99
+        assert reader.get("6", "contact")[0] == "open"
+        assert reader.get("176", "switch")[0] == "off"
+        with pytest.raises(KeyError):
+            reader.get("176", "level")
+
+        version = reader.version
+        hub._process_event(events["device"])
+        assert reader.version == version + 1
+        value, timestamp = reader.get("176", "switch")
+        assert value == "on"
+        assert timestamp == hub.devices["176"].last_update
+
+        values = reader.read()
+        assert values[("176", "switch")][0] == "on"
+        assert values[("6", "battery")][0] == 100
+        reader.close()
+    finally:
+        exporter.close()
+
+    # Closing the exporter only removes its own listener
+    hub._process_event(events["device"])
+    assert len(received) == 2
+    with pytest.raises(FileNotFoundError):
+        SharedStateReader(exporter.name)
+
+
+def test_export_selection(hub: Hub) -> None:
+    """Exports may be limited to some devices and attributes."""
+    exporter = SharedStateExporter(hub, device_ids=["6", "32"], attributes=["battery"])
+    try:
+        reader = SharedStateReader(exporter.name)
+        assert reader.read() == {
+            ("6", "battery"): (100, hub.devices["6"].last_update),
+            ("32", "battery"): (66, hub.devices["32"].last_update),
+        }
+        reader.close()
+    finally:
+        exporter.close()
+
+
+def test_read_timeout(hub: Hub) -> None:
+    """Reads should give up if a write never finishes."""
+    exporter = SharedStateExporter(hub)
+    try:
+        reader = SharedStateReader(exporter.name, timeout=0.01)
+        # Leave the table as if the writer had stopped part way through
+        _SEQ.pack_into(exporter._buf, _SEQ_OFFSET, 1)
+        with pytest.raises(TimeoutError):
+            reader.get("176", "switch")
+        with pytest.raises(TimeoutError):
+            reader.read()
+        reader.close()
+    finally:
+        exporter.close()
+
+
+def test_export_to_other_process(hub: Hub) -> None:
+    """Other processes should be able to read exported values."""
+    exporter = SharedStateExporter(hub)
+    try:
+        code = (
+            "import sys; from hubitatmaker.shared import SharedStateReader; "
+            "reader = SharedStateReader(sys.argv[1]); "
+            "print(reader.get('32', 'water')[0]); reader.close()"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code, exporter.name],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert result.stdout.strip() == "dry"
+        assert result.stderr == ""
+    finally:
+        exporter.close()
@@ -0,0 +1,38 @@
+import json
+from os.path import dirname, join
+
+from hubitatmaker.snapshot import load_snapshot, save_snapshot
+from hubitatmaker.types import Device, Mode
+
+with open(join(dirname(__file__), "device_details.json")) as f:
+    device_details = json.loads(f.read())
+
+
+def test_snapshot_round_trip(tmp_path) -> None:
+    """A saved snapshot should load back as equivalent state."""
+    path = join(str(tmp_path), "hub.snapshot")
+    devices = [Device(device_details[i]) for i in ("6", "176")]
+    modes = [Mode({"active": True, "id": 1, "name": "Day"})]
+    save_snapshot(path, devices, modes, "armedAway", {"event_url": "x"})
+
+    snapshot = load_snapshot(path)
+    assert snapshot is not None
+    assert snapshot.hsm_status == "armedAway"
+    assert snapshot.extra == {"event_url": "x"}
+    assert snapshot.modes == [{"active": True, "id": 1, "name": "Day"}]
+
+    loaded = Device(snapshot.devices[0])
+    assert str(loaded) == str(devices[0])
+    assert loaded.capabilities == devices[0].capabilities
+    assert loaded.attributes["contact"].values == ("closed", "open")
+    assert dict(loaded.attributes["battery"]) == dict(devices[0].attributes["battery"])
+
+
+def test_missing_or_invalid_snapshot(tmp_path) -> None:
+    """Unusable snapshots should be ignored."""
+    path = join(str(tmp_path), "hub.snapshot")
+    assert load_snapshot(path) is None
+
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert load_snapshot(path) is None
@@ -1,7 +1,7 @@
 import json
 from os.path import dirname, join
 
-from hubitatmaker.types import Device
+from hubitatmaker.types import Attribute, Device, MetadataPool
 
 with open(join(dirname(__file__), "device_details.json")) as f:
     device_details = json.loads(f.read())
@@ -24,3 +24,82 @@ def test_device_records_last_update_time() -> None:
 
     d.update_attr("contact", "closed")
     assert update != d.last_update
+
+
+def test_device_is_compact() -> None:
+    """A device should not keep its raw payload by default."""
+    d = Device(device_details["6"])
+    assert not hasattr(d, "__dict__")
+    assert d.raw is None
+    assert d.attributes["contact"].raw is None
+    assert d.id == "6"
+    assert d.attributes["contact"].values == ("closed", "open")
+
+
+def test_device_can_keep_raw_data() -> None:
+    """A device should keep its raw payload when asked to."""
+    details = json.loads(json.dumps(device_details["6"]))
+    d = Device(details, keep_raw=True)
+    assert d.raw is details
+
+    d.update_attr("contact", "closed")
+    assert d.attributes["contact"].value == "closed"
+    assert d.attributes["contact"].raw == {
+        "dataType": "ENUM",
+        "name": "contact",
+        "currentValue": "closed",
+        "values": ["closed", "open"],
+    }
+
+
+def test_attribute_decodes_typed_values() -> None:
+    """Attribute values should be decoded based on their data type."""
+    d = Device(device_details["32"])
+    temp = d.attributes["temperature"]
+    assert temp.typed_value == 63.99
+
+    d.update_attr("temperature", "72.5")
+    assert temp.value == "72.5"
+    assert temp.typed_value == 72.5
+
+    d.update_attr("water", "".join(["w", "et"]))
+    assert d.attributes["water"].typed_value is "wet"  # noqa: F632
+
+
+def test_attribute_decodes_json_values() -> None:
+    """JSON_OBJECT values should be parsed."""
+    attr = Attribute(
+        {"name": "lockCodes", "dataType": "JSON_OBJECT", "currentValue": '{"1": {}}'}
+    )
+    assert attr.typed_value == {"1": {}}
+
+    attr.update_value("not json")
+    assert attr.typed_value == "not json"
+
+
+def test_device_update_state_is_incremental() -> None:
+    """update_state should only change what differs and report it."""
+    details = json.loads(json.dumps(device_details["6"]))
+    d = Device(details)
+    contact = d.attributes["contact"]
+    caps = d.capabilities
+
+    assert d.update_state(details) == set()
+
+    details["attributes"][1]["currentValue"] = "closed"
+    del details["attributes"][2]
+    assert d.update_state(details) == {"contact", "tamper"}
+    assert d.attributes["contact"] is contact
+    assert contact.value == "closed"
+    assert "tamper" not in d.attributes
+    assert d.capabilities is caps
+
+
+def test_devices_share_metadata() -> None:
+    """Devices of the same type should share their metadata."""
+    pool = MetadataPool()
+    a = Device(json.loads(json.dumps(device_details["6"])), pool=pool)
+    b = Device(json.loads(json.dumps(device_details["6"])), pool=pool)
+    assert a.capabilities is b.capabilities
+    assert a.commands is b.commands
+    assert a.attributes["contact"].values is b.attributes["contact"].values
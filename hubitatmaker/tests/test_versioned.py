@@ -0,0 +1,135 @@
+import json
+from os.path import dirname, join
+from typing import Any, List
+
+import pytest
+
+from hubitatmaker import versioned
+from hubitatmaker.types import Device
+from hubitatmaker.versioned import DeviceState, StateView, VersionedState
+
+with open(join(dirname(__file__), "device_details.json")) as f:
+    device_details = json.loads(f.read())
+
+
+def create_device(device_id: str) -> Device:
+    return Device(json.loads(json.dumps(device_details[device_id])))
+
+
+def trie_nodes(view: StateView) -> List[Any]:
+    nodes: List[Any] = []
+    stack: List[Any] = [view._root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(e for e in getattr(node, "entries", ()) if type(e) is not tuple)
+    return nodes
+
+
+def test_device_state() -> None:
+    """Device states should hold typed values and be immutable."""
+    state = DeviceState.from_device(create_device("176"))
+    assert state.id == "176"
+    assert state.attributes["switch"] == "off"
+    assert state.attributes["power"] == 0.0
+    assert "Switch" in state.capabilities
+    with pytest.raises(TypeError):
+        state.attributes["switch"] = "on"  # type: ignore
+    with pytest.raises(AttributeError):
+        state.name = "Fan"  # type: ignore
+
+    changed = state.with_value("switch", "on", 1.0)
+    assert changed.attributes["switch"] == "on"
+    assert changed.last_update == 1.0
+    assert state.attributes["switch"] == "off"
+
+
+def test_versions_are_immutable() -> None:
+    """Updates should publish new views and leave old ones unchanged."""
+    versions = VersionedState({"6": create_device("6"), "176": create_device("176")})
+    first = versions.current
+    assert first.version == 0
+    assert sorted(first) == ["176", "6"]
+    assert len(first) == 2
+
+    versions.update_attr("176", "switch", "on", 1.0)
+    second = versions.current
+    assert second.version == 1
+    assert second["176"].attributes["switch"] == "on"
+    assert first["176"].attributes["switch"] == "off"
+
+    # Devices that didn't change are shared between versions
+    assert second["6"] is first["6"]
+
+    versions.update_attr("999", "switch", "on", 1.0)
+    assert versions.version == 1
+
+    versions.remove_device("6")
+    assert "6" not in versions.current
+    assert "6" in second
+    assert len(versions.current) == 1
+
+    # Unchanged devices don't produce new versions
+    device = create_device("32")
+    versions.update_device("32", device)
+    assert versions.version == 3
+    versions.update_device("32", device)
+    assert versions.version == 3
+
+    versions.reset({"32": device})
+    assert versions.version == 4
+    assert list(versions.current) == ["32"]
+
+
+def test_versions_grow() -> None:
+    """Views should stay correct as buckets are added."""
+    versions = VersionedState()
+    details = device_details["6"]
+    for i in range(1000):
+        device = Device(dict(details, id=str(i)))
+        versions.update_device(str(i), device)
+    view = versions.current
+    assert len(view) == 1000
+    assert sorted(view, key=int) == [str(i) for i in range(1000)]
+    assert all(view[str(i)].id == str(i) for i in range(1000))
+
+    # An update only copies the nodes on the path to the changed device
+    versions.update_attr("500", "contact", "closed", 1.0)
+    old_nodes = {id(n) for n in trie_nodes(view)}
+    new_nodes = trie_nodes(versions.current)
+    copied = [n for n in new_nodes if id(n) not in old_nodes]
+    assert len(new_nodes) > 32
+    assert len(copied) <= 3
+
+    for i in range(0, 1000, 2):
+        versions.remove_device(str(i))
+    assert len(versions.current) == 500
+    assert sorted(versions.current, key=int) == [str(i) for i in range(1, 1000, 2)]
+    assert "500" not in versions.current
+    assert len(view) == 1000
+
+    for i in range(1, 1000, 2):
+        versions.remove_device(str(i))
+    assert len(versions.current) == 0
+    assert list(versions.current) == []
+
+
+def test_hash_collisions(monkeypatch: Any) -> None:
+    """Devices whose IDs have the same hash should be kept apart."""
+    monkeypatch.setattr(versioned, "_hash", lambda device_id: 7)
+    versions = VersionedState({"6": create_device("6"), "32": create_device("32")})
+    versions.update_device("176", create_device("176"))
+    view = versions.current
+    assert sorted(view) == ["176", "32", "6"]
+    assert view["32"].id == "32"
+    assert "999" not in view
+
+    versions.update_attr("176", "switch", "on", 1.0)
+    assert versions.current["176"].attributes["switch"] == "on"
+    assert view["176"].attributes["switch"] == "off"
+
+    versions.remove_device("6")
+    versions.remove_device("32")
+    assert list(versions.current) == ["176"]
+    versions.remove_device("176")
+    assert len(versions.current) == 0
@@ -0,0 +1,69 @@
+import asyncio
+import json
+from os.path import dirname, join
+from time import time
+from typing import Dict, List
+
+import pytest
+
+from hubitatmaker.types import Device
+from hubitatmaker.watchdog import Watchdog
+
+with open(join(dirname(__file__), "device_details.json")) as f:
+    device_details = json.loads(f.read())
+
+
+def create_devices(ages: Dict[str, float], now: float) -> Dict[str, Device]:
+    devices: Dict[str, Device] = {}
+    for device_id, age in ages.items():
+        device = Device(json.loads(json.dumps(device_details[device_id])))
+        device._last_update = now - age
+        devices[device_id] = device
+    return devices
+
+
+def test_watchdog_checks_budget() -> None:
+    """A watchdog needs a positive budget."""
+
+    async def refresh(device_id: str) -> None:
+        pass
+
+    pytest.raises(ValueError, Watchdog, {}, refresh, 0)
+
+
+@pytest.mark.asyncio
+async def test_watchdog_refreshes_stalest() -> None:
+    """The watchdog should refresh stale devices, stalest first."""
+    devices = create_devices({"6": 1000, "32": 2000, "176": 10}, time())
+    refreshed: List[str] = []
+
+    async def refresh(device_id: str) -> None:
+        refreshed.append(device_id)
+        devices[device_id]._last_update = time()
+
+    watchdog = Watchdog(devices, refresh, max_age=500)
+    assert await watchdog.refresh_stalest() == "32"
+    assert await watchdog.refresh_stalest() == "6"
+    assert await watchdog.refresh_stalest() is None
+    assert refreshed == ["32", "6"]
+
+
+@pytest.mark.asyncio
+async def test_watchdog_runs_within_budget() -> None:
+    """The background task should refresh one device per interval."""
+    devices = create_devices({"6": 1000, "32": 2000, "176": 3000}, 0)
+    refreshed: List[str] = []
+
+    async def refresh(device_id: str) -> None:
+        refreshed.append(device_id)
+        devices[device_id]._last_update = 1e12
+
+    # 6000 per minute is one refresh every 10ms
+    watchdog = Watchdog(devices, refresh, budget=6000, max_age=60)
+    watchdog.start()
+    assert watchdog.running
+    await asyncio.sleep(0.025)
+    watchdog.stop()
+    assert not watchdog.running
+    assert refreshed == ["176", "32"]
+    assert watchdog.refresh_count == 2
@@ -1,32 +1,228 @@
+import json
+from sys import intern
 from time import time
 from types import MappingProxyType
-from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+TypedValue = Union[str, float, bool, Dict[str, Any], List[Any], None]
+
+
+def is_number(value: Any) -> bool:
+    """Return True if a typed value is an orderable number.
+
+    Booleans and NaN aren't treated as numbers.
+    """
+    value_type = type(value)
+    if value_type is float:
+        return value == value
+    if value_type is str or value is None:
+        return False
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _decode_number(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _decode_enum(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return intern(str(value))
+
+
+def _decode_string(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return str(value)
+
+
+def _decode_bool(value: Any) -> Optional[bool]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value.lower() == "true"
+    return bool(value)
+
+
+def _decode_json(value: Any) -> TypedValue:
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+# Decoders for Hubitat attribute data types. Values with an unknown data type
+# are passed through unchanged.
+_DECODERS: Dict[str, Callable[[Any], TypedValue]] = {
+    "BOOL": _decode_bool,
+    "COLOR_MAP": _decode_json,
+    "ENUM": _decode_enum,
+    "JSON_OBJECT": _decode_json,
+    "NUMBER": _decode_number,
+    "STRING": _decode_string,
+    "VECTOR3": _decode_json,
+}
+
+
+class MetadataPool:
+    """A pool of shared, immutable device metadata.
+
+    Devices of the same driver type carry identical capability, command and
+    attribute value lists. A pool hands out one canonical tuple for each
+    distinct list so that devices can share them.
+    """
+
+    __slots__ = ("_tuples",)
+
+    def __init__(self) -> None:
+        self._tuples: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tuples)
+
+    def share(self, items: Iterable[str]) -> Tuple[str, ...]:
+        """Return the canonical tuple for the given strings."""
+        key = tuple([intern(i) if isinstance(i, str) else i for i in items])
+        return self._tuples.setdefault(key, key)
+
+
+_DEFAULT_POOL = MetadataPool()
+
+
+def _share_values(
+    properties: Dict[str, Any], pool: MetadataPool
+) -> Optional[Tuple[str, ...]]:
+    """Return the shared tuple for an attribute's enum values, if it has any."""
+    values = properties.get("values")
+    if values is None:
+        return None
+    return pool.share(values)
 
 
 class Attribute:
-    def __init__(self, properties: Dict[str, Any]):
-        self._properties = properties
+    """A device attribute.
+
+    Pass keep_raw=True to retain the raw properties received from the hub.
+    """
+
+    __slots__ = (
+        "_name",
+        "_type",
+        "_value",
+        "_typed_value",
+        "_decode",
+        "_values",
+        "_properties",
+    )
+
+    def __init__(
+        self,
+        properties: Dict[str, Any],
+        keep_raw: bool = False,
+        pool: Optional[MetadataPool] = None,
+    ):
+        self._name: str = intern(properties["name"])
+        self._set_type(properties["dataType"])
+        self._values = _share_values(properties, pool or _DEFAULT_POOL)
+        self._properties = properties if keep_raw else None
+        self._set_value(properties["currentValue"])
 
     @property
     def name(self) -> str:
-        return self._properties["name"]
+        return self._name
 
     @property
     def type(self) -> str:
-        return self._properties["dataType"]
+        return self._type
 
     @property
     def value(self) -> Union[str, float]:
-        return self._properties["currentValue"]
+        return self._value
 
     @property
-    def values(self) -> Optional[List[str]]:
-        if "values" not in self._properties:
-            return None
-        return self._properties["values"]
+    def typed_value(self) -> TypedValue:
+        """Return the value decoded according to the attribute's data type.
+
+        NUMBER values are floats, ENUM values are interned strings and
+        JSON_OBJECT values are parsed. The value is decoded once, when it is
+        set.
+        """
+        return self._typed_value
+
+    @property
+    def values(self) -> Optional[Sequence[str]]:
+        return self._values
+
+    @property
+    def raw(self) -> Optional[Dict[str, Any]]:
+        """Return the raw attribute properties, if they were retained."""
+        return self._properties
 
     def update_value(self, value: Union[str, float]) -> None:
-        self._properties["currentValue"] = value
+        self._set_value(value)
+        if self._properties is not None:
+            self._properties["currentValue"] = value
+
+    def update_state(
+        self, properties: Dict[str, Any], pool: Optional[MetadataPool] = None
+    ) -> bool:
+        """Update this attribute from a full attribute payload.
+
+        Return True if the attribute's value changed.
+        """
+        if self._properties is not None:
+            self._properties = properties
+
+        data_type = properties["dataType"]
+        if data_type != self._type:
+            self._set_type(data_type)
+
+        values = _share_values(properties, pool or _DEFAULT_POOL)
+        if values is not self._values:
+            self._values = values
+
+        old_value = self._typed_value
+        self._set_value(properties["currentValue"])
+        return self._typed_value != old_value
+
+    def _set_type(self, data_type: str) -> None:
+        self._type = data_type
+        self._decode = _DECODERS.get(data_type) if data_type else None
+
+    def _set_value(self, value: Union[str, float]) -> None:
+        self._value = value
+        decode = self._decode
+        self._typed_value = value if decode is None else decode(value)
+
+    def to_properties(self) -> Dict[str, Any]:
+        """Return the attribute in the form it was received from the hub."""
+        props: Dict[str, Any] = {
+            "name": self._name,
+            "dataType": self._type,
+            "currentValue": self._value,
+        }
+        if self._values is not None:
+            props["values"] = list(self._values)
+        return props
 
     def __iter__(self):
         for key in "name", "type", "value":
@@ -37,20 +233,56 @@ class Attribute:
 
 
 class Device:
-    def __init__(self, properties: Dict[str, Any]):
+    """A Hubitat device.
+
+    Only the fields exposed through properties are stored; the raw device
+    payload (and each attribute's payload) is kept only when keep_raw is True.
+    """
+
+    __slots__ = (
+        "_id",
+        "_name",
+        "_type",
+        "_attributes",
+        "_attributes_ro",
+        "_capabilities",
+        "_commands",
+        "_last_update",
+        "_keep_raw",
+        "_pool",
+        "_properties",
+    )
+
+    def __init__(
+        self,
+        properties: Dict[str, Any],
+        keep_raw: bool = False,
+        pool: Optional[MetadataPool] = None,
+    ):
+        """Initialize a Device.
+
+        Capability, command and attribute value lists are shared through pool,
+        or through a module-wide pool if none is given.
+        """
+        self._keep_raw = keep_raw
+        self._pool = pool or _DEFAULT_POOL
+        self._attributes: Dict[str, Attribute] = {}
+        self._attributes_ro = MappingProxyType(self._attributes)
+        self._capabilities: Tuple[str, ...] = ()
+        self._commands: Tuple[str, ...] = ()
         self.update_state(properties)
 
     @property
     def id(self) -> str:
-        return self._properties["id"]
+        return self._id
 
     @property
     def name(self) -> str:
-        return self._properties["label"]
+        return self._name
 
     @property
     def type(self) -> str:
-        return self._properties["name"]
+        return self._type
 
     @property
     def attributes(self) -> Mapping[str, Attribute]:
@@ -71,29 +303,80 @@ class Device:
         """
         return self._last_update
 
-    def update_attr(self, attr_name: str, value: Union[str, int]) -> None:
-        attr = self.attributes[attr_name]
+    @property
+    def raw(self) -> Optional[Dict[str, Any]]:
+        """Return the raw device properties, if they were retained."""
+        return self._properties
+
+    def update_attr(self, attr_name: str, value: Union[str, int]) -> Any:
+        """Update an attribute value, returning the new typed value."""
+        attr = self._attributes[attr_name]
         attr.update_value(value)
         self._last_update = time()
+        return attr._typed_value
 
-    def update_state(self, properties: Dict[str, Any]) -> None:
-        self._properties = properties
-        self._last_update = time()
+    def update_state(self, properties: Dict[str, Any]) -> Set[str]:
+        """Update this device from a full device payload.
 
-        self._attributes: Dict[str, Attribute] = {}
-        self._attributes_ro = MappingProxyType(self._attributes)
-        for attr in properties.get("attributes", []):
-            self._attributes[attr["name"]] = Attribute(attr)
+        Existing Attribute objects are updated in place, and capabilities and
+        commands are only replaced when they differ. Return the names of the
+        attributes that were added, removed, or whose values changed.
+        """
+        keep_raw = self._keep_raw
+        pool = self._pool
+        self._properties = properties if keep_raw else None
+        self._last_update = time()
 
-        caps: List[str] = [
+        self._id: str = properties.get("id", "")
+        self._name: str = properties.get("label", "")
+        self._type: str = properties.get("name", "")
+
+        attributes = self._attributes
+        changed: Set[str] = set()
+        seen: Set[str] = set()
+        for props in properties.get("attributes", []):
+            name = props["name"]
+            seen.add(name)
+            attr = attributes.get(name)
+            if attr is None:
+                attributes[name] = Attribute(props, keep_raw, pool)
+                changed.add(name)
+            elif attr.update_state(props, pool):
+                changed.add(name)
+
+        if len(seen) != len(attributes):
+            for name in [n for n in attributes if n not in seen]:
+                del attributes[name]
+                changed.add(name)
+
+        caps = pool.share(
             p for p in properties.get("capabilities", []) if isinstance(p, str)
-        ]
-        self._capabilities: Tuple[str, ...] = tuple(caps)
+        )
+        if caps is not self._capabilities:
+            self._capabilities = caps
 
-        commands: List[str] = [
+        commands = pool.share(
             p for p in properties.get("commands", []) if isinstance(p, str)
-        ]
-        self._commands: Tuple[str, ...] = tuple(commands)
+        )
+        if commands is not self._commands:
+            self._commands = commands
+
+        return changed
+
+    def to_properties(self) -> Dict[str, Any]:
+        """Return the device in the form it was received from the hub.
+
+        Only the fields the Device keeps are included, so this is enough to
+        re-create an equivalent Device.
+        """
+        return {
+            "id": self._id,
+            "label": self._name,
+            "name": self._type,
+            "attributes": [a.to_properties() for a in self._attributes.values()],
+            "capabilities": list(self._capabilities),
+            "commands": list(self._commands),
+        }
 
     def __iter__(self):
         for key in "id", "name", "type", "attributes", "capabilities":
@@ -104,32 +387,55 @@ class Device:
 
 
 class Event:
-    def __init__(self, properties: Dict[str, Any]):
-        self._properties = properties
+    """An event received from the hub."""
+
+    __slots__ = (
+        "_device_id",
+        "_device_name",
+        "_description",
+        "_attribute",
+        "_type",
+        "_value",
+        "_properties",
+    )
+
+    def __init__(self, properties: Dict[str, Any], keep_raw: bool = False):
+        self._device_id: str = properties["deviceId"]
+        self._device_name: Optional[str] = properties.get("displayName")
+        self._description: Optional[str] = properties.get("descriptionText")
+        self._attribute: str = properties["name"]
+        self._type: Optional[str] = properties.get("type")
+        self._value: Union[str, float] = properties["value"]
+        self._properties = properties if keep_raw else None
 
     @property
     def device_id(self) -> str:
-        return self._properties["deviceId"]
+        return self._device_id
 
     @property
     def device_name(self) -> Optional[str]:
-        return self._properties.get("displayName")
+        return self._device_name
 
     @property
     def description(self) -> Optional[str]:
-        return self._properties.get("descriptionText")
+        return self._description
 
     @property
     def attribute(self) -> str:
-        return self._properties["name"]
+        return self._attribute
 
     @property
     def type(self) -> Optional[str]:
-        return self._properties.get("type")
+        return self._type
 
     @property
     def value(self) -> Union[str, float]:
-        return self._properties["value"]
+        return self._value
+
+    @property
+    def raw(self) -> Optional[Dict[str, Any]]:
+        """Return the raw event content, if it was retained."""
+        return self._properties
 
     def __iter__(self):
         for key in (
@@ -147,24 +453,34 @@ class Event:
 
 
 class Mode:
+    """A hub mode."""
+
+    __slots__ = ("_active", "_id", "_name")
+
     def __init__(self, properties: Dict[str, Any]):
-        self._properties = properties
+        self._active: bool = properties["active"]
+        self._id: int = properties.get("id", -1)
+        self._name: str = properties["name"]
 
     @property
     def active(self) -> bool:
-        return self._properties["active"]
+        return self._active
 
     @active.setter
     def active(self, value: bool) -> None:
-        self._properties["active"] = value
+        self._active = value
 
     @property
     def id(self) -> int:
-        return self._properties.get("id", -1)
+        return self._id
 
     @property
     def name(self) -> str:
-        return self._properties["name"]
+        return self._name
+
+    def to_properties(self) -> Dict[str, Any]:
+        """Return the mode in the form it was received from the hub."""
+        return {"active": self._active, "id": self._id, "name": self._name}
 
     def __iter__(self):
         for key in (
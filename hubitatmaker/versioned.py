@@ -0,0 +1,348 @@
+"""Immutable, versioned views of device state."""
+
+from types import MappingProxyType
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .types import Device
+
+# Views are hash array mapped tries: each level of the trie consumes _BITS
+# bits of a device ID's hash, so nodes have at most _FANOUT entries.
+_BITS = 5
+_FANOUT = 1 << _BITS
+_MASK = _FANOUT - 1
+_HASH_BITS = 64
+_HASH_MASK = (1 << _HASH_BITS) - 1
+
+
+class DeviceState(NamedTuple):
+    """The state of a device at one version.
+
+    Attribute values are typed values (see Attribute.typed_value).
+    """
+
+    id: str
+    name: str
+    type: str
+    capabilities: Tuple[str, ...]
+    attributes: "MappingProxyType[str, Any]"
+    last_update: float
+
+    @classmethod
+    def from_device(cls, device: Device) -> "DeviceState":
+        """Capture the current state of a device."""
+        return cls(
+            device.id,
+            device.name,
+            device.type,
+            tuple(device.capabilities),
+            MappingProxyType(
+                {name: attr.typed_value for name, attr in device.attributes.items()}
+            ),
+            device.last_update,
+        )
+
+    def with_value(
+        self, attr_name: str, value: Any, last_update: float
+    ) -> "DeviceState":
+        """Return a copy of this state with one attribute value changed."""
+        attributes = self.attributes.copy()
+        attributes[attr_name] = value
+        return DeviceState(
+            self.id,
+            self.name,
+            self.type,
+            self.capabilities,
+            MappingProxyType(attributes),
+            last_update,
+        )
+
+
+class _Node:
+    """A trie node.
+
+    Only populated slots are stored: bit i of bitmap is set if slot i has an
+    entry, and entries holds the entries of the set bits in order. An entry
+    is either a child node or a (device ID, state) leaf.
+    """
+
+    __slots__ = ("bitmap", "entries")
+
+    def __init__(self, bitmap: int, entries: Tuple[Any, ...]):
+        self.bitmap = bitmap
+        self.entries = entries
+
+
+class _Collision:
+    """A node for devices whose IDs have the same hash."""
+
+    __slots__ = ("hash", "leaves")
+
+    def __init__(self, hash: int, leaves: Tuple[Tuple[str, DeviceState], ...]):
+        self.hash = hash
+        self.leaves = leaves
+
+
+_Leaf = Tuple[str, DeviceState]
+_Entry = Union[_Node, _Collision, _Leaf]
+
+_EMPTY = _Node(0, ())
+
+
+class StateView(Mapping[str, DeviceState]):
+    """An immutable view of the state of every device at one version.
+
+    Views are never modified once they've been published, so they may be
+    read from any thread without locking. Devices are stored in a hash array
+    mapped trie keyed by the hash of their IDs, and a new version shares
+    every node with the previous version except those on the path to the
+    device that changed.
+    """
+
+    __slots__ = ("_root", "_len", "_version")
+
+    def __init__(self, version: int, root: _Node, length: int):
+        self._version = version
+        self._root = root
+        self._len = length
+
+    def __repr__(self) -> str:
+        return f"<StateView version={self._version} devices={self._len}>"
+
+    @property
+    def version(self) -> int:
+        """Return the version of the state in this view."""
+        return self._version
+
+    def __getitem__(self, device_id: str) -> DeviceState:
+        h = _hash(device_id)
+        node: Any = self._root
+        shift = 0
+        while True:
+            if type(node) is _Collision:
+                for key, state in node.leaves:
+                    if key == device_id:
+                        return state
+                raise KeyError(device_id)
+            bit = 1 << ((h >> shift) & _MASK)
+            bitmap = node.bitmap
+            if not bitmap & bit:
+                raise KeyError(device_id)
+            node = node.entries[_popcount(bitmap & (bit - 1))]
+            if type(node) is tuple:
+                if node[0] == device_id:
+                    return node[1]
+                raise KeyError(device_id)
+            shift += _BITS
+
+    def __contains__(self, device_id: object) -> bool:
+        if not isinstance(device_id, str):
+            return False
+        try:
+            self[device_id]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[str]:
+        stack: List[Any] = [self._root]
+        while stack:
+            node = stack.pop()
+            if type(node) is _Collision:
+                for key, _ in node.leaves:
+                    yield key
+                continue
+            for entry in node.entries:
+                if type(entry) is tuple:
+                    yield entry[0]
+                else:
+                    stack.append(entry)
+
+    def __len__(self) -> int:
+        return self._len
+
+
+class VersionedState:
+    """Publishes a new immutable StateView each time a device changes.
+
+    Updates are copy-on-write with structural sharing: an update copies the
+    changed device's state and the trie nodes on the path to it, not the
+    whole view. Nodes have at most 32 entries and the trie's depth grows with
+    log32(n), so each update costs O(log n) rather than O(n).
+    """
+
+    def __init__(self, devices: Optional[Mapping[str, Device]] = None):
+        """Initialize a VersionedState with the current state of devices."""
+        self._current = _build_view(0, _capture(devices or {}))
+
+    @property
+    def current(self) -> StateView:
+        """Return the latest view of device state."""
+        return self._current
+
+    @property
+    def version(self) -> int:
+        """Return the latest version number."""
+        return self._current.version
+
+    def reset(self, devices: Mapping[str, Device]) -> None:
+        """Publish a view of the current state of devices, replacing all state."""
+        self._current = _build_view(self._current.version + 1, _capture(devices))
+
+    def update_device(self, device_id: str, device: Device) -> None:
+        """Publish the current state of a device, if it has changed."""
+        state = DeviceState.from_device(device)
+        old_state = self._current.get(device_id)
+        # Ignore last_update, which changes even when nothing else does
+        if old_state is not None and old_state[:-1] == state[:-1]:
+            return
+        self._replace(device_id, state)
+
+    def update_attr(
+        self, device_id: str, attr_name: str, value: Any, last_update: float
+    ) -> None:
+        """Publish a change to one attribute of a device."""
+        state = self._current.get(device_id)
+        if state is None:
+            return
+        self._replace(device_id, state.with_value(attr_name, value, last_update))
+
+    def remove_device(self, device_id: str) -> None:
+        """Publish a view without a device."""
+        if device_id in self._current:
+            self._replace(device_id, None)
+
+    def _replace(self, device_id: str, state: Optional[DeviceState]) -> None:
+        """Publish a new version with one device's state replaced or removed."""
+        view = self._current
+        h = _hash(device_id)
+        if state is None:
+            entry = _dissoc(view._root, 0, h, device_id)
+            root = _EMPTY if entry is None else _as_root(entry)
+            length = view._len - 1
+        else:
+            root, added = _assoc(view._root, 0, h, device_id, state)
+            length = view._len + added
+        self._current = StateView(view.version + 1, root, length)
+
+
+def _hash(device_id: str) -> int:
+    """Return the hash of a device ID as a non-negative 64-bit integer."""
+    return hash(device_id) & _HASH_MASK
+
+
+def _popcount(bits: int) -> int:
+    return bin(bits).count("1")
+
+
+def _assoc(
+    node: Any, shift: int, h: int, device_id: str, state: DeviceState
+) -> Tuple[Any, bool]:
+    """Return a copy of a node with a device's state set.
+
+    Also return True if the device was added rather than replaced.
+    """
+    leaf = (device_id, state)
+    if type(node) is _Collision:
+        leaves = node.leaves
+        for i, (key, _) in enumerate(leaves):
+            if key == device_id:
+                return _Collision(h, leaves[:i] + (leaf,) + leaves[i + 1 :]), False
+        return _Collision(h, leaves + (leaf,)), True
+
+    bit = 1 << ((h >> shift) & _MASK)
+    bitmap = node.bitmap
+    entries = node.entries
+    index = _popcount(bitmap & (bit - 1))
+    if not bitmap & bit:
+        entries = entries[:index] + (leaf,) + entries[index:]
+        return _Node(bitmap | bit, entries), True
+
+    entry = entries[index]
+    if type(entry) is tuple:
+        if entry[0] == device_id:
+            child: Any = leaf
+            added = False
+        else:
+            child = _split(shift + _BITS, entry, _hash(entry[0]), leaf, h)
+            added = True
+    else:
+        child, added = _assoc(entry, shift + _BITS, h, device_id, state)
+    return _Node(bitmap, entries[:index] + (child,) + entries[index + 1 :]), added
+
+
+def _split(shift: int, leaf1: _Leaf, h1: int, leaf2: _Leaf, h2: int) -> Any:
+    """Return a node holding two leaves that shared a slot in its parent."""
+    if shift >= _HASH_BITS:
+        return _Collision(h1, (leaf1, leaf2))
+    bit1 = 1 << ((h1 >> shift) & _MASK)
+    bit2 = 1 << ((h2 >> shift) & _MASK)
+    if bit1 == bit2:
+        return _Node(bit1, (_split(shift + _BITS, leaf1, h1, leaf2, h2),))
+    if bit1 < bit2:
+        return _Node(bit1 | bit2, (leaf1, leaf2))
+    return _Node(bit1 | bit2, (leaf2, leaf1))
+
+
+def _dissoc(node: Any, shift: int, h: int, device_id: str) -> Optional[_Entry]:
+    """Return what should replace a node once a device has been removed.
+
+    This is None if the node is left empty, or a leaf if only one device is
+    left below it, so that tries never hold chains of single-entry nodes.
+    The device must be present.
+    """
+    if type(node) is _Collision:
+        leaves = tuple(leaf for leaf in node.leaves if leaf[0] != device_id)
+        return leaves[0] if len(leaves) == 1 else _Collision(node.hash, leaves)
+
+    bit = 1 << ((h >> shift) & _MASK)
+    bitmap = node.bitmap
+    entries = node.entries
+    index = _popcount(bitmap & (bit - 1))
+    entry = entries[index]
+    child = (
+        None if type(entry) is tuple else _dissoc(entry, shift + _BITS, h, device_id)
+    )
+    if child is None:
+        bitmap &= ~bit
+        entries = entries[:index] + entries[index + 1 :]
+        if not entries:
+            return None
+        if len(entries) == 1 and type(entries[0]) is tuple:
+            return entries[0]
+        return _Node(bitmap, entries)
+    if len(entries) == 1 and type(child) is tuple:
+        return child
+    return _Node(bitmap, entries[:index] + (child,) + entries[index + 1 :])
+
+
+def _as_root(entry: _Entry) -> Any:
+    """Return the root node for what's left of a trie after a removal."""
+    if type(entry) is tuple:
+        return _Node(1 << (_hash(entry[0]) & _MASK), (entry,))
+    return entry
+
+
+def _capture(devices: Mapping[str, Device]) -> Dict[str, DeviceState]:
+    """Capture the current state of devices."""
+    return {
+        device_id: DeviceState.from_device(device)
+        for device_id, device in devices.items()
+    }
+
+
+def _build_view(version: int, states: Dict[str, DeviceState]) -> StateView:
+    """Build a view of device states."""
+    root: Any = _EMPTY
+    for device_id, state in states.items():
+        root, _ = _assoc(root, 0, _hash(device_id), device_id, state)
+    return StateView(version, root, len(states))
@@ -0,0 +1,107 @@
+"""Background refreshing of stale device state."""
+
+import asyncio
+from logging import getLogger
+from time import time
+from typing import Awaitable, Callable, Mapping, Optional
+
+from .types import Device
+
+DEFAULT_WATCHDOG_BUDGET = 6
+DEFAULT_WATCHDOG_MAX_AGE = 900.0
+
+_LOGGER = getLogger(__name__)
+
+
+class Watchdog:
+    """Refreshes the stalest devices of a hub in the background.
+
+    Push events can be lost (e.g., if the hub reboots or a POST fails), which
+    leaves local state wrong until the device changes again. The watchdog
+    refreshes one device at a time, choosing the device that has gone the
+    longest without an update, so every device is eventually refreshed in
+    round-robin order without bursts of requests to the hub.
+
+    At most budget devices are refreshed per minute, and only devices that
+    haven't been updated for at least max_age seconds are refreshed.
+    """
+
+    def __init__(
+        self,
+        devices: Mapping[str, Device],
+        refresh: Callable[[str], Awaitable[None]],
+        budget: int = DEFAULT_WATCHDOG_BUDGET,
+        max_age: float = DEFAULT_WATCHDOG_MAX_AGE,
+    ):
+        """Initialize a Watchdog.
+
+        devices:
+          The devices to watch
+        refresh:
+          An async function that refreshes a device, given its ID
+        budget:
+          The maximum number of devices to refresh per minute
+        max_age:
+          The number of seconds after which a device is considered stale
+        """
+        if budget < 1:
+            raise ValueError("Watchdog budget must be at least 1")
+
+        self.budget = budget
+        self.max_age = max_age
+        self.refresh_count = 0
+        self._devices = devices
+        self._refresh = refresh
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def running(self) -> bool:
+        """Return True if the watchdog is running."""
+        return self._task is not None
+
+    def start(self) -> None:
+        """Start refreshing devices in the background."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        """Stop refreshing devices."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stalest(self, now: Optional[float] = None) -> Optional[str]:
+        """Return the ID of the stalest device, if any device is stale."""
+        oldest = (time() if now is None else now) - self.max_age
+        stalest_id: Optional[str] = None
+        for device_id, device in self._devices.items():
+            last_update = device.last_update
+            if last_update <= oldest:
+                oldest = last_update
+                stalest_id = device_id
+        return stalest_id
+
+    async def refresh_stalest(self) -> Optional[str]:
+        """Refresh the stalest device, and return its ID.
+
+        Return None if no device is stale.
+        """
+        device_id = self.stalest()
+        if device_id is None:
+            return None
+
+        _LOGGER.debug("Refreshing stale device %s", device_id)
+        await self._refresh(device_id)
+        self.refresh_count += 1
+        return device_id
+
+    async def _run(self) -> None:
+        interval = 60.0 / self.budget
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh_stalest()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _LOGGER.warning("Unable to refresh stale device: %s", e)
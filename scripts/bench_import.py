@@ -0,0 +1,84 @@
+"""Measure the time taken to import hubitatmaker.
+
+Run with `python scripts/bench_import.py`. Each statement is run in a fresh
+interpreter with `-X importtime`, and the cumulative import time of its
+top-level module is reported (the best of several runs). The script exits
+with an error if `import hubitatmaker` imports any of the heavy dependencies
+that should only be loaded when a Hub is used, or if an import takes longer
+than --max-ms.
+"""
+
+import argparse
+import subprocess
+import sys
+from typing import List, Set, Tuple
+
+STATEMENTS = (
+    "import hubitatmaker",
+    "from hubitatmaker import ATTR_SWITCH",
+    "from hubitatmaker import Device",
+    "from hubitatmaker import Hub",
+)
+
+# Modules that a bare `import hubitatmaker` must not import
+LAZY_MODULES = ("aiohttp", "getmac", "hubitatmaker.hub", "hubitatmaker.server")
+
+RUNS = 5
+
+
+def import_time(statement: str) -> Tuple[float, Set[str]]:
+    """Return the import time in ms for a statement, and the modules imported."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0
+    modules: Set[str] = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not cumulative.strip().isdigit():
+            # Header line
+            continue
+        module = name.strip()
+        modules.add(module)
+        # Top-level imports have the least indentation
+        if len(name) - len(name.lstrip()) == 1:
+            total += int(cumulative)
+    return total / 1000, modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        help="fail if `import hubitatmaker` takes longer than this",
+    )
+    args = parser.parse_args()
+
+    errors: List[str] = []
+    for statement in STATEMENTS:
+        results = [import_time(statement) for _ in range(RUNS)]
+        best = min(t for t, _ in results)
+        print(f"{statement:<40} {best:>8.1f} ms")
+
+        if statement == "import hubitatmaker":
+            modules = results[0][1]
+            for name in LAZY_MODULES:
+                if name in modules:
+                    errors.append(f"`{statement}` imported {name}")
+            if args.max_ms is not None and best > args.max_ms:
+                errors.append(f"`{statement}` took {best:.1f} ms")
+
+    if errors:
+        for error in errors:
+            print(f"error: {error}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Measure memory used per Device for large synthetic installs.
+
+Run with `python scripts/bench_memory.py`. Synthetic devices are generated
+round-robin from the device types in the test fixtures, and each one is parsed
+from its own JSON payload, as it would be when loaded from a hub.
+"""
+
+import gc
+import json
+from os.path import dirname, join
+import tracemalloc
+from typing import List
+
+from hubitatmaker.types import Device, MetadataPool
+
+FIXTURES = join(dirname(__file__), "..", "hubitatmaker", "tests")
+DEVICE_COUNTS = (1_000, 5_000, 10_000)
+
+
+def create_payloads(count: int) -> List[str]:
+    with open(join(FIXTURES, "device_details.json")) as f:
+        templates = list(json.loads(f.read()).values())
+
+    payloads: List[str] = []
+    for i in range(count):
+        template = dict(templates[i % len(templates)])
+        template["id"] = str(i)
+        template["label"] = f"Device {i}"
+        payloads.append(json.dumps(template))
+    return payloads
+
+
+def measure(count: int) -> float:
+    payloads = create_payloads(count)
+    gc.collect()
+    tracemalloc.start()
+    # Hub shares one pool across all of its devices
+    pool = MetadataPool()
+    devices = [Device(json.loads(p), pool=pool) for p in payloads]
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(devices) == count
+    return size / count
+
+
+def main() -> None:
+    for count in DEVICE_COUNTS:
+        print(f"{count:>6} devices: {measure(count):>8,.0f} bytes/device")
+
+
+if __name__ == "__main__":
+    main()